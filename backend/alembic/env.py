@@ -7,7 +7,7 @@ from alembic import context
 
 # Import your models here
 from app.core.database import Base
-from app.models.models import Track, TrackAnalysis, CuePoint, Mix
+from app.models.models import Track, TrackAnalysis, CuePoint, Mix, FingerprintHash
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,164 @@
+"""compact beat grid
+
+Replace the track_analysis.beat_positions JSON array with a parametric
+beat grid (anchor, BPM, tempo-change segments) and a float32 fallback
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+track_analysis = sa.table(
+    'track_analysis',
+    sa.column('id', sa.Integer()),
+    sa.column('beat_positions', sa.JSON()),
+    sa.column('beat_grid', sa.JSON()),
+    sa.column('beat_times', sa.LargeBinary()),
+)
+
+# The grid format as of this revision, inlined so that later changes to
+# app.services.beat_grid do not change what this migration does
+
+FIT_TOLERANCE = 0.015
+MAX_SEGMENT_RATIO = 1 / 16
+
+
+def _fit(beats, start, end, tolerance):
+    """Least-squares (time at start, period) for beats[start:end + 1], or None if it doesn't fit"""
+    window = beats[start:end + 1]
+    offsets = np.arange(len(window), dtype=np.float64)
+    if len(window) == 2:
+        return float(window[0]), float(window[1] - window[0])
+    period, intercept = np.polyfit(offsets, window, 1)
+    if period <= 0 or np.max(np.abs(intercept + period * offsets - window)) > tolerance:
+        return None
+    return float(intercept), float(period)
+
+
+def _fit_segments(beats, tolerance):
+    """Greedily split beats into constant-period (start beat, time, period) segments"""
+    n = len(beats)
+    segments = []
+    start = 0
+    while start < n:
+        if n - start == 1:
+            period = segments[-1][2] if segments else 0.5
+            segments.append((start, float(beats[start]), period))
+            break
+        
+        # Exponential search for an end that no longer fits
+        good = start + 1
+        step = 2
+        while True:
+            end = min(start + step, n - 1)
+            if _fit(beats, start, end, tolerance) is None:
+                bad = end
+                break
+            good = end
+            if end == n - 1:
+                bad = None
+                break
+            step *= 2
+        
+        # Binary search for the last end that fits
+        if bad is not None:
+            while bad - good > 1:
+                mid = (good + bad) // 2
+                if _fit(beats, start, mid, tolerance) is None:
+                    bad = mid
+                else:
+                    good = mid
+        
+        intercept, period = _fit(beats, start, good, tolerance)
+        segments.append((start, intercept, period))
+        start = good + 1
+    return segments
+
+
+def _to_storage(beat_positions):
+    """(beat_grid, beat_times) of detected beat positions, or None if too few"""
+    if beat_positions is None or len(beat_positions) < 2:
+        return None
+    beats = np.asarray(beat_positions, dtype=np.float64)
+    
+    segments = _fit_segments(beats, FIT_TOLERANCE)
+    if len(segments) > max(1, len(beats) * MAX_SEGMENT_RATIO):
+        return {'count': len(beats)}, beats.astype('<f4').tobytes()
+    
+    return {
+        'anchor': segments[0][1],
+        'bpm': 60.0 / segments[0][2],
+        'count': len(beats),
+        'segments': [[int(b), float(t), 60.0 / period] for b, t, period in segments[1:]]
+    }, None
+
+
+def _to_positions(beat_grid, beat_times):
+    """Beat timestamps of a stored grid, or None if it has too few beats"""
+    if beat_times:
+        beats = np.frombuffer(beat_times, dtype='<f4')
+        return beats.astype(np.float64).tolist() if len(beats) >= 2 else None
+    if not beat_grid or beat_grid.get('count', 0) < 2:
+        return None
+    
+    rows = [[0, beat_grid['anchor'], beat_grid['bpm']]] + beat_grid.get('segments', [])
+    starts, times, bpms = (np.array(col, dtype=np.float64) for col in zip(*rows))
+    index = np.arange(int(beat_grid['count']))
+    segment = np.maximum(np.searchsorted(starts, index, side='right') - 1, 0)
+    return (times[segment] + (index - starts[segment]) * 60.0 / bpms[segment]).tolist()
+
+
+def upgrade():
+    op.add_column('track_analysis', sa.Column('beat_grid', sa.JSON(), nullable=True))
+    op.add_column('track_analysis', sa.Column('beat_times', sa.LargeBinary(), nullable=True))
+    
+    # Fit grids for existing rows
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(track_analysis.c.id, track_analysis.c.beat_positions)
+        .where(track_analysis.c.beat_positions.isnot(None))
+    )
+    for row_id, beat_positions in rows.fetchall():
+        stored = _to_storage(beat_positions)
+        if stored is None:
+            continue
+        beat_grid, beat_times = stored
+        conn.execute(
+            track_analysis.update()
+            .where(track_analysis.c.id == row_id)
+            .values(beat_grid=beat_grid, beat_times=beat_times)
+        )
+    
+    op.drop_column('track_analysis', 'beat_positions')
+
+
+def downgrade():
+    op.add_column('track_analysis', sa.Column('beat_positions', sa.JSON(), nullable=True))
+    
+    # Expand grids back to beat timestamps
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(track_analysis.c.id, track_analysis.c.beat_grid, track_analysis.c.beat_times)
+    )
+    for row_id, beat_grid, beat_times in rows.fetchall():
+        beat_positions = _to_positions(beat_grid, beat_times)
+        if beat_positions is None:
+            continue
+        conn.execute(
+            track_analysis.update()
+            .where(track_analysis.c.id == row_id)
+            .values(beat_positions=beat_positions)
+        )
+    
+    op.drop_column('track_analysis', 'beat_times')
+    op.drop_column('track_analysis', 'beat_grid')
@@ -0,0 +1,28 @@
+"""transition envelopes
+
+Add beat-synchronous intro/outro onset envelopes used for transition scoring.
+Existing rows get envelopes when they are re-analyzed.
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('track_analysis', sa.Column('intro_envelope', sa.LargeBinary(), nullable=True))
+    op.add_column('track_analysis', sa.Column('outro_envelope', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('track_analysis', 'outro_envelope')
+    op.drop_column('track_analysis', 'intro_envelope')
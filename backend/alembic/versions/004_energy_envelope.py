@@ -0,0 +1,26 @@
+"""energy envelope
+
+Add the coarse per-track energy envelope used for mix timelines.
+Existing rows get envelopes when they are re-analyzed.
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('track_analysis', sa.Column('energy_envelope', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('track_analysis', 'energy_envelope')
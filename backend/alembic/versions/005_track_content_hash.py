@@ -0,0 +1,28 @@
+"""track content hash
+
+Add the SHA-256 of each track's file, used to key caches of rendered audio.
+Existing rows are hashed on first use.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tracks', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_tracks_content_hash'), 'tracks', ['content_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_tracks_content_hash'), table_name='tracks')
+    op.drop_column('tracks', 'content_hash')
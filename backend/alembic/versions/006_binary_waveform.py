@@ -0,0 +1,70 @@
+"""binary waveform
+
+Replace the tracks.waveform_data JSON array (about 19 KB per track) with a
+uint8 waveform (1 KB), which the ORM only loads on request
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+tracks = sa.table(
+    'tracks',
+    sa.column('id', sa.Integer()),
+    sa.column('waveform_data', sa.JSON()),
+    sa.column('waveform', sa.LargeBinary()),
+)
+
+
+# The uint8 format as of this revision, inlined so that later changes to
+# app.services.waveform do not change what this migration does
+def _encode(values):
+    """Waveform points in [0, 1] as one uint8 each"""
+    waveform = np.clip(np.asarray(values, dtype=np.float64), 0.0, 1.0)
+    return np.round(waveform * 255).astype(np.uint8).tobytes()
+
+
+def _decode(blob):
+    return (np.frombuffer(blob, dtype=np.uint8) / 255.0).tolist()
+
+
+def _convert(source, convert):
+    """Convert a column for all rows in id order, BATCH_SIZE rows at a time"""
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(tracks.c.id, source)
+            .where(tracks.c.id > last_id, source.isnot(None))
+            .order_by(tracks.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for row_id, value in rows:
+            conn.execute(tracks.update().where(tracks.c.id == row_id).values(**convert(value)))
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    op.add_column('tracks', sa.Column('waveform', sa.LargeBinary(), nullable=True))
+    _convert(tracks.c.waveform_data, lambda values: {'waveform': _encode(values)})
+    op.drop_column('tracks', 'waveform_data')
+
+
+def downgrade():
+    op.add_column('tracks', sa.Column('waveform_data', sa.JSON(), nullable=True))
+    _convert(tracks.c.waveform, lambda blob: {'waveform_data': _decode(blob)})
+    op.drop_column('tracks', 'waveform')
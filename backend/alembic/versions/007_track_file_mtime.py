@@ -0,0 +1,26 @@
+"""track file mtime
+
+Record the modification time of files indexed by a library sync, so rescans
+can skip files whose size and mtime are unchanged.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tracks', sa.Column('file_mtime', sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('tracks', 'file_mtime')
@@ -0,0 +1,44 @@
+"""fingerprint index
+
+Store an acoustic fingerprint with each analysis, an inverted index of
+sampled fingerprint values, and a link from duplicate tracks to their
+original. Existing tracks are fingerprinted when they are re-analyzed.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('track_analysis', sa.Column('fingerprint', sa.LargeBinary(), nullable=True))
+    op.add_column(
+        'tracks',
+        sa.Column('duplicate_of', sa.Integer(), sa.ForeignKey('tracks.id'), nullable=True)
+    )
+    op.create_index(op.f('ix_tracks_duplicate_of'), 'tracks', ['duplicate_of'], unique=False)
+    op.create_table(
+        'fingerprint_hashes',
+        sa.Column('hash', sa.Integer(), nullable=False),
+        sa.Column('track_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['track_id'], ['tracks.id'], ),
+        sa.PrimaryKeyConstraint('hash', 'track_id')
+    )
+    op.create_index(op.f('ix_fingerprint_hashes_track_id'), 'fingerprint_hashes', ['track_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_fingerprint_hashes_track_id'), table_name='fingerprint_hashes')
+    op.drop_table('fingerprint_hashes')
+    op.drop_index(op.f('ix_tracks_duplicate_of'), table_name='tracks')
+    op.drop_column('tracks', 'duplicate_of')
+    op.drop_column('track_analysis', 'fingerprint')
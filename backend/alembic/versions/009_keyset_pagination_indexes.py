@@ -0,0 +1,44 @@
+"""keyset pagination indexes
+
+Composite (sort column, id) indexes for the cursor-paginated track and mix
+lists, plus indexes for the common filter + sort combinations. They are
+built concurrently on PostgreSQL so large libraries stay writable.
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_tracks_created_at_id', 'tracks', ['created_at', 'id']),
+    ('ix_tracks_title_id', 'tracks', ['title', 'id']),
+    ('ix_tracks_artist_id', 'tracks', ['artist', 'id']),
+    ('ix_tracks_bpm_id', 'tracks', ['bpm', 'id']),
+    ('ix_tracks_energy_id', 'tracks', ['energy', 'id']),
+    ('ix_tracks_genre_created_at_id', 'tracks', ['genre', 'created_at', 'id']),
+    ('ix_tracks_key_bpm_id', 'tracks', ['key', 'bpm', 'id']),
+    ('ix_mixes_created_at_id', 'mixes', ['created_at', 'id']),
+    ('ix_mixes_name_id', 'mixes', ['name', 'id']),
+    ('ix_mixes_duration_id', 'mixes', ['duration', 'id']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,94 @@
+"""track search
+
+Add tracks.search_text (normalized title, artist and album) and, on
+PostgreSQL, trigram and full-text GIN indexes over it for the search
+endpoint. Existing tracks are backfilled.
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import re
+import sqlalchemy as sa
+import unicodedata
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+tracks = sa.table(
+    'tracks',
+    sa.column('id', sa.Integer()),
+    sa.column('title', sa.String()),
+    sa.column('artist', sa.String()),
+    sa.column('album', sa.String()),
+    sa.column('search_text', sa.String()),
+)
+
+_NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+
+
+def _normalize(*parts):
+    """
+    Search text as of this revision: lowercase, accents removed and
+    punctuation collapsed to single spaces (inlined so that later changes to
+    app.services.text_match do not change what this migration does)
+    """
+    text = ' '.join(part for part in parts if part)
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _NON_ALPHANUMERIC.sub(' ', text.lower()).strip()
+
+
+def upgrade():
+    op.add_column('tracks', sa.Column('search_text', sa.String(), nullable=True))
+    
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(tracks.c.id, tracks.c.title, tracks.c.artist, tracks.c.album)
+            .where(tracks.c.id > last_id)
+            .order_by(tracks.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for row_id, title, artist, album in rows:
+            conn.execute(
+                tracks.update()
+                .where(tracks.c.id == row_id)
+                .values(search_text=_normalize(title, artist, album))
+            )
+        last_id = rows[-1][0]
+    
+    if conn.dialect.name != 'postgresql':
+        return
+    
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tracks_search_text_trgm', 'tracks', ['search_text'], unique=False,
+            postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'},
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_tracks_search_vector', 'tracks',
+            [sa.text("to_tsvector('simple'::regconfig, search_text)")], unique=False,
+            postgresql_using='gin', postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_tracks_search_vector', table_name='tracks', postgresql_concurrently=True)
+            op.drop_index('ix_tracks_search_text_trgm', table_name='tracks', postgresql_concurrently=True)
+    op.drop_column('tracks', 'search_text')
@@ -0,0 +1,68 @@
+"""backfill content hash
+
+Hash the files of tracks stored before content hashes were, which were
+hashed on first use until reads stopped writing them. Tracks whose file is
+missing are left without a hash.
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import hashlib
+import os
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+HASH_CHUNK_SIZE = 1024 * 1024
+
+tracks = sa.table(
+    'tracks',
+    sa.column('id', sa.Integer()),
+    sa.column('file_path', sa.String()),
+    sa.column('content_hash', sa.String()),
+)
+
+
+def _hash_file(file_path):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def upgrade():
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(tracks.c.id, tracks.c.file_path)
+            .where(tracks.c.id > last_id, tracks.c.content_hash.is_(None))
+            .order_by(tracks.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for row_id, file_path in rows:
+            if not os.path.isfile(file_path):
+                continue
+            conn.execute(
+                tracks.update()
+                .where(tracks.c.id == row_id)
+                .values(content_hash=_hash_file(file_path))
+            )
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    # Hashes stay valid for the files they were computed from
+    pass
@@ -1,94 +1,134 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Dict
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from typing import List, Dict, Optional
+from app.core.cache import cached_response, track_scope, LIBRARY_SCOPE
+from app.core.database import get_async_db
+from app.core.encoding import encoded_response
+from app.core.metrics import ANALYSIS_DURATION
 from app.models.models import Track, TrackAnalysis
-from app.schemas.schemas import TrackAnalysisResponse
+from app.schemas.schemas import TrackAnalysisResponse, TrackSummaryResponse, BeatWindowResponse
+from app.services import analysis_pool
 from app.services.audio_analysis import AudioAnalysisService
+from app.services.beat_grid import BeatGrid
+from app.services.library_snapshot import LibrarySnapshotService
+from app.services.library_sync import LibrarySyncService
 
 router = APIRouter()
 
 @router.get("/{track_id}", response_model=TrackAnalysisResponse)
-async def get_track_analysis(track_id: int, db: Session = Depends(get_db)):
-    """Get detailed analysis for a track"""
-    analysis = db.query(TrackAnalysis).filter(TrackAnalysis.track_id == track_id).first()
+async def get_track_analysis(track_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get detailed analysis for a track (cached, with an ETag)"""
+    async def load():
+        analysis = await db.scalar(select(TrackAnalysis).where(TrackAnalysis.track_id == track_id))
+        if not analysis:
+            raise HTTPException(status_code=404, detail="Analysis not found")
+        return TrackAnalysisResponse.model_validate(analysis)
+    
+    return await cached_response(request, "analysis", [track_id], [track_scope(track_id)], load)
+
+@router.get("/{track_id}/beats", response_model=BeatWindowResponse)
+async def get_beats(
+    track_id: int,
+    request: Request,
+    start: float = 0.0,
+    end: Optional[float] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Expand the beat grid of a track to beat times between start and end (seconds)"""
+    analysis = await db.scalar(
+        select(TrackAnalysis)
+        .options(undefer(TrackAnalysis.beat_times))
+        .where(TrackAnalysis.track_id == track_id)
+    )
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found")
-    return analysis
+    
+    grid = BeatGrid.from_analysis(analysis)
+    if grid is None:
+        raise HTTPException(status_code=404, detail="Beat grid not found")
+    
+    if end is None:
+        end = grid.beat_time(len(grid) - 1)
+    
+    return encoded_response(request, BeatWindowResponse(
+        track_id=track_id,
+        start=start,
+        end=end,
+        beats=grid.beats_between(start, end).tolist()
+    ))
 
 @router.post("/{track_id}/reanalyze", response_model=TrackAnalysisResponse)
-async def reanalyze_track(track_id: int, db: Session = Depends(get_db)):
+async def reanalyze_track(track_id: int, db: AsyncSession = Depends(get_async_db)):
     """Re-analyze a track"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = await db.scalar(select(Track).where(Track.id == track_id))
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
-    # Re-analyze
-    analysis_result = AudioAnalysisService.analyze_track(track.file_path)
+    # Re-analyze (in an analysis process)
+    with ANALYSIS_DURATION.labels("reanalyze").time():
+        analysis_result = await analysis_pool.analyze(track.file_path)
     
-    # Update track
-    track.bpm = analysis_result['bpm']
-    track.key = analysis_result['key']
-    track.energy = analysis_result['energy_level']
-    track.waveform_data = analysis_result['waveform_data']
-    
-    # Update or create analysis
-    analysis = db.query(TrackAnalysis).filter(TrackAnalysis.track_id == track_id).first()
-    if analysis:
-        analysis.bpm = analysis_result['bpm']
-        analysis.key = analysis_result['key']
-        analysis.camelot_key = analysis_result['camelot_key']
-        analysis.energy_level = analysis_result['energy_level']
-        analysis.structure = analysis_result['structure']
-        analysis.beat_positions = analysis_result['beat_positions']
-        analysis.spectral_centroid = analysis_result['spectral_centroid']
-        analysis.spectral_rolloff = analysis_result['spectral_rolloff']
-    else:
-        analysis = TrackAnalysis(
-            track_id=track_id,
-            bpm=analysis_result['bpm'],
-            key=analysis_result['key'],
-            camelot_key=analysis_result['camelot_key'],
-            energy_level=analysis_result['energy_level'],
-            structure=analysis_result['structure'],
-            beat_positions=analysis_result['beat_positions'],
-            spectral_centroid=analysis_result['spectral_centroid'],
-            spectral_rolloff=analysis_result['spectral_rolloff']
-        )
-        db.add(analysis)
+    # Update track and analysis
+    await db.run_sync(LibrarySyncService.apply_analysis, track, analysis_result)
+    await db.commit()
     
-    db.commit()
-    db.refresh(analysis)
+    return await db.scalar(
+        select(TrackAnalysis)
+        .where(TrackAnalysis.track_id == track_id)
+        .execution_options(populate_existing=True)
+    )
+
+@router.get("/{track_id}/duplicates", response_model=List[TrackSummaryResponse])
+async def get_duplicates(track_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Other copies of the same recording: the original and its duplicates"""
+    track = await db.scalar(select(Track).where(Track.id == track_id))
+    if not track:
+        raise HTTPException(status_code=404, detail="Track not found")
     
-    return analysis
+    original_id = track.duplicate_of or track.id
+    duplicates = await db.scalars(
+        select(Track)
+        .where(
+            or_(Track.id == original_id, Track.duplicate_of == original_id),
+            Track.id != track_id
+        )
+        .order_by(Track.id)
+    )
+    return duplicates.all()
 
 @router.get("/{track_id}/compatible")
 async def get_compatible_tracks(
     track_id: int,
+    request: Request,
     bpm_tolerance: float = 10.0,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get tracks compatible for mixing with the given track"""
+    """
+    Get tracks compatible for mixing with the given track
+    Cached with an ETag until any track or analysis in the library changes
+    """
+    return await cached_response(
+        request, "compatible", [track_id, bpm_tolerance, limit], [LIBRARY_SCOPE],
+        lambda: _compatible_tracks(db, track_id, bpm_tolerance, limit)
+    )
+
+async def _compatible_tracks(
+    db: AsyncSession,
+    track_id: int,
+    bpm_tolerance: float,
+    limit: int
+) -> List[Dict]:
+    """Tracks compatible with a track, best first"""
     # Get source track analysis
-    source_analysis = db.query(TrackAnalysis).filter(TrackAnalysis.track_id == track_id).first()
+    source_analysis = await db.scalar(select(TrackAnalysis).where(TrackAnalysis.track_id == track_id))
     if not source_analysis:
         raise HTTPException(status_code=404, detail="Track analysis not found")
     
-    # Get all other tracks with analysis
-    all_tracks = db.query(Track).join(TrackAnalysis).all()
-    
-    # Convert to dict format for analysis service
-    tracks_data = []
-    for track in all_tracks:
-        tracks_data.append({
-            'id': track.id,
-            'title': track.title,
-            'artist': track.artist,
-            'bpm': track.analysis.bpm if track.analysis else None,
-            'camelot_key': track.analysis.camelot_key if track.analysis else None,
-            'energy_level': track.analysis.energy_level if track.analysis else None
-        })
+    # All tracks with analysis, one copy per recording (kept in memory)
+    tracks_data = await LibrarySnapshotService.analyzed_tracks(db)
     
     source_data = {
         'track_id': track_id,
@@ -0,0 +1,107 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from typing import Dict, List
+from app.api.tracks import ALLOWED_EXTENSIONS
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.locks import JobLock
+from app.schemas.schemas import LibrarySyncRequest
+from app.services.library_sync import LibrarySyncService
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import tempfile
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# State of the running or last sync, shared by the API workers (written by
+# the holder of LibrarySyncService.sync_lock)
+SYNC_STATUS_PATH = os.path.join(settings.UPLOAD_DIR, 'library_sync.json')
+
+def _write_status(status: Dict):
+    """Atomically replace the sync status"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(SYNC_STATUS_PATH), suffix='.part')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(status, f)
+    os.replace(temp_path, SYNC_STATUS_PATH)
+
+def _sync_library_job(directories: List[str], analyze: bool, status: Dict, lock: JobLock):
+    """Background job syncing library folders with its own session, releasing the sync lock"""
+    def progress(stats: Dict):
+        status.update(stats)
+        _write_status(status)
+    
+    db = SessionLocal()
+    try:
+        LibrarySyncService.sync(
+            db, directories, ALLOWED_EXTENSIONS,
+            analyze=analyze,
+            progress=progress
+        )
+        status['status'] = 'completed'
+    except Exception as e:
+        logger.error(f"Library sync failed: {e}")
+        status.update({'status': 'failed', 'error': str(e)})
+    finally:
+        status['finished_at'] = datetime.now(timezone.utc).isoformat()
+        try:
+            _write_status(status)
+        finally:
+            lock.release()
+            db.close()
+
+def _is_library_folder(directory: str) -> bool:
+    """Whether a folder is one of LIBRARY_DIRS or inside one"""
+    path = os.path.realpath(directory)
+    for library_dir in settings.LIBRARY_DIRS:
+        root = os.path.realpath(library_dir)
+        if path == root or path.startswith(root + os.sep):
+            return True
+    return False
+
+@router.post("/sync", status_code=202)
+async def sync_library(request: LibrarySyncRequest, background_tasks: BackgroundTasks):
+    """
+    Sync music folders into the library in the background
+    Rescans only read new and changed files; tracks of deleted files are removed
+    """
+    directories = request.directories or settings.LIBRARY_DIRS
+    if not directories:
+        raise HTTPException(status_code=400, detail="No library folders configured (LIBRARY_DIRS)")
+    
+    outside = [directory for directory in directories if not _is_library_folder(directory)]
+    if outside:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Not in LIBRARY_DIRS: {', '.join(outside)}"
+        )
+    
+    # Held until the job ends, so syncs started by other workers (or the
+    # command line) are refused too
+    lock = LibrarySyncService.sync_lock()
+    if not lock.acquire():
+        raise HTTPException(status_code=409, detail="A library sync is already running")
+    
+    status = {
+        'status': 'running',
+        'directories': directories,
+        'started_at': datetime.now(timezone.utc).isoformat()
+    }
+    try:
+        _write_status(status)
+    except OSError:
+        lock.release()
+        raise
+    background_tasks.add_task(_sync_library_job, directories, request.analyze, status, lock)
+    
+    return {"message": "Library sync started", "directories": directories}
+
+@router.get("/sync")
+async def get_sync_status():
+    """Progress of the current or last library sync"""
+    try:
+        with open(SYNC_STATUS_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'status': 'idle'}
@@ -1,25 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.core.database import get_db
-from app.models.models import Mix, Track
-from app.schemas.schemas import MixCreate, MixResponse, AutoMixRequest, AutoMixResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from typing import Dict, Iterator, List, Optional
+from datetime import datetime
+from app.core.database import get_async_db, SessionLocal
+from app.core.encoding import encoded_response
+from app.core.http import file_response
+from app.core.locks import JobLock
+from app.core.pagination import keyset_page, MAX_PAGE_SIZE
+from app.models.models import Mix, Track, TrackAnalysis
+from app.schemas.schemas import (
+    MixCreate, MixResponse, MixTimelineResponse, TransitionPreviewRequest,
+    AutoMixRequest, AutoMixResponse
+)
 from app.services.auto_mixer import AutoMixerService
+from app.services.mix_renderer import MixRendererService, EXPORT_FORMATS, STREAM_FORMATS, SAMPLE_RATE
+from app.services.mix_timeline import MixTimelineService
+from app.services.transition_preview import TransitionPreviewService, PREVIEW_MEDIA_TYPE
+import json
 import logging
+import os
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Sort keys of the mix list; each has a composite (column, id) index
+MIX_SORTS = {
+    'created_at': Mix.created_at,
+    'name': Mix.name,
+    'duration': Mix.duration
+}
+
 @router.post("/mixes", response_model=MixResponse)
-async def create_mix(mix: MixCreate, db: Session = Depends(get_db)):
+async def create_mix(mix: MixCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new mix"""
     # Calculate total duration from tracklist
+    track_ids = {item.get('track_id') for item in mix.tracklist}
+    durations = dict((await db.execute(
+        select(Track.id, Track.duration).where(Track.id.in_(track_ids))
+    )).all())
     total_duration = 0.0
     for track_item in mix.tracklist:
-        track_id = track_item.get('track_id')
-        track = db.query(Track).filter(Track.id == track_id).first()
-        if track:
-            total_duration += track.duration
+        total_duration += durations.get(track_item.get('track_id')) or 0.0
     
     new_mix = Mix(
         name=mix.name,
@@ -30,46 +56,319 @@ async def create_mix(mix: MixCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_mix)
-    db.commit()
-    db.refresh(new_mix)
+    await db.commit()
+    await db.refresh(new_mix)
     
     return new_mix
 
 @router.get("/mixes", response_model=List[MixResponse])
 async def list_mixes(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    request: Request,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    sort: str = Query("created_at", description=f"One of: {', '.join(MIX_SORTS)}"),
+    order: str = Query("desc", description="asc or desc"),
+    duration_min: Optional[float] = None,
+    duration_max: Optional[float] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """List all mixes"""
-    mixes = db.query(Mix).offset(skip).limit(limit).all()
-    return mixes
+    """
+    List mixes, filtered and sorted, one page at a time
+    The cursor for the next page is returned in the X-Next-Cursor header
+    """
+    if sort not in MIX_SORTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort. Allowed: {', '.join(MIX_SORTS)}"
+        )
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Invalid order. Allowed: asc, desc")
+    
+    query = select(Mix)
+    if duration_min is not None:
+        query = query.where(Mix.duration >= duration_min)
+    if duration_max is not None:
+        query = query.where(Mix.duration <= duration_max)
+    if created_after is not None:
+        query = query.where(Mix.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(Mix.created_at < created_before)
+    
+    try:
+        mixes, next_cursor = await keyset_page(
+            db, query, sort, MIX_SORTS[sort], Mix.id,
+            descending=order == "desc", limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return encoded_response(request, [MixResponse.model_validate(mix) for mix in mixes], headers)
 
 @router.get("/mixes/{mix_id}", response_model=MixResponse)
-async def get_mix(mix_id: int, db: Session = Depends(get_db)):
+async def get_mix(mix_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Get a specific mix"""
-    mix = db.query(Mix).filter(Mix.id == mix_id).first()
+    mix = await db.get(Mix, mix_id)
+    if not mix:
+        raise HTTPException(status_code=404, detail="Mix not found")
+    return encoded_response(request, MixResponse.model_validate(mix))
+
+@router.get("/mixes/{mix_id}/timeline", response_model=MixTimelineResponse)
+async def get_mix_timeline(
+    mix_id: int,
+    request: Request,
+    resolution: float = Query(1.0, ge=0.25, le=60.0, description="Seconds per curve point"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get BPM, key and energy of a mix over time, built from cached track envelopes"""
+    mix = await db.get(Mix, mix_id)
+    if not mix:
+        raise HTTPException(status_code=404, detail="Mix not found")
+    
+    track_ids = {item.get('track_id') for item in mix.tracklist}
+    tracks = (await db.scalars(
+        select(Track)
+        .options(joinedload(Track.analysis).undefer(TrackAnalysis.energy_envelope))
+        .where(Track.id.in_(track_ids))
+    )).all()
+    
+    timeline = MixTimelineService.build_timeline(
+        mix.tracklist,
+        mix.transitions,
+        {track.id: track for track in tracks},
+        resolution=resolution
+    )
+    
+    return encoded_response(
+        request, MixTimelineResponse(mix_id=mix_id, resolution=resolution, **timeline)
+    )
+
+def _render_mix_job(mix_id: int, export_format: str, lock: JobLock):
+    """Background job rendering a mix with its own session, releasing its lock"""
+    db = SessionLocal()
+    try:
+        MixRendererService.render_mix(db, mix_id, export_format, lock=lock)
+    except Exception as e:
+        logger.error(f"Rendering mix {mix_id} failed: {e}")
+    finally:
+        lock.release()
+        db.close()
+
+@router.post("/mixes/{mix_id}/render", status_code=202)
+async def render_mix(
+    mix_id: int,
+    background_tasks: BackgroundTasks,
+    format: str = Query("wav", description="Export format: wav or flac"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Render a mix to an audio file in the background
+    Re-rendering an interrupted render resumes from its completed segments
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid export format. Allowed: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    mix = await db.get(Mix, mix_id)
+    if not mix:
+        raise HTTPException(status_code=404, detail="Mix not found")
+    
+    # Held until the job ends, so renders started by other workers (or the
+    # command line) are refused too
+    lock = MixRendererService.render_lock(mix_id, format)
+    if not lock.acquire():
+        raise HTTPException(status_code=409, detail="Mix is already being rendered")
+    
+    background_tasks.add_task(_render_mix_job, mix_id, format, lock)
+    
+    return {"message": "Render started", "mix_id": mix_id, "format": format}
+
+@router.get("/mixes/{mix_id}/render")
+async def get_render_status(
+    mix_id: int,
+    format: str = Query("wav", description="Export format: wav or flac"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the progress of a mix render"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid export format. Allowed: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    mix = await db.get(Mix, mix_id)
+    if not mix:
+        raise HTTPException(status_code=404, detail="Mix not found")
+    
+    return MixRendererService.render_status(mix, format)
+
+@router.get("/mixes/{mix_id}/export")
+async def get_mix_export(mix_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Download the rendered audio of a mix"""
+    mix = await db.get(Mix, mix_id)
+    if not mix:
+        raise HTTPException(status_code=404, detail="Mix not found")
+    
+    if not mix.export_path or not os.path.exists(mix.export_path):
+        raise HTTPException(status_code=404, detail="Mix has not been rendered")
+    
+    media_type = EXPORT_FORMATS[mix.export_format][2]
+    return FileResponse(
+        mix.export_path,
+        media_type=media_type,
+        filename=f"{mix.name}.{mix.export_format}"
+    )
+
+@router.get("/mixes/{mix_id}/stream")
+async def stream_mix(
+    mix_id: int,
+    format: str = Query("mp3", description="Stream format: mp3 or ogg"),
+    start: float = Query(0.0, ge=0.0, description="Position to start playback from, in seconds"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Stream a mix as compressed audio while it is being rendered
+    Audio is rendered only as fast as the client reads it
+    """
+    if format not in STREAM_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid stream format. Allowed: {', '.join(STREAM_FORMATS)}"
+        )
+    
+    mix = await db.get(Mix, mix_id)
+    if not mix:
+        raise HTTPException(status_code=404, detail="Mix not found")
+    
+    # The plan only holds file paths, so the stream needs no database session
+    plan = await db.run_sync(MixRendererService.load_plan, mix)
+    start_frame = int(round(start * SAMPLE_RATE))
+    if start_frame >= MixRendererService.total_frames(plan):
+        raise HTTPException(status_code=400, detail="Start position is past the end of the mix")
+    
+    # Starting mid-mix seeks into stretched tracks instead of decoding them from the top
+    blocks = MixRendererService.iter_blocks(plan, start_frame, exact=start_frame == 0)
+    return StreamingResponse(
+        MixRendererService.encode_blocks(blocks, format),
+        media_type=STREAM_FORMATS[format][2],
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering (nginx)
+        }
+    )
+
+def _load_tracks(db: Session, tracklist: List[Dict]) -> Dict[int, Track]:
+    """Load the tracks of a tracklist, with analysis, by id"""
+    track_ids = {item.get('track_id') for item in tracklist}
+    tracks = (
+        db.query(Track)
+        .options(joinedload(Track.analysis))
+        .filter(Track.id.in_(track_ids))
+        .all()
+    )
+    return {track.id: track for track in tracks}
+
+def _render_preview(
+    tracklist: List[Dict],
+    transitions: Optional[List[Dict]],
+    index: int,
+    padding: float
+):
+    """Load the tracks and render (or find) a preview with a session of its own"""
+    db = SessionLocal()
+    try:
+        tracks = _load_tracks(db, tracklist)
+        # Skipping a deleted track would shift the transition indexes
+        for item in tracklist:
+            if item.get('track_id') not in tracks:
+                raise ValueError(f"Track {item.get('track_id')} not found")
+        return TransitionPreviewService.get_preview(
+            tracklist, transitions, tracks, index, padding
+        )
+    finally:
+        db.close()
+
+async def _transition_preview(
+    http_request: Request,
+    tracklist: List[Dict],
+    transitions: Optional[List[Dict]],
+    index: int,
+    padding: float
+) -> Response:
+    """Serve a cached transition preview, rendering it on a miss"""
+    try:
+        # Rendering blocks for a fraction of a second; keep it off the event loop
+        path, key = await run_in_threadpool(
+            _render_preview, tracklist, transitions, index, padding
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Transition preview failed: {e}")
+        raise HTTPException(status_code=500, detail="Failed to render transition preview")
+    
+    # The cache key covers everything audible in the clip, so it is a strong ETag
+    return file_response(http_request, path, PREVIEW_MEDIA_TYPE, f'"{key}"')
+
+@router.get("/mixes/{mix_id}/transitions/{index}/preview")
+async def get_transition_preview(
+    mix_id: int,
+    index: int,
+    http_request: Request,
+    padding: float = Query(15.0, ge=1.0, le=60.0, description="Seconds before and after the overlap"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a short compressed clip of one transition of a saved mix"""
+    mix = await db.get(Mix, mix_id)
     if not mix:
         raise HTTPException(status_code=404, detail="Mix not found")
-    return mix
+    
+    return await _transition_preview(
+        http_request, mix.tracklist, mix.transitions, index, padding
+    )
+
+@router.post("/transitions/preview")
+async def preview_transition(
+    request: TransitionPreviewRequest,
+    http_request: Request
+):
+    """Get a short compressed clip of one transition of an unsaved (e.g. auto-generated) mix"""
+    return await _transition_preview(
+        http_request, request.tracklist, request.transitions, request.index, request.padding
+    )
 
 @router.delete("/mixes/{mix_id}")
-async def delete_mix(mix_id: int, db: Session = Depends(get_db)):
+async def delete_mix(mix_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a mix"""
-    mix = db.query(Mix).filter(Mix.id == mix_id).first()
+    mix = await db.get(Mix, mix_id)
     if not mix:
         raise HTTPException(status_code=404, detail="Mix not found")
     
-    db.delete(mix)
-    db.commit()
+    await db.delete(mix)
+    await db.commit()
     
     return {"message": "Mix deleted successfully"}
 
+def _generate_auto_mix(request: AutoMixRequest) -> Dict:
+    """Plan an auto-mix with a session of its own"""
+    db = SessionLocal()
+    try:
+        return AutoMixerService.generate_auto_mix(
+            db=db,
+            start_track_id=request.start_track_id,
+            target_duration_minutes=request.duration_minutes,
+            bpm_tolerance=request.bpm_tolerance,
+            energy_variation=request.energy_variation
+        )
+    finally:
+        db.close()
+
 @router.post("/auto-mix", response_model=AutoMixResponse)
-async def generate_auto_mix(
-    request: AutoMixRequest,
-    db: Session = Depends(get_db)
-):
+async def generate_auto_mix(request: AutoMixRequest, http_request: Request):
     """
     Generate an automatic mix based on preferences
     Uses intelligent track selection based on BPM, key compatibility, and energy levels
@@ -77,27 +376,78 @@ async def generate_auto_mix(
     try:
         logger.info(f"Generating auto-mix: {request.dict()}")
         
-        # Generate the auto-mix
-        result = AutoMixerService.generate_auto_mix(
-            db=db,
-            start_track_id=request.start_track_id,
-            target_duration_minutes=request.duration_minutes,
-            bpm_tolerance=request.bpm_tolerance,
-            energy_variation=request.energy_variation
-        )
+        # Generate the auto-mix (CPU-bound, kept off the event loop)
+        result = await run_in_threadpool(_generate_auto_mix, request)
         
         logger.info(f"Auto-mix generated: {result['track_count']} tracks")
         
-        return AutoMixResponse(
+        return encoded_response(http_request, AutoMixResponse(
             tracklist=result['tracklist'],
             transitions=result['transitions'],
             total_duration=result['total_duration'],
             track_count=result['track_count'],
             metadata=result['metadata']
-        )
+        ))
+    except ValueError as e:
+        logger.error(f"Auto-mix generation failed: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Auto-mix generation error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate auto-mix")
+
+def _format_sse(event: Dict) -> str:
+    """Format a planner event as a Server-Sent Events message"""
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+@router.post("/auto-mix/stream")
+async def stream_auto_mix(request: AutoMixRequest):
+    """
+    Generate an automatic mix and stream it as Server-Sent Events
+    Each track and transition is sent as soon as the planner commits to it,
+    followed by a final 'complete' event with the same payload as /auto-mix
+    """
+    logger.info(f"Streaming auto-mix: {request.dict()}")
+    
+    # The stream outlives the request, so it owns its own session
+    db = SessionLocal()
+    events = AutoMixerService.iter_auto_mix(
+        db=db,
+        start_track_id=request.start_track_id,
+        target_duration_minutes=request.duration_minutes,
+        bpm_tolerance=request.bpm_tolerance,
+        energy_variation=request.energy_variation
+    )
+    
+    # Pull the first event eagerly so setup errors still map to HTTP status
+    # codes; it runs the candidate query and scoring setup, off the event loop
+    try:
+        first_event = await run_in_threadpool(next, events)
     except ValueError as e:
+        db.close()
         logger.error(f"Auto-mix generation failed: {e}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        db.close()
         logger.error(f"Auto-mix generation error: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate auto-mix")
+    
+    def event_stream() -> Iterator[str]:
+        yield _format_sse(first_event)
+        try:
+            for event in events:
+                yield _format_sse(event)
+        except Exception as e:
+            logger.error(f"Auto-mix stream error: {e}")
+            yield _format_sse({'event': 'error', 'data': {'detail': "Failed to generate auto-mix"}})
+    
+    # The session is closed once the response ends, also when the client
+    # disconnects before the stream starts
+    return StreamingResponse(
+        event_stream(),
+        background=BackgroundTask(db.close),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering (nginx)
+        }
+    )
@@ -1,17 +1,30 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from typing import Callable, List, Optional
+from datetime import datetime
 import os
-import shutil
-from mutagen import File as MutagenFile
-from app.core.database import get_db
-from app.models.models import Track, TrackAnalysis, CuePoint
+from app.core.cache import cached_response, track_scope
+from app.core.database import engine, get_async_db, SessionLocal
+from app.core.encoding import encoded_response
+from app.core.metrics import ANALYSIS_DURATION
+from app.core.http import bytes_response, file_response
+from app.core.pagination import keyset_page, MAX_PAGE_SIZE
+from app.core.uploads import receive_file, UploadTooLargeError
+from app.models.models import Track, CuePoint
 from app.schemas.schemas import (
-    TrackResponse, TrackCreate, CuePointCreate, CuePointResponse,
+    TrackResponse, TrackSummaryResponse, TrackCreate, CuePointCreate, CuePointResponse,
     SpotifyImportRequest, SpotifyImportResponse
 )
-from app.services.audio_analysis import AudioAnalysisService
+from app.services import analysis_pool
+from app.services.file_storage import FileStorageService
+from app.services.fingerprint import FingerprintService
+from app.services.library_sync import LibrarySyncService
+from app.services.renditions import RenditionService, PREVIEW_MEDIA_TYPE
+from app.services.search import SearchService, MAX_SEARCH_RESULTS
+from app.services.waveform import WaveformService, WAVEFORM_FORMATS
 from app.services.spotify_integration import SpotifyIntegrationService
 from app.core.config import settings
 import logging
@@ -20,118 +33,247 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 ALLOWED_EXTENSIONS = {'.mp3', '.wav', '.flac', '.aac', '.m4a'}
+AUDIO_MEDIA_TYPES = {
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/wav',
+    '.flac': 'audio/flac',
+    '.aac': 'audio/aac',
+    '.m4a': 'audio/mp4'
+}
 
-@router.post("/upload", response_model=TrackResponse)
+# Sort keys of the track list; each has a composite (column, id) index
+TRACK_SORTS = {
+    'created_at': Track.created_at,
+    'title': Track.title,
+    'artist': Track.artist,
+    'bpm': Track.bpm,
+    'energy': Track.energy
+}
+
+# The upload body is parsed by receive_file, so describe it for the OpenAPI docs
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+async def _get_track(db: AsyncSession, track_id: int, waveform: bool = False) -> Optional[Track]:
+    """Get a track by id, optionally loading its (deferred) waveform"""
+    query = select(Track).where(Track.id == track_id)
+    if waveform:
+        query = query.options(undefer(Track.waveform))
+    return await db.scalar(query)
+
+@router.post("/upload", response_model=TrackResponse, openapi_extra=UPLOAD_REQUEST_BODY)
 async def upload_track(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Upload and analyze a new track"""
-    # Validate file extension
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    if file_ext not in ALLOWED_EXTENSIONS:
+    """
+    Upload and analyze a new track
+    The file is streamed to disk and stored under its content hash; uploading
+    a file that is already in the library returns the existing track
+    """
+    # Stream the file to disk, hashing it on the way
+    try:
+        upload = await receive_file(
+            request,
+            "file",
+            settings.UPLOAD_DIR,
+            settings.MAX_UPLOAD_SIZE,
+            extensions=ALLOWED_EXTENSIONS
+        )
+    except UploadTooLargeError:
         raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file format. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+            status_code=413,
+            detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB"
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Create uploads directory if it doesn't exist
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    content_hash = upload['content_hash']
+    existing = await db.scalar(
+        select(Track).options(undefer(Track.waveform)).where(Track.content_hash == content_hash)
+    )
+    if existing:
+        os.remove(upload['path'])
+        return existing
     
-    # Save file
-    file_path = os.path.join(settings.UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    file_ext = os.path.splitext(upload['filename'])[1].lower()
+    file_path = FileStorageService.store(upload['path'], content_hash, file_ext)
+    file_size = upload['size']
     
     # Extract metadata using mutagen
-    try:
-        audio_file = MutagenFile(file_path, easy=True)
-        title = audio_file.get('title', [file.filename])[0] if audio_file else file.filename
-        artist = audio_file.get('artist', ['Unknown'])[0] if audio_file else 'Unknown'
-        album = audio_file.get('album', [None])[0] if audio_file else None
-        genre = audio_file.get('genre', [None])[0] if audio_file else None
-    except:
-        title = file.filename
-        artist = 'Unknown'
-        album = None
-        genre = None
-    
-    # Get file size
-    file_size = os.path.getsize(file_path)
-    
-    # Analyze track
-    analysis_result = AudioAnalysisService.analyze_track(file_path)
+    tags = await run_in_threadpool(FileStorageService.read_tags, file_path, upload['filename'])
+    
+    # Analyze track (in an analysis process); analysis stops early for
+    # another copy or encoding of a track already in the library
+    with ANALYSIS_DURATION.labels("upload").time():
+        analysis_result = await analysis_pool.analyze(file_path, find_duplicates=True)
     
     # Create track record
     track = Track(
-        title=title,
-        artist=artist,
-        album=album,
-        genre=genre,
+        title=tags['title'],
+        artist=tags['artist'],
+        album=tags['album'],
+        genre=tags['genre'],
         duration=analysis_result['duration'],
         file_path=file_path,
         file_format=file_ext,
         file_size=file_size,
-        bpm=analysis_result['bpm'],
-        key=analysis_result['key'],
-        energy=analysis_result['energy_level'],
-        waveform_data=analysis_result['waveform_data']
+        content_hash=content_hash
     )
     
     db.add(track)
-    db.commit()
-    db.refresh(track)
-    
-    # Create detailed analysis record
-    track_analysis = TrackAnalysis(
-        track_id=track.id,
-        bpm=analysis_result['bpm'],
-        key=analysis_result['key'],
-        camelot_key=analysis_result['camelot_key'],
-        energy_level=analysis_result['energy_level'],
-        structure=analysis_result['structure'],
-        beat_positions=analysis_result['beat_positions'],
-        spectral_centroid=analysis_result['spectral_centroid'],
-        spectral_rolloff=analysis_result['spectral_rolloff']
-    )
+    await db.flush()
+    
+    # Store the analysis (or the original's, for a duplicate)
+    await db.run_sync(LibrarySyncService.apply_analysis, track, analysis_result)
+    await db.commit()
+    track = await _get_track(db, track.id, waveform=True)
     
-    db.add(track_analysis)
-    db.commit()
+    # Encode the compact rendition decks load, after the response is sent
+    background_tasks.add_task(RenditionService.create_preview, file_path, content_hash)
     
     return track
 
-@router.get("/", response_model=List[TrackResponse])
+@router.get("/", response_model=List[TrackSummaryResponse])
 async def list_tracks(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    request: Request,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    sort: str = Query("created_at", description=f"One of: {', '.join(TRACK_SORTS)}"),
+    order: str = Query("desc", description="asc or desc"),
+    bpm_min: Optional[float] = None,
+    bpm_max: Optional[float] = None,
+    key: Optional[List[str]] = Query(None, description="Musical key; repeat for several keys"),
+    genre: Optional[str] = None,
+    artist: Optional[str] = None,
+    energy_min: Optional[float] = None,
+    energy_max: Optional[float] = None,
+    added_after: Optional[datetime] = None,
+    added_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    List tracks, filtered and sorted, one page at a time
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    Waveforms are left out; get them from /{track_id}/waveform
+    """
+    if sort not in TRACK_SORTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort. Allowed: {', '.join(TRACK_SORTS)}"
+        )
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Invalid order. Allowed: asc, desc")
+    
+    query = select(Track)
+    if bpm_min is not None:
+        query = query.where(Track.bpm >= bpm_min)
+    if bpm_max is not None:
+        query = query.where(Track.bpm <= bpm_max)
+    if key:
+        query = query.where(Track.key.in_(key))
+    if genre is not None:
+        query = query.where(Track.genre == genre)
+    if artist is not None:
+        query = query.where(Track.artist == artist)
+    if energy_min is not None:
+        query = query.where(Track.energy >= energy_min)
+    if energy_max is not None:
+        query = query.where(Track.energy <= energy_max)
+    if added_after is not None:
+        query = query.where(Track.created_at >= added_after)
+    if added_before is not None:
+        query = query.where(Track.created_at < added_before)
+    
+    try:
+        tracks, next_cursor = await keyset_page(
+            db, query, sort, TRACK_SORTS[sort], Track.id,
+            descending=order == "desc", limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return encoded_response(
+        request, [TrackSummaryResponse.model_validate(track) for track in tracks], headers
+    )
+
+def _search_in_session(search: Callable, *args):
+    """Run a SearchService function with a session of its own"""
+    db = SessionLocal()
+    try:
+        return search(db, *args)
+    finally:
+        db.close()
+
+async def _run_search(db: AsyncSession, search: Callable, *args):
+    """
+    Run a SearchService function (search or match)
+    
+    Outside PostgreSQL there are no search indexes and every track is scored
+    in Python, so the search runs in the threadpool with a session of its
+    own instead of blocking the event loop; its tracks are detached.
+    """
+    if engine.dialect.name == 'postgresql':
+        return await db.run_sync(search, *args)
+    return await run_in_threadpool(_search_in_session, search, *args)
+
+@router.get("/search", response_model=List[TrackSummaryResponse])
+async def search_tracks(
+    q: str = Query(..., min_length=1, description="Words of the title, artist or album; typos are tolerated"),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """List all tracks"""
-    tracks = db.query(Track).offset(skip).limit(limit).all()
-    return tracks
+    """Search tracks by title, artist and album, best matches first"""
+    return await _run_search(db, SearchService.search, q, limit)
 
 @router.get("/{track_id}", response_model=TrackResponse)
-async def get_track(track_id: int, db: Session = Depends(get_db)):
-    """Get a specific track"""
-    track = db.query(Track).filter(Track.id == track_id).first()
-    if not track:
-        raise HTTPException(status_code=404, detail="Track not found")
-    return track
+async def get_track(track_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get a specific track (cached, with an ETag)"""
+    async def load():
+        track = await _get_track(db, track_id, waveform=True)
+        if not track:
+            raise HTTPException(status_code=404, detail="Track not found")
+        return TrackResponse.model_validate(track)
+    
+    return await cached_response(request, "track", [track_id], [track_scope(track_id)], load)
 
 @router.delete("/{track_id}")
-async def delete_track(track_id: int, db: Session = Depends(get_db)):
+async def delete_track(track_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a track"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = await _get_track(db, track_id)
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
-    # Delete file
-    if os.path.exists(track.file_path):
+    # Delete the file, unless it belongs to a synced library folder
+    if FileStorageService.is_stored(track.file_path) and os.path.exists(track.file_path):
         os.remove(track.file_path)
     
+    # A duplicate takes over as the original of the track's other copies
+    await db.run_sync(FingerprintService.remove, track)
+    
+    # Renditions are stored by content hash and may be shared with a duplicate
+    if track.content_hash and not await db.scalar(
+        select(Track.id).where(Track.content_hash == track.content_hash, Track.id != track.id)
+    ):
+        RenditionService.delete_preview(track.content_hash)
+    
     # Delete from database
-    db.delete(track)
-    db.commit()
+    await db.delete(track)
+    await db.commit()
     
     return {"message": "Track deleted successfully"}
 
@@ -139,10 +281,10 @@ async def delete_track(track_id: int, db: Session = Depends(get_db)):
 async def add_cue_point(
     track_id: int,
     cue_point: CuePointCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add a cue point to a track"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = await _get_track(db, track_id)
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
@@ -154,33 +296,101 @@ async def add_cue_point(
     )
     
     db.add(cue)
-    db.commit()
-    db.refresh(cue)
+    await db.commit()
+    await db.refresh(cue)
     
     return cue
 
 @router.get("/{track_id}/cue-points", response_model=List[CuePointResponse])
-async def get_cue_points(track_id: int, db: Session = Depends(get_db)):
-    """Get all cue points for a track"""
-    cue_points = db.query(CuePoint).filter(CuePoint.track_id == track_id).all()
-    return cue_points
+async def get_cue_points(track_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get all cue points for a track (cached, with an ETag)"""
+    async def load():
+        cue_points = await db.scalars(select(CuePoint).where(CuePoint.track_id == track_id))
+        return [CuePointResponse.model_validate(cue) for cue in cue_points]
+    
+    return await cached_response(request, "cue_points", [track_id], [track_scope(track_id)], load)
 
 @router.get("/{track_id}/audio")
-async def get_track_audio(track_id: int, db: Session = Depends(get_db)):
-    """Serve audio file for a track"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+async def get_track_audio(
+    track_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    rendition: str = Query("original", description="original or preview (compact MP3)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Serve audio file for a track
+    Supports byte ranges (for seeking) and ETag revalidation
+    """
+    if rendition not in ('original', 'preview'):
+        raise HTTPException(status_code=400, detail="Invalid rendition. Allowed: original, preview")
+    
+    track = await _get_track(db, track_id)
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
     if not os.path.exists(track.file_path):
         raise HTTPException(status_code=404, detail="Audio file not found")
     
-    return FileResponse(track.file_path, media_type="audio/mpeg")
+    content_hash = track.content_hash
+    if content_hash:
+        etag = f'"{content_hash}"'
+    else:
+        # Synced tracks are hashed when analyzed (older tracks by migration
+        # 011); until then the ETag is the file's size and modification time
+        stat = os.stat(track.file_path)
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    
+    if rendition == 'preview' and content_hash:
+        preview_path = RenditionService.get_preview(content_hash)
+        if preview_path:
+            return file_response(
+                request, preview_path, PREVIEW_MEDIA_TYPE, f'"{content_hash}-preview"',
+                headers={'X-Audio-Rendition': 'preview'}
+            )
+        # Tracks uploaded before renditions existed get one now; until then
+        # the original is served
+        background_tasks.add_task(RenditionService.create_preview, track.file_path, content_hash)
+    
+    media_type = AUDIO_MEDIA_TYPES.get(track.file_format.lower(), 'application/octet-stream')
+    return file_response(
+        request, track.file_path, media_type, etag,
+        headers={'X-Audio-Rendition': 'original'}
+    )
+
+@router.get("/{track_id}/waveform")
+async def get_track_waveform(
+    track_id: int,
+    request: Request,
+    format: str = Query("uint8", description="Value encoding: uint8 (0-255) or float16 (0-1)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the overview waveform of a track as a binary array"""
+    if format not in WAVEFORM_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid waveform format. Allowed: {', '.join(WAVEFORM_FORMATS)}"
+        )
+    
+    track = await _get_track(db, track_id, waveform=True)
+    if not track:
+        raise HTTPException(status_code=404, detail="Track not found")
+    if not track.waveform:
+        raise HTTPException(status_code=404, detail="Waveform not available")
+    
+    # Waveforms are stored as uint8 already
+    content = track.waveform if format == 'uint8' else WaveformService.encode(track.waveform_data, format)
+    return bytes_response(
+        request,
+        content,
+        "application/octet-stream",
+        headers={"X-Waveform-Format": format}
+    )
 
 @router.post("/import/spotify", response_model=SpotifyImportResponse)
 async def import_from_spotify(
     request: SpotifyImportRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Import tracks from Spotify playlist, album, or track"""
     try:
@@ -188,7 +398,7 @@ async def import_from_spotify(
         spotify_service = SpotifyIntegrationService()
         
         # Import tracks from Spotify
-        spotify_tracks = spotify_service.import_from_url(request.url)
+        spotify_tracks = await run_in_threadpool(spotify_service.import_from_url, request.url)
         
         if not spotify_tracks:
             raise HTTPException(status_code=404, detail="No tracks found at the provided URL")
@@ -202,12 +412,12 @@ async def import_from_spotify(
             for track_info in spotify_tracks:
                 try:
                     # Search for existing track by title and artist
-                    existing_track = db.query(Track).filter(
-                        Track.title.ilike(f"%{track_info['title']}%"),
-                        Track.artist.ilike(f"%{track_info['artist']}%")
-                    ).first()
+                    match = await _run_search(
+                        db, SearchService.match, track_info['title'], track_info['artist']
+                    )
                     
-                    if existing_track:
+                    if match:
+                        existing_track = await db.get(Track, match.id)
                         # Update existing track with Spotify metadata
                         if track_info.get('bpm') and not existing_track.bpm:
                             existing_track.bpm = track_info['bpm']
@@ -216,7 +426,7 @@ async def import_from_spotify(
                         if track_info.get('energy') and not existing_track.energy:
                             existing_track.energy = track_info['energy']
                         
-                        db.commit()
+                        await db.commit()
                         matched_count += 1
                         logger.info(f"Matched Spotify track: {track_info['title']}")
                     else:
@@ -0,0 +1,271 @@
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set
+from app.core import library_events
+from app.core.config import settings
+from app.core.database import AFTER_COMMIT_TASKS
+from app.core.encoding import encode, negotiate
+from app.core.http import bytes_response
+from app.core.metrics import CACHE_LOOKUP_SECONDS, CACHE_LOOKUPS
+from app.models.models import CuePoint, Track, TrackAnalysis
+from app.core.redis_client import get_async_client, get_sync_client, redis_failed, RETRY_AFTER_ERROR
+import asyncio
+import redis
+import redis.asyncio
+import time
+
+# Cached responses are keyed by the versions of what they depend on: a change
+# bumps the version (INCR), so entries of older versions are never read again
+# and simply expire. A response stored while a change commits lands under the
+# old version and cannot be served stale.
+#
+# The library scope is versioned by the library changes this process has
+# received (see app.core.library_events), not by the counter in Redis: its
+# responses are built from in-memory data that reflects exactly those, while
+# the counter may be ahead of events still on their way.
+LIBRARY_SCOPE = "library"  # Any track or analysis; e.g. compatible tracks
+
+def track_scope(track_id: int) -> str:
+    """Scope of one track, its analysis and its cue points"""
+    return f"track:{track_id}"
+
+def _version_key(scope: str) -> str:
+    return f"cache:version:{scope}"
+
+# Per-endpoint counters of this process, see cache_stats
+_stats: Dict[str, Dict[str, float]] = {}
+
+# Scopes whose version bump failed: their responses are neither served from
+# nor stored in the cache by this process until a retry bumps them
+_unbumped: Set[str] = set()
+
+def _get_async_client() -> Optional[redis.asyncio.Redis]:
+    return get_async_client() if settings.CACHE_ENABLED else None
+
+def _get_sync_client() -> Optional[redis.Redis]:
+    return get_sync_client() if settings.CACHE_ENABLED else None
+
+def _record(name: str, outcome: str, started: Optional[float] = None):
+    """Count a 'hit', 'miss' or 'error', with the latency of hits and misses"""
+    stats = _stats.setdefault(name, {
+        'hit': 0, 'miss': 0, 'error': 0, 'hit_seconds': 0.0, 'miss_seconds': 0.0
+    })
+    stats[outcome] += 1
+    CACHE_LOOKUPS.labels(name, outcome).inc()
+    if started is not None:
+        seconds = time.perf_counter() - started
+        stats[outcome + '_seconds'] += seconds
+        CACHE_LOOKUP_SECONDS.labels(name, outcome).observe(seconds)
+
+async def cached_response(
+    request: Request,
+    name: str,
+    params: Sequence[Any],
+    scopes: Sequence[str],
+    load: Callable[[], Awaitable[Any]]
+) -> Response:
+    """
+    Serve a response from the Redis cache, building it on a miss
+    
+    Responses are encoded as the client asked (see app.core.encoding) and
+    cached per encoding. They carry an ETag and a matching If-None-Match
+    gets 304. When Redis is unavailable the response is built every time.
+    
+    Args:
+        request: The incoming request
+        name: Endpoint name, for the key and the stats
+        params: Request parameters the response depends on
+        scopes: Scopes (see track_scope) whose changes invalidate the response
+        load: Builds the response content (a Pydantic model or JSON-able data);
+              exceptions, e.g. HTTPException for 404, are not cached
+    """
+    started = time.perf_counter()
+    media_type = negotiate(request)
+    headers = {'Vary': 'Accept'}
+    client = _get_async_client()
+    if not _cacheable(scopes):
+        client = None
+    key = None
+    if client is not None:
+        try:
+            version = '.'.join(await _versions(client, scopes))
+            key = f"cache:{name}:{':'.join(map(str, params))}:{media_type}@{version}"
+            body = await client.get(key)
+            if body is not None:
+                _record(name, 'hit', started)
+                return bytes_response(request, body, media_type, headers)
+        except redis.RedisError as e:
+            redis_failed("cache read", e)
+            _record(name, 'error')
+            key = None
+    
+    body = encode(await load(), media_type)
+    if key is not None:
+        try:
+            await client.set(key, body, ex=settings.CACHE_TTL)
+        except redis.RedisError as e:
+            redis_failed("cache write", e)
+    _record(name, 'miss', started)
+    return bytes_response(request, body, media_type, headers)
+
+def _cacheable(scopes: Sequence[str]) -> bool:
+    """Whether responses of these scopes can be cached right now"""
+    # Without library changes the library version stands still
+    if LIBRARY_SCOPE in scopes and not library_events.is_live():
+        return False
+    return _unbumped.isdisjoint(scopes)
+
+async def _versions(client: redis.asyncio.Redis, scopes: Sequence[str]) -> List[str]:
+    """Current version of each scope, in one round trip"""
+    keys = [_version_key(scope) for scope in scopes if scope != LIBRARY_SCOPE]
+    stored = iter(await client.mget(keys) if keys else [])
+    return [
+        str(library_events.version()) if scope == LIBRARY_SCOPE else (next(stored) or b'0').decode()
+        for scope in scopes
+    ]
+
+def _scopes_to_bump(track_ids: Iterable[int]) -> Set[str]:
+    """Scopes of changed tracks, and those of earlier bumps that failed"""
+    if not settings.CACHE_ENABLED:
+        return set()
+    return _unbumped.union(track_scope(track_id) for track_id in track_ids)
+
+def invalidate(track_ids: Iterable[int]):
+    """
+    Invalidate cached responses of changed tracks, from sync code off the
+    event loop (see invalidate_async)
+    
+    Called after a commit (see register_session_hooks), in one round trip.
+    Library-wide responses are invalidated by the library version, which
+    app.core.library_events.publish bumps. Scopes whose bump fails are not
+    cached by this process until the next bump retries them.
+    
+    Args:
+        track_ids: Tracks whose row, analysis or cue points changed
+    """
+    scopes = _scopes_to_bump(track_ids)
+    if not scopes:
+        return
+    client = _get_sync_client()
+    if client is not None:
+        pipe = client.pipeline(transaction=False)
+        for scope in scopes:
+            pipe.incr(_version_key(scope))
+        try:
+            pipe.execute()
+            _unbumped.difference_update(scopes)
+            return
+        except redis.RedisError as e:
+            redis_failed("cache invalidation", e)
+    _unbumped.update(scopes)
+
+async def invalidate_async(track_ids: Iterable[int]):
+    """Invalidate cached responses of changed tracks from the event loop (see invalidate)"""
+    scopes = _scopes_to_bump(track_ids)
+    if not scopes:
+        return
+    client = _get_async_client()
+    if client is not None:
+        pipe = client.pipeline(transaction=False)
+        for scope in scopes:
+            pipe.incr(_version_key(scope))
+        try:
+            await pipe.execute()
+            _unbumped.difference_update(scopes)
+            return
+        except redis.RedisError as e:
+            redis_failed("cache invalidation", e)
+    _unbumped.update(scopes)
+
+async def retry_invalidations():
+    """
+    Retry failed cache invalidations and library change notices until
+    cancelled (a task started by the API lifespan), so other processes do
+    not keep serving what they invalidate
+    """
+    while True:
+        await asyncio.sleep(RETRY_AFTER_ERROR)
+        await invalidate_async(())
+        await library_events.publish_async(())
+
+# Invalidate cached responses of the tracks a transaction changed and
+# announce library changes to other processes (see app.core.library_events),
+# once it commits
+def _collect_changed_tracks(session, flush_context):
+    changed = session.info.setdefault('changed_tracks', set())
+    for obj in [*session.new, *session.dirty, *session.deleted]:
+        if isinstance(obj, Track):
+            changed.add(obj.id)
+            session.info['library_changed'] = True
+        elif isinstance(obj, TrackAnalysis):
+            changed.add(obj.track_id)
+            session.info['library_changed'] = True
+        elif isinstance(obj, CuePoint):
+            changed.add(obj.track_id)
+
+# Announcements still running on the event loop
+_announcements: Set[asyncio.Task] = set()
+
+async def _announce_changes(changed: Set[int], library_changed: bool):
+    if library_changed:
+        await asyncio.gather(invalidate_async(changed), library_events.publish_async(changed))
+    else:
+        await invalidate_async(changed)
+
+def _invalidate_changed_tracks(session):
+    changed = session.info.pop('changed_tracks', None)
+    library_changed = session.info.pop('library_changed', False)
+    if changed:
+        changed.discard(None)
+    if not changed:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Sync sessions off the event loop: background jobs and the CLI
+        invalidate(changed)
+        if library_changed:
+            library_events.publish(changed)
+        return
+    # Async sessions commit on the event loop, which Redis calls must not
+    # block; their commit waits for the task (see app.core.database)
+    task = loop.create_task(_announce_changes(changed, library_changed))
+    _announcements.add(task)
+    task.add_done_callback(_announcements.discard)
+    session.info.setdefault(AFTER_COMMIT_TASKS, []).append(task)
+
+def _forget_changed_tracks(session):
+    session.info.pop('changed_tracks', None)
+    session.info.pop('library_changed', None)
+
+def register_session_hooks():
+    """
+    Invalidate cached responses and announce library changes after every
+    commit of this process's sessions
+    
+    Called by the entry points that change the library (the API and the
+    command lines), so importing the models alone (migrations, analysis and
+    render processes) does not hook Redis into their sessions. Calling it
+    again has no effect.
+    """
+    if event.contains(Session, "after_commit", _invalidate_changed_tracks):
+        return
+    event.listen(Session, "after_flush", _collect_changed_tracks)
+    event.listen(Session, "after_commit", _invalidate_changed_tracks)
+    event.listen(Session, "after_rollback", _forget_changed_tracks)
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    """Hits, misses, errors, hit rate and mean latency per endpoint, for this process"""
+    result = {}
+    for name, stats in _stats.items():
+        lookups = stats['hit'] + stats['miss']
+        result[name] = {
+            'hits': stats['hit'],
+            'misses': stats['miss'],
+            'errors': stats['error'],
+            'hit_rate': stats['hit'] / lookups if lookups else 0.0,
+            'mean_hit_ms': 1000 * stats['hit_seconds'] / stats['hit'] if stats['hit'] else 0.0,
+            'mean_miss_ms': 1000 * stats['miss_seconds'] / stats['miss'] if stats['miss'] else 0.0
+        }
+    return result
@@ -1,12 +1,24 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "postgresql://djuser:djpassword@db:5432/djmixing"
+    DB_POOL_SIZE: int = 10  # Connections kept open per engine (API and background jobs)
+    DB_MAX_OVERFLOW: int = 20  # Extra connections allowed under load
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection
     
     # Redis
     REDIS_URL: str = "redis://redis:6379/0"
+    REDIS_TIMEOUT: float = 0.5  # Seconds before a cache or publish call is given up
+    REDIS_MAX_CONNECTIONS: int = 50  # Per process and client (async and sync)
+    
+    # Health probes
+    HEALTH_CACHE_TTL: float = 5.0  # Seconds a readiness result is reused
+    
+    # Response cache (Redis)
+    CACHE_ENABLED: bool = True
+    CACHE_TTL: int = 3600  # Seconds an unused entry is kept
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -16,6 +28,22 @@ class Settings(BaseSettings):
     # Upload
     UPLOAD_DIR: str = "/app/uploads"
     MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024  # 100MB
+    RENDITION_DIR: str = "/app/uploads/renditions"  # Compact preview renditions
+    
+    # Library sync
+    LIBRARY_DIRS: List[str] = []  # Music folders that can be synced into the library
+    SYNC_TAG_WORKERS: int = 8  # Threads reading tags during a sync
+    ANALYSIS_WORKERS: int = 0  # Analysis processes for synced tracks (0 = one per CPU core)
+    API_ANALYSIS_WORKERS: int = 2  # Analysis processes per API worker, for uploads and re-analysis
+    
+    # Mix export
+    MIX_EXPORT_DIR: str = "/app/uploads/mixes"
+    RENDER_WORKERS: int = 2  # Render processes per mix rendered by the API (the command line uses one per CPU core)
+    RENDER_SEGMENT_SECONDS: float = 120.0
+    
+    # Transition preview cache
+    PREVIEW_CACHE_DIR: str = "/app/uploads/previews"
+    PREVIEW_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB
     
     # Spotify (optional)
     SPOTIFY_CLIENT_ID: Optional[str] = None
@@ -1,24 +1,84 @@
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy.exc import OperationalError
+from typing import AsyncIterator
 from app.core.config import settings
+from app.core.metrics import metered_pool
+import asyncio
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
-# Create engine with pool settings for better connection management
+# Async drivers for the sync database URL schemes
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+def async_database_url(url: str) -> str:
+    """The async driver variant of a database URL, e.g. postgresql:// -> postgresql+asyncpg://"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+POOL_OPTIONS = {
+    'pool_pre_ping': True,  # Verify connections before using them
+    'pool_size': settings.DB_POOL_SIZE,
+    'max_overflow': settings.DB_MAX_OVERFLOW,
+    'pool_timeout': settings.DB_POOL_TIMEOUT,
+    'pool_recycle': 3600,  # Recycle connections after 1 hour
+}
+
+# Sync engine for background jobs, worker processes and the CLI
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using them
-    pool_size=5,
-    max_overflow=10,
-    pool_recycle=3600,  # Recycle connections after 1 hour
+    poolclass=metered_pool(QueuePool, "sync"),
+    **POOL_OPTIONS
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the API routes. The queue pool is the asyncpg default, set
+# explicitly so SQLite (aiosqlite defaults to no pooling) takes the same options.
+# Both pools report to the metrics endpoint (see app.core.metrics)
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    poolclass=metered_pool(AsyncAdaptedQueuePool, "async"),
+    **POOL_OPTIONS
+)
+
+# Key of Session.info listing tasks an async commit waits for
+AFTER_COMMIT_TASKS = 'after_commit_tasks'
+
+class _AsyncSession(AsyncSession):
+    """
+    Async session whose commit returns once the after-commit work of its
+    transaction is done (e.g. cache invalidation, see app.core.cache),
+    which runs as tasks so it does not block the event loop
+    """
+    
+    async def commit(self):
+        await super().commit()
+        tasks = self.sync_session.info.pop(AFTER_COMMIT_TASKS, None)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+# Objects stay loaded after commit: reloading an expired attribute would
+# need an implicit query, which async sessions cannot do
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=_AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -28,6 +88,10 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def check_database_connection(max_retries: int = 5, retry_delay: int = 2) -> bool:
     """
     Check database connection with retry logic.
@@ -0,0 +1,91 @@
+"""
+Response encodings chosen by the Accept header
+
+JSON is encoded with orjson. Clients asking for MessagePack get the same
+structure with every list of floats (waveforms, beat positions, curves)
+packed as one typed buffer: ext type FLOAT32_ARRAY_EXT holding
+little-endian float32 values. These keep about 7 significant digits, more
+than any of those values carry (beat positions within a 10-minute track to
+better than 0.1 ms).
+"""
+
+from fastapi import Request, Response
+from pydantic_core import to_jsonable_python
+from typing import Any, Dict, Optional
+from app.core.http import bytes_response
+import msgpack
+import orjson
+import struct
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+
+# MessagePack extension type of packed float arrays
+FLOAT32_ARRAY_EXT = 1
+
+# Shorter lists are not worth packing
+MIN_PACKED_LENGTH = 8
+
+def negotiate(request: Request) -> str:
+    """
+    Media type of the response: MessagePack if the Accept header prefers it
+    to JSON, else JSON
+    """
+    best, best_quality = JSON_MEDIA_TYPE, 0.0
+    for entry in request.headers.get('accept', '').split(','):
+        media_type, *params = [part.strip() for part in entry.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_type = media_type.lower()
+        if media_type in MSGPACK_MEDIA_TYPES:
+            media_type = MSGPACK_MEDIA_TYPE
+        elif media_type != JSON_MEDIA_TYPE:
+            continue
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+def _pack_arrays(value: Any) -> Any:
+    """Replace lists of floats (ints allowed) in JSON-able data by packed buffers"""
+    if isinstance(value, dict):
+        return {key: _pack_arrays(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) >= MIN_PACKED_LENGTH:
+            types = set(map(type, value))
+            if float in types and types <= {float, int}:
+                return msgpack.ExtType(FLOAT32_ARRAY_EXT, struct.pack(f'<{len(value)}f', *value))
+        return [_pack_arrays(item) for item in value]
+    return value
+
+def encode(content: Any, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+    """
+    Encode response content
+    
+    Args:
+        content: Pydantic models or JSON-able data (datetimes allowed)
+        media_type: JSON_MEDIA_TYPE or MSGPACK_MEDIA_TYPE
+    """
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(_pack_arrays(to_jsonable_python(content)))
+    return orjson.dumps(content, default=to_jsonable_python)
+
+def encoded_response(
+    request: Request,
+    content: Any,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Response in the encoding the client asked for, with an ETag"""
+    media_type = negotiate(request)
+    return bytes_response(
+        request,
+        encode(content, media_type),
+        media_type,
+        headers={'Vary': 'Accept', **(headers or {})}
+    )
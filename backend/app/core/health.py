@@ -0,0 +1,73 @@
+from sqlalchemy import text
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.database import async_engine
+from app.core.redis_client import get_async_client, redis_failed
+import asyncio
+import time
+
+SERVICE_NAME = "dj-mixing-backend"
+SERVICE_VERSION = "1.0.0"
+
+# Seconds before a dependency check counts as failed
+CHECK_TIMEOUT = 3.0
+
+_readiness: Optional[Dict] = None
+_checked_at = 0.0
+_lock = asyncio.Lock()
+
+async def _check_database() -> str:
+    async def ping():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    try:
+        await asyncio.wait_for(ping(), CHECK_TIMEOUT)
+        return "connected"
+    except Exception as e:
+        return f"error: {str(e) or type(e).__name__}"
+
+async def _check_redis() -> str:
+    client = get_async_client()
+    if client is None:
+        return "error: unavailable, retrying shortly"
+    try:
+        await asyncio.wait_for(client.ping(), CHECK_TIMEOUT)
+        return "connected"
+    except Exception as e:
+        redis_failed("health check", e)
+        return f"error: {str(e) or type(e).__name__}"
+
+async def readiness() -> Dict:
+    """
+    Status of the service and its dependencies, checked with the shared
+    pools at most once per HEALTH_CACHE_TTL seconds
+    
+    The service is ready while the database is reachable; without Redis it
+    still serves requests (uncached), so it is only degraded.
+    
+    Returns:
+        Dict with status ('healthy', 'degraded' or 'unavailable'), ready,
+        database and redis
+    """
+    global _readiness, _checked_at
+    async with _lock:
+        # Concurrent probes wait for one check instead of running their own
+        if _readiness is None or time.monotonic() - _checked_at >= settings.HEALTH_CACHE_TTL:
+            database, redis_status = await asyncio.gather(_check_database(), _check_redis())
+            ready = database == "connected"
+            if not ready:
+                status = "unavailable"
+            elif redis_status != "connected":
+                status = "degraded"
+            else:
+                status = "healthy"
+            _readiness = {
+                "status": status,
+                "ready": ready,
+                "service": SERVICE_NAME,
+                "version": SERVICE_VERSION,
+                "database": database,
+                "redis": redis_status
+            }
+            _checked_at = time.monotonic()
+        return _readiness
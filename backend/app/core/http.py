@@ -0,0 +1,136 @@
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import Dict, Iterator, Optional, Tuple
+import hashlib
+import os
+
+RANGE_CHUNK_SIZE = 64 * 1024
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return etag.removeprefix('W/') in tags
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single byte range
+    
+    Args:
+        range_header: Value of the Range header, e.g. "bytes=0-1023"
+        size: Size of the file in bytes
+    
+    Returns:
+        (start, end) with end exclusive and clamped to size (start may be
+        past the end, i.e. unsatisfiable), or None when the header is not a
+        single valid byte range and should be ignored
+    """
+    unit, _, spec = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, dash, last = spec.strip().partition('-')
+    if not dash:
+        return None
+    
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            return max(size - int(last), 0), size
+        start = int(first)
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return None
+    
+    if last and end <= start:
+        return None
+    return start, min(end, size)
+
+def _iter_file(file_path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def file_response(
+    request: Request,
+    file_path: str,
+    media_type: str,
+    etag: str,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serve a file with conditional and byte-range request support
+    
+    Answers If-None-Match with 304 and a single-range Range request with 206
+    (honoring If-Range); anything else gets the whole file.
+    
+    Args:
+        request: The incoming request
+        file_path: File to serve
+        media_type: Content-Type of the file
+        etag: Quoted strong ETag of the file's contents
+        headers: Extra response headers
+    """
+    size = os.path.getsize(file_path)
+    headers = {
+        'ETag': etag,
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'no-cache',  # Revalidate with the ETag before reuse
+        **(headers or {})
+    }
+    
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    
+    range_header = request.headers.get('range')
+    if_range = request.headers.get('if-range')
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = parse_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            if start >= size:
+                return Response(
+                    status_code=416,
+                    headers={**headers, 'Content-Range': f'bytes */{size}'}
+                )
+            return StreamingResponse(
+                _iter_file(file_path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    'Content-Range': f'bytes {start}-{end - 1}/{size}',
+                    'Content-Length': str(end - start)
+                }
+            )
+    
+    return FileResponse(file_path, media_type=media_type, headers=headers)
+
+def bytes_response(
+    request: Request,
+    content: bytes,
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serve in-memory content with an ETag derived from it
+    
+    Answers a matching If-None-Match with 304 and no body.
+    """
+    etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'no-cache',  # Revalidate with the ETag before reuse
+        **(headers or {})
+    }
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type=media_type, headers=headers)
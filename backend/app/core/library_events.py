@@ -0,0 +1,149 @@
+"""
+Library change notifications between processes
+
+Every commit that changes tracks or analyses bumps the library version in
+Redis (a counter that only grows) and publishes the changed track ids on
+LIBRARY_CHANNEL. Each API worker listens (see listen) and passes the ids to
+the handlers registered with on_change, which update their in-memory data
+instead of rebuilding it or serving it stale.
+
+Events say which tracks to reload, not what changed, so applying them twice
+is harmless. The version is bumped and the event published in one atomic
+step, so events arrive in version order: once a process has seen version N,
+it has received every change up to N. Events missed while disconnected
+cannot be recovered: handlers are reset (passed None) whenever the
+subscription starts, and is_live tells whether in-memory data can be
+trusted at all. Announcements that fail are kept and sent again with the
+next one (see app.core.cache.retry_invalidations).
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from app.core.config import settings
+from app.core.redis_client import get_async_client, get_sync_client, redis_failed, RETRY_AFTER_ERROR
+import asyncio
+import json
+import logging
+import redis
+import redis.asyncio
+
+logger = logging.getLogger(__name__)
+
+LIBRARY_VERSION_KEY = "library:version"
+LIBRARY_CHANNEL = "library:changes"
+
+# Seconds between pings of an idle subscription, so a dead connection is noticed
+LISTEN_HEALTH_CHECK_INTERVAL = 30
+
+# Bumps the version and publishes the event with it, atomically
+PUBLISH_SCRIPT = """
+local version = redis.call('INCR', KEYS[1])
+redis.call('PUBLISH', ARGV[1], '{"version":' .. version .. ',"tracks":' .. ARGV[2] .. '}')
+return version
+"""
+
+_handlers: List[Callable[[Optional[Set[int]]], None]] = []
+_live = False
+_version = 0
+# Changed tracks whose announcement failed
+_unpublished: Set[int] = set()
+
+def on_change(handler: Callable[[Optional[Set[int]]], None]):
+    """
+    Register a handler for library changes (usable as a decorator)
+    
+    Handlers run on the event loop and must not block. They get the ids of
+    changed (possibly deleted) tracks, or None when everything may have
+    changed.
+    """
+    _handlers.append(handler)
+    return handler
+
+def is_live() -> bool:
+    """
+    Whether this process is receiving library changes and has announced its
+    own, i.e. whether its in-memory data reflects every change up to version()
+    """
+    return _live and not _unpublished
+
+def version() -> int:
+    """Latest library version this process has seen"""
+    return _version
+
+def _publish_args(track_ids: Set[int]) -> Dict:
+    return {'keys': [LIBRARY_VERSION_KEY], 'args': [LIBRARY_CHANNEL, json.dumps(sorted(track_ids))]}
+
+def publish(track_ids: Iterable[int]):
+    """
+    Announce changed tracks, after their changes are committed, from sync
+    code off the event loop (see publish_async)
+    
+    Args:
+        track_ids: Tracks whose row or analysis changed, was added or deleted
+    """
+    track_ids = _unpublished.union(track_ids)
+    if not track_ids:
+        return
+    client = get_sync_client()
+    if client is not None:
+        try:
+            client.register_script(PUBLISH_SCRIPT)(**_publish_args(track_ids))
+            _unpublished.difference_update(track_ids)
+            return
+        except redis.RedisError as e:
+            redis_failed("library change notice", e)
+    _unpublished.update(track_ids)
+
+async def publish_async(track_ids: Iterable[int]):
+    """Announce changed tracks from the event loop, in one round trip (see publish)"""
+    track_ids = _unpublished.union(track_ids)
+    if not track_ids:
+        return
+    client = get_async_client()
+    if client is not None:
+        try:
+            await client.register_script(PUBLISH_SCRIPT)(**_publish_args(track_ids))
+            _unpublished.difference_update(track_ids)
+            return
+        except redis.RedisError as e:
+            redis_failed("library change notice", e)
+    _unpublished.update(track_ids)
+
+def _notify(track_ids: Optional[Set[int]]):
+    for handler in _handlers:
+        try:
+            handler(track_ids)
+        except Exception as e:
+            logger.error(f"Library change handler {handler.__qualname__} failed: {e}")
+
+async def listen():
+    """
+    Receive library changes until cancelled (a task started by the API
+    lifespan), reconnecting after Redis errors
+    """
+    global _live, _version
+    while True:
+        client = redis.asyncio.from_url(
+            settings.REDIS_URL,
+            health_check_interval=LISTEN_HEALTH_CHECK_INTERVAL
+        )
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(LIBRARY_CHANNEL)
+            async for message in pubsub.listen():
+                if message['type'] == 'subscribe':
+                    # Changes before now were not received
+                    _version = int(await client.get(LIBRARY_VERSION_KEY) or 0)
+                    _live = True
+                    _notify(None)
+                    logger.info(f"Listening for library changes from version {_version}")
+                elif message['type'] == 'message':
+                    event = json.loads(message['data'])
+                    _version = max(_version, event['version'])
+                    _notify(set(event['tracks']))
+        except (redis.RedisError, OSError) as e:
+            logger.warning(f"Library change subscription lost, retrying in {RETRY_AFTER_ERROR:.0f}s: {e}")
+        finally:
+            _live = False
+            await pubsub.aclose()
+            await client.aclose()
+        await asyncio.sleep(RETRY_AFTER_ERROR)
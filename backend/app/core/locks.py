@@ -0,0 +1,56 @@
+"""
+Locks for long jobs that must not run twice at once (mix renders, library
+syncs), whichever API worker or command line run starts them
+
+A lock is an flock() on a lock file, so it holds across processes on the
+host and the OS releases it when its holder exits: a crashed job never
+leaves a stale lock behind.
+"""
+
+from typing import IO, Optional
+import fcntl
+import os
+
+class LockHeldError(RuntimeError):
+    """Another job holds the lock"""
+
+class JobLock:
+    """
+    Exclusive lock of one job
+    
+    Taken by whoever starts the job and released when it ends, possibly in
+    another thread (e.g. taken by a request, released by its background job).
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[IO] = None
+    
+    def acquire(self) -> bool:
+        """Take the lock without waiting; False when another job holds it"""
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+    
+    def release(self):
+        """Release the lock, if held"""
+        if self._file is not None:
+            # Closing the file releases the lock
+            self._file.close()
+            self._file = None
+    
+    def __enter__(self) -> 'JobLock':
+        if not self.acquire():
+            raise LockHeldError(f"{self.path} is held by another job")
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.release()
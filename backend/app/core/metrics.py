@@ -0,0 +1,179 @@
+"""
+Prometheus metrics of the API process
+
+Requests are measured by MetricsMiddleware, database pools by their pool
+class (see metered_pool), analysis and auto-mix generation where they run.
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory shared by them, so GET /metrics reports all of them.
+"""
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess
+)
+from typing import Tuple
+import os
+import time
+
+# Requests that matched no route share one label, so scans of random URLs
+# cannot create a series per path
+UNMATCHED_ROUTE = "unmatched"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to the end of its response",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being handled",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+
+POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total",
+    "Connections taken from the pool",
+    ["pool"]
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections in use",
+    ["pool"],
+    multiprocess_mode="livesum"
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections open beyond the pool size",
+    ["pool"],
+    multiprocess_mode="livesum"
+)
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time to get a connection from the pool, including opening a new one",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+
+ANALYSIS_DURATION = Histogram(
+    "analysis_duration_seconds",
+    "Audio analysis time per track",
+    ["source"],  # upload, reanalyze or library
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+)
+ANALYSIS_PENDING = Gauge(
+    "analysis_pending_tracks",
+    "Tracks queued for analysis by library syncs",
+    multiprocess_mode="livesum"
+)
+
+AUTOMIX_DURATION = Histogram(
+    "automix_generation_seconds",
+    "Time to plan an auto-mix",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+AUTOMIX_CANDIDATES = Histogram(
+    "automix_candidate_tracks",
+    "Analyzed tracks an auto-mix chose from",
+    buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+)
+
+CACHE_LOOKUPS = Counter(
+    "response_cache_lookups_total",
+    "Response cache lookups (see app.core.cache)",
+    ["endpoint", "outcome"]  # hit, miss or error
+)
+CACHE_LOOKUP_SECONDS = Histogram(
+    "response_cache_lookup_seconds",
+    "Time to serve a cached response (hit) or build and store it (miss)",
+    ["endpoint", "outcome"],  # hit or miss
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route template
+    
+    A plain ASGI middleware (not BaseHTTPMiddleware), so streamed responses
+    pass through untouched and the cost is a few counter updates.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope['method']
+        status = 500
+        started = time.perf_counter()
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+        
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            # The router stores the matched route in the scope
+            route = scope.get('route')
+            REQUEST_DURATION.labels(
+                method,
+                route.path if route is not None else UNMATCHED_ROUTE,
+                str(status)
+            ).observe(time.perf_counter() - started)
+
+
+def metered_pool(pool_class: type, name: str) -> type:
+    """
+    A pool class (for create_engine(poolclass=...)) that reports checkouts,
+    the wait for a connection, connections in use and overflow
+    
+    Args:
+        pool_class: A QueuePool class
+        name: Label of the pool's metrics
+    """
+    checkouts = POOL_CHECKOUTS.labels(name)
+    wait = POOL_WAIT.labels(name)
+    checked_out = POOL_CHECKED_OUT.labels(name)
+    overflow = POOL_OVERFLOW.labels(name)
+    
+    class MeteredPool(pool_class):
+        def _update(self):
+            checked_out.set(self.checkedout())
+            overflow.set(max(self.overflow(), 0))
+        
+        def _do_get(self):
+            started = time.perf_counter()
+            connection = super()._do_get()
+            wait.observe(time.perf_counter() - started)
+            checkouts.inc()
+            self._update()
+            return connection
+        
+        def _do_return_conn(self, record):
+            try:
+                super()._do_return_conn(record)
+            finally:
+                self._update()
+    
+    MeteredPool.__name__ = f"Metered{pool_class.__name__}"
+    return MeteredPool
+
+
+def render() -> Tuple[bytes, str]:
+    """Metrics in the Prometheus text format, with its content type"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,141 @@
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional, Tuple
+from datetime import datetime
+import base64
+import json
+
+MAX_PAGE_SIZE = 500
+
+# Largest value of an Integer column (PostgreSQL integer)
+MAX_INTEGER = 2 ** 31 - 1
+
+def encode_cursor(sort: str, value: Any, row_id: int) -> str:
+    """Opaque cursor for the position after a row"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    data = json.dumps([sort, value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+def _is_integer(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and abs(value) <= MAX_INTEGER
+
+def _restore_value(value: Any, column) -> Any:
+    """
+    A cursor's sort value as the column's Python type
+    
+    Cursors come from clients, so the value is checked before it reaches a
+    query: PostgreSQL rejects comparisons of mismatched types, out-of-range
+    integers and NUL characters in text.
+    
+    Raises:
+        ValueError: The value does not fit the column
+    """
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                pass
+    elif python_type is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    elif python_type is int:
+        if _is_integer(value):
+            return value
+    elif python_type is str:
+        if isinstance(value, str) and '\x00' not in value:
+            return value
+    raise ValueError("Invalid cursor")
+
+def decode_cursor(cursor: str, sort: str, column) -> Tuple[Any, int]:
+    """
+    Decode a cursor made by encode_cursor
+    
+    Args:
+        cursor: The cursor
+        sort: Sort key of the current request; cursors of other sorts are rejected
+        column: Sort column, to restore the type of the value
+    
+    Returns:
+        (sort value, id) of the last row of the previous page
+    
+    Raises:
+        ValueError: The cursor is malformed or was made for another sort
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, row_id = json.loads(data)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match the sort order")
+    if not _is_integer(row_id):
+        raise ValueError("Invalid cursor")
+    return _restore_value(value, column), row_id
+
+async def keyset_page(
+    db: AsyncSession,
+    query: Select,
+    sort: str,
+    column,
+    id_column,
+    descending: bool,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    """
+    Fetch one page of a query in (column, id) order, seeking past the cursor
+    
+    Unlike an offset, the cursor is turned into a (column, id) range the
+    database can seek to in a composite index on those columns, so deep pages
+    cost as much as the first. Rows where the column is NULL come last in
+    either direction; they are read by a second query on the same index once
+    the non-NULL rows run out.
+    
+    Args:
+        db: Database session
+        query: Select of the rows, with filters applied
+        sort: Name of the sort key, stored in the cursor
+        column: Column to sort by
+        id_column: Primary key column, breaking ties
+        descending: Sort in descending order
+        limit: Maximum rows to return
+        cursor: Cursor returned with the previous page, if any
+    
+    Returns:
+        (rows, cursor for the next page or None on the last page)
+    
+    Raises:
+        ValueError: The cursor is invalid
+    """
+    value, last_id = decode_cursor(cursor, sort, column) if cursor else (None, None)
+    
+    def order(*columns):
+        return [c.desc() if descending else c.asc() for c in columns]
+    
+    rows = []
+    if cursor is None or value is not None:
+        page = query.where(column.isnot(None))
+        if cursor is not None:
+            position = tuple_(column, id_column)
+            after = position < (value, last_id) if descending else position > (value, last_id)
+            page = page.where(after)
+        rows = (await db.scalars(page.order_by(*order(column, id_column)).limit(limit + 1))).all()
+    
+    if len(rows) <= limit:
+        page = query.where(column.is_(None))
+        if last_id is not None and value is None:
+            page = page.where(id_column < last_id if descending else id_column > last_id)
+        rows += (await db.scalars(
+            page.order_by(*order(id_column)).limit(limit + 1 - len(rows))
+        )).all()
+    
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, getattr(last, column.key), getattr(last, id_column.key))
@@ -0,0 +1,79 @@
+from typing import Dict, Optional
+from app.core.config import settings
+import logging
+import redis
+import redis.asyncio
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds to skip Redis after an error, so an outage costs one timeout, not one per request
+RETRY_AFTER_ERROR = 5.0
+
+_async_client: Optional[redis.asyncio.Redis] = None
+_sync_client: Optional[redis.Redis] = None
+_unavailable_until = 0.0
+
+def _pool_options() -> Dict:
+    # Callers beyond max_connections wait up to REDIS_TIMEOUT for a free connection
+    return {
+        'max_connections': settings.REDIS_MAX_CONNECTIONS,
+        'timeout': settings.REDIS_TIMEOUT,
+        'socket_connect_timeout': settings.REDIS_TIMEOUT,
+        'socket_timeout': settings.REDIS_TIMEOUT
+    }
+
+def _create_async_client() -> redis.asyncio.Redis:
+    pool = redis.asyncio.BlockingConnectionPool.from_url(settings.REDIS_URL, **_pool_options())
+    return redis.asyncio.Redis(connection_pool=pool)
+
+def _create_sync_client() -> redis.Redis:
+    pool = redis.BlockingConnectionPool.from_url(settings.REDIS_URL, **_pool_options())
+    return redis.Redis(connection_pool=pool)
+
+def open_clients():
+    """Create the pooled clients (API lifespan startup)"""
+    global _async_client, _sync_client
+    _async_client = _create_async_client()
+    _sync_client = _create_sync_client()
+
+async def close_clients():
+    """Close the pooled clients and their connections (API lifespan shutdown)"""
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.connection_pool.disconnect()
+    if _sync_client is not None:
+        _sync_client.connection_pool.disconnect()
+    _async_client = _sync_client = None
+
+def get_async_client() -> Optional[redis.asyncio.Redis]:
+    """
+    Shared pooled client for short Redis calls from the event loop
+    
+    Returns:
+        The client, or None while Redis is skipped after an error
+    """
+    global _async_client
+    if time.monotonic() < _unavailable_until:
+        return None
+    if _async_client is None:
+        _async_client = _create_async_client()
+    return _async_client
+
+def get_sync_client() -> Optional[redis.Redis]:
+    """
+    Shared pooled client for short Redis calls from sync code (see
+    get_async_client); created on first use outside the API, e.g. in the CLI
+    """
+    global _sync_client
+    if time.monotonic() < _unavailable_until:
+        return None
+    if _sync_client is None:
+        _sync_client = _create_sync_client()
+    return _sync_client
+
+def redis_failed(action: str, error: Exception):
+    """Skip Redis for RETRY_AFTER_ERROR seconds after a failed call"""
+    global _unavailable_until
+    _unavailable_until = time.monotonic() + RETRY_AFTER_ERROR
+    logger.warning(f"Redis {action} failed, skipping Redis for {RETRY_AFTER_ERROR:.0f}s: {error}")
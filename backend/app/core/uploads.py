@@ -0,0 +1,132 @@
+from fastapi import Request
+from multipart.multipart import MultipartParser, parse_options_header
+from typing import Dict, Optional, Set
+import aiofiles
+import aiofiles.os
+import hashlib
+import os
+import uuid
+
+# Allowance for multipart boundaries and part headers when checking Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+class UploadTooLargeError(ValueError):
+    """The uploaded file exceeds the size limit"""
+
+async def receive_file(
+    request: Request,
+    field_name: str,
+    directory: str,
+    max_size: int,
+    extensions: Optional[Set[str]] = None
+) -> Dict:
+    """
+    Stream one file field of a multipart/form-data request to disk
+    
+    The body is parsed as it arrives and written in chunks without blocking
+    the event loop, hashing the file on the way. Oversized requests are
+    rejected from their Content-Length before anything is read, and any
+    upload is aborted as soon as it passes max_size.
+    
+    Args:
+        request: The incoming request
+        field_name: Name of the form field holding the file
+        directory: Directory for the temporary file
+        max_size: Maximum file size in bytes
+        extensions: Allowed (lowercase) file extensions, checked before the
+                    file data is read
+    
+    Returns:
+        Dict with the client 'filename', temporary 'path', 'size' and
+        SHA-256 'content_hash'
+    
+    Raises:
+        UploadTooLargeError: The file is larger than max_size
+        ValueError: The request is not a valid upload
+    """
+    content_length = request.headers.get('content-length', '')
+    if content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise UploadTooLargeError("File too large")
+    
+    content_type, params = parse_options_header(request.headers.get('content-type', ''))
+    if content_type != b'multipart/form-data' or b'boundary' not in params:
+        raise ValueError("Expected a multipart/form-data upload")
+    
+    part = {'headers': {}, 'field': b'', 'value': b''}
+    upload = {'filename': None, 'capturing': False}
+    pending = []  # File data parsed but not written yet
+    
+    def on_part_begin():
+        part['headers'] = {}
+    
+    def on_header_field(data: bytes, start: int, end: int):
+        part['field'] += data[start:end]
+    
+    def on_header_value(data: bytes, start: int, end: int):
+        part['value'] += data[start:end]
+    
+    def on_header_end():
+        part['headers'][part['field'].lower()] = part['value']
+        part['field'] = part['value'] = b''
+    
+    def on_headers_finished():
+        _, options = parse_options_header(part['headers'].get(b'content-disposition', b''))
+        if options.get(b'name') != field_name.encode() or b'filename' not in options:
+            return
+        if upload['filename'] is not None:
+            raise ValueError(f"Only one file can be uploaded in '{field_name}'")
+        
+        filename = os.path.basename(options[b'filename'].decode('utf-8', 'replace'))
+        extension = os.path.splitext(filename)[1].lower()
+        if extensions is not None and extension not in extensions:
+            raise ValueError(f"Invalid file format. Allowed: {', '.join(sorted(extensions))}")
+        upload['filename'] = filename
+        upload['capturing'] = True
+    
+    def on_part_data(data: bytes, start: int, end: int):
+        if upload['capturing']:
+            pending.append(data[start:end])
+    
+    def on_part_end():
+        upload['capturing'] = False
+    
+    parser = MultipartParser(params[b'boundary'], {
+        'on_part_begin': on_part_begin,
+        'on_part_data': on_part_data,
+        'on_part_end': on_part_end,
+        'on_header_field': on_header_field,
+        'on_header_value': on_header_value,
+        'on_header_end': on_header_end,
+        'on_headers_finished': on_headers_finished,
+    })
+    
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f".upload-{uuid.uuid4().hex}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(path, 'wb') as f:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                for data in pending:
+                    size += len(data)
+                    if size > max_size:
+                        raise UploadTooLargeError("File too large")
+                    digest.update(data)
+                    await f.write(data)
+                pending.clear()
+        parser.finalize()
+        
+        if upload['filename'] is None:
+            raise ValueError(f"No file uploaded in '{field_name}'")
+    except BaseException:
+        if os.path.exists(path):
+            await aiofiles.os.remove(path)
+        raise
+    
+    return {
+        'filename': upload['filename'],
+        'path': path,
+        'size': size,
+        'content_hash': digest.hexdigest()
+    }
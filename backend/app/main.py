@@ -1,11 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
+from app.core import library_events
+from app.core.cache import cache_stats, register_session_hooks, retry_invalidations
 from app.core.config import settings
-from app.core.database import check_database_connection, create_tables
-from app.api import tracks, analysis, mixer
+from app.core.database import async_engine, check_database_connection, create_tables
+from app.core.health import readiness
+from app.core.metrics import MetricsMiddleware, render as render_metrics
+from app.core.redis_client import close_clients, get_async_client, open_clients
+from app.api import tracks, analysis, mixer, library
+from app.services import analysis_pool
+import asyncio
 import logging
-import redis
 import os
 
 # Configure logging
@@ -15,6 +22,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Commits of this process invalidate cached responses and announce library
+# changes to the other workers
+register_session_hooks()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown event handler"""
@@ -32,11 +43,11 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"Failed to create tables: {e}")
     
-    # Check Redis connection
+    # Shared Redis connection pools, then check the connection
+    open_clients()
     logger.info("Checking Redis connection...")
     try:
-        redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
-        redis_client.ping()
+        await get_async_client().ping()
         logger.info("Redis connection successful")
     except Exception as e:
         logger.warning(f"Redis connection failed: {e}. Caching will not be available.")
@@ -44,6 +55,14 @@ async def lifespan(app: FastAPI):
     # Check upload directory
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
     logger.info(f"Upload directory ready: {settings.UPLOAD_DIR}")
+    os.makedirs(settings.MIX_EXPORT_DIR, exist_ok=True)
+    os.makedirs(settings.PREVIEW_CACHE_DIR, exist_ok=True)
+    os.makedirs(settings.RENDITION_DIR, exist_ok=True)
+    
+    # Follow library changes made by other workers and processes, and retry
+    # announcing our own when Redis calls fail
+    library_listener = asyncio.create_task(library_events.listen())
+    invalidation_retries = asyncio.create_task(retry_invalidations())
     
     logger.info("Application startup complete")
     
@@ -51,6 +70,11 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down DJ Mixing Platform API...")
+    library_listener.cancel()
+    invalidation_retries.cancel()
+    analysis_pool.shutdown()
+    await close_clients()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="DJ Mixing Platform API",
@@ -66,45 +90,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Request latency and in-flight counts for /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(tracks.router, prefix="/api/tracks", tags=["tracks"])
 app.include_router(analysis.router, prefix="/api/analysis", tags=["analysis"])
 app.include_router(mixer.router, prefix="/api/mixer", tags=["mixer"])
+app.include_router(library.router, prefix="/api/library", tags=["library"])
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint with service status"""
-    status = {
-        "status": "healthy",
-        "service": "dj-mixing-backend",
-        "version": "1.0.0",
-        "database": "unknown",
-        "redis": "unknown"
-    }
-    
-    # Check database
-    try:
-        from app.core.database import engine
-        from sqlalchemy import text
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        status["database"] = "connected"
-    except Exception as e:
-        status["database"] = f"error: {str(e)}"
-        status["status"] = "degraded"
-    
-    # Check Redis
-    try:
-        redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
-        redis_client.ping()
-        status["redis"] = "connected"
-    except Exception as e:
-        status["redis"] = f"error: {str(e)}"
-        status["status"] = "degraded"
-    
-    return status
+    """Service status with database and Redis checks (see /health/ready)"""
+    return await readiness()
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: answers while the process serves requests, without checking dependencies"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_probe():
+    """Readiness probe: 503 while the database is unreachable; checks are reused for HEALTH_CACHE_TTL"""
+    status = await readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Response cache hit rate and latency per endpoint, for this worker process"""
+    return cache_stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: request latency, DB pools, analysis, auto-mix and response cache"""
+    content, media_type = render_metrics()
+    return Response(content=content, headers={"Content-Type": media_type})
 
 @app.get("/")
 async def root():
@@ -1,7 +1,11 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Boolean, ForeignKey, LargeBinary, Index
+from sqlalchemy import DDL, event, literal_column, text
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
+from typing import List, Optional
 from app.core.database import Base
+from app.services.text_match import TextMatchService
+from app.services.waveform import WaveformService
 
 class Track(Base):
     __tablename__ = "tracks"
@@ -15,6 +19,16 @@ class Track(Base):
     file_path = Column(String, nullable=False, unique=True)
     file_format = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the file
+    file_mtime = Column(Float, nullable=True)  # Modification time when indexed by a library sync
+    
+    # Normalized title, artist and album for search (see app.services.search),
+    # kept up to date on every insert and update
+    search_text = Column(String, nullable=True)
+    
+    # Original track when this file is another copy or encoding of the same
+    # recording (see app.services.fingerprint)
+    duplicate_of = Column(Integer, ForeignKey("tracks.id"), nullable=True, index=True)
     
     # Analysis data
     bpm = Column(Float, nullable=True)
@@ -22,8 +36,9 @@ class Track(Base):
     energy = Column(Float, nullable=True)
     danceability = Column(Float, nullable=True)
     
-    # Waveform data (JSON array)
-    waveform_data = Column(JSON, nullable=True)
+    # Overview waveform, one uint8 per point (see app.services.waveform);
+    # deferred so only queries that ask for it load it
+    waveform = deferred(Column(LargeBinary, nullable=True))
     
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -32,6 +47,53 @@ class Track(Base):
     # Relationships
     analysis = relationship("TrackAnalysis", back_populates="track", uselist=False)
     cue_points = relationship("CuePoint", back_populates="track")
+    
+    # Keyset pagination of the track list: one (sort column, id) index per
+    # sort key, plus equality filters combined with a sort or range
+    __table_args__ = (
+        Index("ix_tracks_created_at_id", "created_at", "id"),
+        Index("ix_tracks_title_id", "title", "id"),
+        Index("ix_tracks_artist_id", "artist", "id"),
+        Index("ix_tracks_bpm_id", "bpm", "id"),
+        Index("ix_tracks_energy_id", "energy", "id"),
+        Index("ix_tracks_genre_created_at_id", "genre", "created_at", "id"),
+        Index("ix_tracks_key_bpm_id", "key", "bpm", "id"),
+        # Search (PostgreSQL only): trigrams for typo-tolerant matching, and
+        # full text (see TRACK_SEARCH_VECTOR)
+        Index(
+            "ix_tracks_search_text_trgm",
+            "search_text",
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_tracks_search_vector",
+            text("to_tsvector('simple'::regconfig, search_text)"),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+    
+    @property
+    def waveform_data(self) -> Optional[List[float]]:
+        """Overview waveform as floats in [0, 1]"""
+        return WaveformService.decode(self.waveform) if self.waveform else None
+
+# Full-text vector of the search text, with the 'simple' configuration (no
+# stemming or stop words, which suit names); the same expression as
+# ix_tracks_search_vector so queries use the index
+TRACK_SEARCH_CONFIG = literal_column("'simple'::regconfig")
+TRACK_SEARCH_VECTOR = func.to_tsvector(TRACK_SEARCH_CONFIG, Track.search_text)
+
+event.listen(
+    Track.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+@event.listens_for(Track, "before_insert")
+@event.listens_for(Track, "before_update")
+def _update_search_text(mapper, connection, track: Track):
+    track.search_text = TextMatchService.normalize(track.title, track.artist, track.album)
 
 class TrackAnalysis(Base):
     __tablename__ = "track_analysis"
@@ -48,8 +110,20 @@ class TrackAnalysis(Base):
     # Structure detection (JSON)
     structure = Column(JSON, nullable=True)  # intro, verse, chorus, etc.
     
-    # Beat grid
-    beat_positions = Column(JSON, nullable=True)  # Array of beat timestamps
+    # Beat grid (see app.services.beat_grid.BeatGrid)
+    beat_grid = Column(JSON, nullable=True)  # Anchor, BPM and tempo-change segments
+    beat_times = deferred(Column(LargeBinary, nullable=True))  # float32 beat timestamps for irregular grids
+    
+    # Beat-synchronous onset envelopes (uint8) of the intro and outro phrases
+    intro_envelope = Column(LargeBinary, nullable=True)
+    outro_envelope = Column(LargeBinary, nullable=True)
+    
+    # Coarse RMS energy over time (float16, see app.services.mix_timeline);
+    # deferred, only mix timelines read it
+    energy_envelope = deferred(Column(LargeBinary, nullable=True))
+    
+    # Acoustic fingerprint, uint32 per frame (see app.services.fingerprint)
+    fingerprint = deferred(Column(LargeBinary, nullable=True))
     
     # Spectral analysis
     spectral_centroid = Column(Float, nullable=True)
@@ -61,6 +135,13 @@ class TrackAnalysis(Base):
     # Relationships
     track = relationship("Track", back_populates="analysis")
 
+# Inverted index from sampled fingerprint values to original (non-duplicate) tracks
+class FingerprintHash(Base):
+    __tablename__ = "fingerprint_hashes"
+    
+    hash = Column(Integer, primary_key=True)  # uint32 fingerprint value stored as int32
+    track_id = Column(Integer, ForeignKey("tracks.id"), primary_key=True, index=True)
+
 class CuePoint(Base):
     __tablename__ = "cue_points"
     
@@ -93,3 +174,10 @@ class Mix(Base):
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Keyset pagination of the mix list, one (sort column, id) index per sort key
+    __table_args__ = (
+        Index("ix_mixes_created_at_id", "created_at", "id"),
+        Index("ix_mixes_name_id", "name", "id"),
+        Index("ix_mixes_duration_id", "duration", "id"),
+    )
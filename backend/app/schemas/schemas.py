@@ -11,7 +11,7 @@ class TrackBase(BaseModel):
 class TrackCreate(TrackBase):
     pass
 
-class TrackResponse(TrackBase):
+class TrackSummaryResponse(TrackBase):
     id: int
     duration: float
     file_path: str
@@ -21,12 +21,15 @@ class TrackResponse(TrackBase):
     key: Optional[str] = None
     energy: Optional[float] = None
     danceability: Optional[float] = None
-    waveform_data: Optional[List[float]] = None
+    duplicate_of: Optional[int] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class TrackResponse(TrackSummaryResponse):
+    waveform_data: Optional[List[float]] = None
+
 class TrackAnalysisResponse(BaseModel):
     id: int
     track_id: int
@@ -35,12 +38,18 @@ class TrackAnalysisResponse(BaseModel):
     camelot_key: Optional[str] = None
     energy_level: Optional[float] = None
     structure: Optional[dict] = None
-    beat_positions: Optional[List[float]] = None
+    beat_grid: Optional[dict] = None
     analyzed_at: datetime
     
     class Config:
         from_attributes = True
 
+class BeatWindowResponse(BaseModel):
+    track_id: int
+    start: float
+    end: float
+    beats: List[float]
+
 class CuePointCreate(BaseModel):
     position: float
     label: Optional[str] = None
@@ -77,6 +86,26 @@ class MixResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class MixTimelineResponse(BaseModel):
+    mix_id: int
+    resolution: float = Field(..., description="Seconds per curve point")
+    duration: float
+    energy: List[float]
+    bpm: List[float]
+    keys: List[dict]
+    tracks: List[dict]
+
+class TransitionPreviewRequest(BaseModel):
+    tracklist: List[dict] = Field(..., description="Mix tracklist, e.g. from /auto-mix")
+    transitions: Optional[List[dict]] = None
+    index: int = Field(..., ge=0, description="Transition index (between tracks index and index + 1)")
+    padding: float = Field(15.0, ge=1, le=60, description="Seconds before and after the overlap")
+
+# Library sync schemas
+class LibrarySyncRequest(BaseModel):
+    directories: Optional[List[str]] = Field(None, description="Folders to sync (default: all of LIBRARY_DIRS)")
+    analyze: bool = Field(True, description="Analyze new and changed tracks after indexing")
+
 # Auto-mix schemas
 class AutoMixRequest(BaseModel):
     start_track_id: Optional[int] = Field(None, description="Starting track ID (random if not provided)")
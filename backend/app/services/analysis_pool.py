@@ -0,0 +1,73 @@
+"""
+Audio analysis for API requests, in processes of its own
+
+API workers hand uploads and re-analyses to these processes, so they never
+load the DSP stack themselves: librosa, scipy and numba take seconds and a
+few hundred MB on the first analysis, which would then stay resident in
+every API worker. The pool starts on the first analysis, so workers that
+never analyze do not start it at all; its processes keep the stack loaded
+between analyses.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.audio_analysis import AudioAnalysisService
+from app.services.fingerprint import FingerprintService
+import asyncio
+import multiprocessing
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def analyze_file(file_path: str, find_duplicates: bool = False) -> Dict:
+    """
+    Analyze one file (in an analysis process, or wherever the caller runs)
+    
+    Args:
+        file_path: Audio file
+        find_duplicates: Stop after the fingerprint for duplicates of indexed tracks
+    
+    Returns:
+        The result of AudioAnalysisService.analyze_track
+    """
+    if not find_duplicates:
+        return AudioAnalysisService.analyze_track(file_path)
+    db = SessionLocal()
+    try:
+        return AudioAnalysisService.analyze_track(
+            file_path,
+            find_duplicate=lambda fingerprint: FingerprintService.find_duplicate(db, fingerprint)
+        )
+    finally:
+        db.close()
+
+async def analyze(file_path: str, find_duplicates: bool = False) -> Dict:
+    """
+    Analyze one file in the pool without blocking the event loop
+    (see analyze_file)
+    """
+    global _pool
+    if _pool is None:
+        # spawn: forking a threaded server process is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.API_ANALYSIS_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    pool = _pool
+    try:
+        return await asyncio.wrap_future(pool.submit(analyze_file, file_path, find_duplicates))
+    except BrokenProcessPool:
+        # A process died (e.g. killed for memory); later analyses get a new pool
+        if _pool is pool:
+            _pool = None
+        pool.shutdown(wait=False)
+        raise
+
+def shutdown():
+    """Stop the analysis processes, if started (API lifespan shutdown)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -1,30 +1,56 @@
-import librosa
 import numpy as np
-import soundfile as sf
-from typing import Dict, List, Optional, Tuple
-import aubio
+from typing import Callable, Dict, List, Optional, Tuple
+from app.services.beat_grid import BeatGrid, BEATS_PER_PHRASE
+from app.services.fingerprint import FingerprintService
+from app.services.mix_timeline import MixTimelineService
+from app.services.transition_scoring import TransitionScoringService, ENVELOPE_BEATS
+from app.services.waveform import WaveformService
 
 class AudioAnalysisService:
     """Service for analyzing audio files"""
     
     @staticmethod
-    def analyze_track(file_path: str) -> Dict:
+    def analyze_track(
+        file_path: str,
+        find_duplicate: Optional[Callable[[bytes], Optional[int]]] = None
+    ) -> Dict:
         """
         Comprehensive audio analysis
-        Returns: dict with BPM, key, energy, waveform, etc.
+        Returns: dict with BPM, key, energy, waveform, fingerprint, etc.
+        
+        The acoustic fingerprint is computed first. If find_duplicate maps it
+        to an existing track id, analysis stops there and only 'duration',
+        'fingerprint' and 'duplicate_of' are returned.
         """
+        # Imported here so that API processes, which only use the pure Python
+        # helpers, never load librosa's stack (numba, scipy)
+        import librosa
+        
         try:
             # Load audio file
             y, sr = librosa.load(file_path, sr=44100, mono=True)
             duration = librosa.get_duration(y=y, sr=sr)
             
+            # One spectrogram for the fingerprint and the spectral features
+            S = np.abs(librosa.stft(y))
+            fingerprint = FingerprintService.compute(S, sr)
+            if find_duplicate is not None:
+                duplicate_of = find_duplicate(fingerprint)
+                if duplicate_of is not None:
+                    return {
+                        'duration': duration,
+                        'fingerprint': fingerprint,
+                        'duplicate_of': duplicate_of
+                    }
+            
             # BPM detection
             tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
             bpm = float(tempo)
             
-            # Beat positions in seconds
+            # Beat positions in seconds, stored as a compact beat grid
             beat_times = librosa.frames_to_time(beats, sr=sr)
-            beat_positions = beat_times.tolist()
+            grid = BeatGrid.from_positions(beat_times)
+            beat_grid, beat_times_blob = grid.to_storage() if grid else (None, None)
             
             # Key detection (using chroma features)
             chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
@@ -38,33 +64,80 @@ class AudioAnalysisService:
             # Energy level (RMS energy)
             rms = librosa.feature.rms(y=y)[0]
             energy_level = float(np.mean(rms))
+            energy_envelope = MixTimelineService.encode_energy_envelope(
+                rms, librosa.frames_to_time(np.arange(len(rms)), sr=sr)
+            )
             
             # Spectral features
-            spectral_centroid = float(np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)))
-            spectral_rolloff = float(np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr)))
+            spectral_centroid = float(np.mean(librosa.feature.spectral_centroid(S=S, sr=sr)))
+            spectral_rolloff = float(np.mean(librosa.feature.spectral_rolloff(S=S, sr=sr)))
             
             # Generate waveform data (downsampled for visualization)
             waveform_samples = 1000
-            waveform_data = AudioAnalysisService._generate_waveform(y, waveform_samples)
+            waveform = WaveformService.encode(
+                AudioAnalysisService._generate_waveform(y, waveform_samples)
+            )
             
             # Detect track structure
             structure = AudioAnalysisService._detect_structure(y, sr, beat_times)
             
+            # Onset envelopes for transition scoring
+            intro_envelope, outro_envelope = AudioAnalysisService._transition_envelopes(
+                y, sr, grid, structure
+            )
+            
             return {
                 'duration': duration,
                 'bpm': bpm,
                 'key': detected_key,
                 'camelot_key': camelot_key,
                 'energy_level': energy_level,
-                'beat_positions': beat_positions,
+                'energy_envelope': energy_envelope,
+                'beat_grid': beat_grid,
+                'beat_times': beat_times_blob,
                 'spectral_centroid': spectral_centroid,
                 'spectral_rolloff': spectral_rolloff,
-                'waveform_data': waveform_data,
-                'structure': structure
+                'waveform': waveform,
+                'structure': structure,
+                'intro_envelope': intro_envelope,
+                'outro_envelope': outro_envelope,
+                'fingerprint': fingerprint,
+                'duplicate_of': None
             }
         except Exception as e:
             raise Exception(f"Error analyzing track: {str(e)}")
     
+    @staticmethod
+    def _transition_envelopes(
+        y: np.ndarray,
+        sr: int,
+        grid: Optional[BeatGrid],
+        structure: Dict
+    ) -> Tuple[Optional[bytes], Optional[bytes]]:
+        """
+        Beat-synchronous onset envelopes of the intro and outro phrases
+        The intro phrase starts on the first beat; the outro phrase ends on
+        the phrase boundary where the auto-mixer starts mixing out
+        """
+        if grid is None or len(grid) < 2 * ENVELOPE_BEATS:
+            return None, None
+        
+        import librosa
+        
+        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+        onset_times = librosa.times_like(onset_env, sr=sr)
+        
+        outro_start = structure.get('outro', {}).get('start', len(y) / sr)
+        mix_out_beat = grid.nearest_index(outro_start, step=BEATS_PER_PHRASE)
+        outro_beat = max(mix_out_beat - ENVELOPE_BEATS, 0)
+        
+        intro = TransitionScoringService.extract_envelope(onset_env, onset_times, grid, 0)
+        outro = TransitionScoringService.extract_envelope(onset_env, onset_times, grid, outro_beat)
+        return (
+            TransitionScoringService.encode_envelope(intro),
+            TransitionScoringService.encode_envelope(outro)
+        )
+    
     @staticmethod
     def _generate_waveform(audio: np.ndarray, num_samples: int = 1000) -> List[float]:
         """Generate downsampled waveform for visualization"""
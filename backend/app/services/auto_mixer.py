@@ -3,15 +3,26 @@ Auto-mixing service for DJ Mixing Platform
 Automatically creates DJ mixes by selecting compatible tracks and calculating transitions
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional
 from sqlalchemy.orm import Session
+from app.core.metrics import AUTOMIX_CANDIDATES, AUTOMIX_DURATION
 from app.models.models import Track, TrackAnalysis
 from app.services.audio_analysis import AudioAnalysisService
+from app.services.beat_grid import BeatGrid, BEATS_PER_BAR
+from app.services.transition_scoring import TransitionScoringService, EnvelopeBank
 import random
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Weight of the onset-envelope rhythmic fit (0-1) relative to the
+# BPM/key compatibility score (0-100) when ranking candidates
+RHYTHM_WEIGHT = 25.0
+
+# Fit assumed for tracks analyzed before envelopes were stored
+NEUTRAL_RHYTHM_FIT = 0.5
+
 
 class AutoMixerService:
     """Service for automatically generating DJ mixes"""
@@ -37,11 +48,54 @@ class AutoMixerService:
         Returns:
             Dict with tracklist, transitions, and metadata
         """
-        # Get all tracks with analysis
+        result = None
+        for event in AutoMixerService.iter_auto_mix(
+            db=db,
+            start_track_id=start_track_id,
+            target_duration_minutes=target_duration_minutes,
+            bpm_tolerance=bpm_tolerance,
+            energy_variation=energy_variation
+        ):
+            if event['event'] == 'complete':
+                result = event['data']
+        return result
+    
+    @staticmethod
+    def iter_auto_mix(
+        db: Session,
+        start_track_id: Optional[int] = None,
+        target_duration_minutes: int = 60,
+        bpm_tolerance: float = 6.0,
+        energy_variation: float = 0.3
+    ) -> Iterator[Dict]:
+        """
+        Generate an automatic DJ mix incrementally
+        
+        Yields events as the planner commits to them, so callers can stream
+        the mix while the rest is still being planned:
+        
+        - ``track``: a tracklist entry
+        - ``transition``: the transition into the following track
+        - ``progress``: planner search status for the current step
+        - ``complete``: the full result, as returned by ``generate_auto_mix``
+        
+        Args:
+            db: Database session
+            start_track_id: ID of starting track (random if None)
+            target_duration_minutes: Target mix duration in minutes
+            bpm_tolerance: BPM tolerance for track selection
+            energy_variation: Allowed energy level variation (0-1)
+        
+        Yields:
+            Dicts with 'event' and 'data' keys
+        """
+        started = time.perf_counter()
+        
+        # Get all tracks with analysis, leaving out duplicates of other tracks
         tracks_with_analysis = (
             db.query(Track)
             .join(TrackAnalysis)
-            .filter(TrackAnalysis.bpm.isnot(None))
+            .filter(TrackAnalysis.bpm.isnot(None), Track.duplicate_of.is_(None))
             .all()
         )
         
@@ -65,6 +119,12 @@ class AutoMixerService:
         
         logger.info(f"Starting auto-mix with track: {current_track.title}")
         
+        # Decode candidate intro envelopes once for the whole mix
+        envelopes = EnvelopeBank(
+            [t.id for t in tracks_with_analysis],
+            [t.analysis.intro_envelope for t in tracks_with_analysis]
+        )
+        
         # Initialize mix data
         target_duration_seconds = target_duration_minutes * 60
         tracklist = []
@@ -73,21 +133,13 @@ class AutoMixerService:
         used_track_ids = set()
         
         # Add first track
-        first_transition = AutoMixerService._calculate_transition_point(current_track)
-        tracklist.append({
-            'track_id': current_track.id,
-            'title': current_track.title,
-            'artist': current_track.artist,
-            'bpm': current_track.analysis.bpm,
-            'key': current_track.analysis.camelot_key,
-            'energy': current_track.analysis.energy_level,
-            'start_time': 0.0,
-            'mix_in_point': first_transition['mix_in_point'],
-            'mix_out_point': first_transition['mix_out_point']
-        })
+        first_entry = AutoMixerService._build_tracklist_entry(current_track, 0.0)
+        tracklist.append(first_entry)
         total_duration = current_track.duration
         used_track_ids.add(current_track.id)
         
+        yield {'event': 'track', 'data': {'position': 0, **first_entry}}
+        
         # Build the mix
         max_iterations = 50  # Prevent infinite loops
         iteration = 0
@@ -95,13 +147,25 @@ class AutoMixerService:
         while total_duration < target_duration_seconds and iteration < max_iterations:
             iteration += 1
             
+            yield {
+                'event': 'progress',
+                'data': {
+                    'iteration': iteration,
+                    'max_iterations': max_iterations,
+                    'candidates': len(tracks_with_analysis) - len(used_track_ids),
+                    'total_duration': total_duration,
+                    'target_duration': target_duration_seconds
+                }
+            }
+            
             # Find compatible next track
             next_track = AutoMixerService._find_next_track(
                 current_track,
                 tracks_with_analysis,
                 used_track_ids,
                 bpm_tolerance,
-                energy_variation
+                energy_variation,
+                envelopes
             )
             
             if not next_track:
@@ -116,20 +180,15 @@ class AutoMixerService:
             )
             
             transitions.append(transition)
+            yield {'event': 'transition', 'data': {'position': len(transitions) - 1, **transition}}
             
             # Add next track to tracklist
-            next_transition = AutoMixerService._calculate_transition_point(next_track)
-            tracklist.append({
-                'track_id': next_track.id,
-                'title': next_track.title,
-                'artist': next_track.artist,
-                'bpm': next_track.analysis.bpm,
-                'key': next_track.analysis.camelot_key,
-                'energy': next_track.analysis.energy_level,
-                'start_time': transition['start_time'],
-                'mix_in_point': next_transition['mix_in_point'],
-                'mix_out_point': next_transition['mix_out_point']
-            })
+            next_entry = AutoMixerService._build_tracklist_entry(
+                next_track,
+                transition['start_time']
+            )
+            tracklist.append(next_entry)
+            yield {'event': 'track', 'data': {'position': len(tracklist) - 1, **next_entry}}
             
             # Update state
             total_duration += next_track.duration - transition['overlap_duration']
@@ -137,26 +196,48 @@ class AutoMixerService:
             current_track = next_track
         
         logger.info(f"Auto-mix complete: {len(tracklist)} tracks, {total_duration:.1f}s")
+        AUTOMIX_DURATION.observe(time.perf_counter() - started)
+        AUTOMIX_CANDIDATES.observe(len(tracks_with_analysis))
         
-        return {
-            'tracklist': tracklist,
-            'transitions': transitions,
-            'total_duration': total_duration,
-            'track_count': len(tracklist),
-            'metadata': {
-                'target_duration': target_duration_minutes,
-                'bpm_tolerance': bpm_tolerance,
-                'energy_variation': energy_variation
+        yield {
+            'event': 'complete',
+            'data': {
+                'tracklist': tracklist,
+                'transitions': transitions,
+                'total_duration': total_duration,
+                'track_count': len(tracklist),
+                'metadata': {
+                    'target_duration': target_duration_minutes,
+                    'bpm_tolerance': bpm_tolerance,
+                    'energy_variation': energy_variation
+                }
             }
         }
     
+    @staticmethod
+    def _build_tracklist_entry(track: Track, start_time: float) -> Dict:
+        """Build the tracklist entry for a track placed at start_time"""
+        points = AutoMixerService._calculate_transition_point(track)
+        return {
+            'track_id': track.id,
+            'title': track.title,
+            'artist': track.artist,
+            'bpm': track.analysis.bpm,
+            'key': track.analysis.camelot_key,
+            'energy': track.analysis.energy_level,
+            'start_time': start_time,
+            'mix_in_point': points['mix_in_point'],
+            'mix_out_point': points['mix_out_point']
+        }
+    
     @staticmethod
     def _find_next_track(
         current_track: Track,
         available_tracks: List[Track],
         used_track_ids: set,
         bpm_tolerance: float,
-        energy_variation: float
+        energy_variation: float,
+        envelopes: Optional[EnvelopeBank] = None
     ) -> Optional[Track]:
         """Find the next compatible track for the mix"""
         if not current_track.analysis:
@@ -202,13 +283,27 @@ class AutoMixerService:
         if not compatible:
             return None
         
+        # Re-rank by how well each candidate's intro fits the current outro
+        if envelopes is not None:
+            fit, _, scored = envelopes.score(
+                current_track.analysis.outro_envelope,
+                [c['track']['id'] for c in compatible]
+            )
+            fit[~scored] = NEUTRAL_RHYTHM_FIT
+            for c, rhythm_fit in zip(compatible, fit):
+                c['rhythm_fit'] = float(rhythm_fit)
+            compatible.sort(
+                key=lambda c: c['compatibility_score'] + RHYTHM_WEIGHT * c['rhythm_fit'],
+                reverse=True
+            )
+        
         # Get the best match
         best_match_id = compatible[0]['track']['id']
         return next((t for t in available_tracks if t.id == best_match_id), None)
     
     @staticmethod
     def _calculate_transition_point(track: Track) -> Dict:
-        """Calculate mix in/out points for a track"""
+        """Calculate mix in/out points for a track, snapped to phrase boundaries"""
         duration = track.duration
         
         # Default transition points
@@ -225,11 +320,34 @@ class AutoMixerService:
             mix_in = duration * 0.1
             mix_out = duration * 0.85
         
+        # Snap to 32-beat phrase boundaries, falling back to single beats when
+        # the phrases are too coarse to keep mix in before mix out
+        grid = BeatGrid.from_analysis(track.analysis)
+        if grid:
+            phrase_in = grid.snap_to_phrase(mix_in)
+            phrase_out = grid.snap_to_phrase(mix_out)
+            if phrase_in < phrase_out:
+                mix_in, mix_out = phrase_in, phrase_out
+            else:
+                mix_in, mix_out = grid.snap_to_beat(mix_in), grid.snap_to_beat(mix_out)
+        
         return {
             'mix_in_point': mix_in,
             'mix_out_point': mix_out
         }
     
+    @staticmethod
+    def _overlap_bars(bpm_diff: float) -> int:
+        """
+        Overlap length in bars
+        Shorter blends for similar BPMs, longer ones for larger tempo changes
+        """
+        if bpm_diff < 2:
+            return 4
+        if bpm_diff < 8:
+            return 8
+        return 16
+    
     @staticmethod
     def _calculate_transition(
         track_a: Track,
@@ -241,14 +359,39 @@ class AutoMixerService:
         track_a_points = AutoMixerService._calculate_transition_point(track_a)
         track_b_points = AutoMixerService._calculate_transition_point(track_b)
         
-        # Calculate BPM-based transition duration
-        # Faster transitions for similar BPMs, longer for different ones
+        # Calculate BPM-based transition length in bars
         if track_a.analysis and track_b.analysis:
             bpm_diff = abs(track_a.analysis.bpm - track_b.analysis.bpm)
-            # 8-32 seconds based on BPM difference
-            overlap_duration = min(32, max(8, 8 + bpm_diff))
+            overlap_bars = AutoMixerService._overlap_bars(bpm_diff)
+        else:
+            overlap_bars = 8  # Default 8 bars
+        
+        # Rhythmic fit of B's intro over A's outro
+        rhythm = None
+        if track_a.analysis and track_b.analysis:
+            rhythm = TransitionScoringService.score_pair(
+                track_a.analysis.outro_envelope,
+                track_b.analysis.intro_envelope
+            )
+        
+        # The overlap ends on track A's mix-out beat; measure its start on
+        # track A's beat grid so it follows any tempo drift. A mix-out point
+        # near the start of A leaves fewer whole bars to overlap. B enters
+        # shifted by the best beat offset, as far as the overlap and A's
+        # grid allow (start times are measured in A's audio).
+        grid_a = BeatGrid.from_analysis(track_a.analysis)
+        beat_offset = 0
+        if grid_a:
+            out_index = grid_a.nearest_index(track_a_points['mix_out_point'])
+            overlap_bars = min(overlap_bars * BEATS_PER_BAR, out_index) // BEATS_PER_BAR
+            start_index = out_index - overlap_bars * BEATS_PER_BAR
+            if rhythm:
+                beat_offset = min(max(rhythm[1], -start_index), overlap_bars * BEATS_PER_BAR)
+            overlap_start = grid_a.beat_time(start_index + beat_offset)
+            overlap_duration = track_a_points['mix_out_point'] - overlap_start
         else:
-            overlap_duration = 16  # Default 16 seconds
+            bpm = track_a.analysis.bpm if track_a.analysis and track_a.analysis.bpm else 120.0
+            overlap_duration = overlap_bars * BEATS_PER_BAR * 60.0 / bpm
         
         # Calculate when track A should start mixing out
         # current_time is the end of track A in the mix timeline
@@ -257,14 +400,24 @@ class AutoMixerService:
         # So we subtract the remaining portion of track A after the mix-out point
         track_a_mix_out = current_time - (track_a.duration - track_a_points['mix_out_point'])
         
-        # Track B starts during Track A outro (overlap)
+        # Track B starts during Track A outro (overlap). Tracks play from their
+        # first sample, so B starts early by the time before its first beat
+        # for that beat to land on the overlap's first beat; the fade covers
+        # the lead-in too.
         track_b_start = track_a_mix_out - overlap_duration
+        grid_b = BeatGrid.from_analysis(track_b.analysis)
+        if grid_b:
+            track_b_start -= grid_b.beat_time(0)
+            overlap_duration = track_a_mix_out - track_b_start
         
         return {
             'from_track_id': track_a.id,
             'to_track_id': track_b.id,
             'start_time': track_b_start,
             'overlap_duration': overlap_duration,
+            'overlap_bars': overlap_bars,
+            'rhythm_fit': rhythm[0] if rhythm else None,
+            'beat_offset': beat_offset,
             'from_track_out_point': track_a_points['mix_out_point'],
             'to_track_in_point': track_b_points['mix_in_point'],
             'type': 'crossfade'
@@ -0,0 +1,273 @@
+"""
+Beat grid helpers for DJ Mixing Platform
+Stores beat grids compactly as piecewise-constant tempo segments and snaps mix
+points to beats and phrase boundaries without expanding the whole grid
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+BEATS_PER_BAR = 4
+BEATS_PER_PHRASE = 32
+
+# Maximum deviation (seconds) between a detected beat and the fitted grid.
+# Detected beats are quantized to analysis frames (512 samples at 44.1kHz,
+# ~11.6ms), so anything tighter would only fit frame jitter.
+FIT_TOLERANCE = 0.015
+
+# Above this many segments per beat the material is irregular (live drums,
+# rubato, broken beat detection) and the raw beat times are stored instead
+MAX_SEGMENT_RATIO = 1 / 16
+
+
+class BeatGrid:
+    """
+    Beat grid of a track
+    
+    Either parametric - a list of segments, each starting at a beat index and
+    time with a constant beat period - or explicit beat times for irregular
+    material. Beat times are only expanded for the window that is asked for.
+    """
+    
+    def __init__(
+        self,
+        count: int,
+        segment_beats: Optional[np.ndarray] = None,
+        segment_times: Optional[np.ndarray] = None,
+        segment_periods: Optional[np.ndarray] = None,
+        beats: Optional[np.ndarray] = None
+    ):
+        self.count = count
+        self.segment_beats = segment_beats
+        self.segment_times = segment_times
+        self.segment_periods = segment_periods
+        self.explicit_beats = beats
+    
+    @classmethod
+    def from_positions(
+        cls,
+        beat_positions: Optional[Sequence[float]],
+        tolerance: float = FIT_TOLERANCE
+    ) -> Optional['BeatGrid']:
+        """
+        Fit a grid to detected beat positions
+        
+        Args:
+            beat_positions: Sorted beat timestamps in seconds
+            tolerance: Maximum allowed deviation from the fitted grid in seconds
+        
+        Returns:
+            BeatGrid, or None if there are too few beats
+        """
+        if beat_positions is None or len(beat_positions) < 2:
+            return None
+        beats = np.asarray(beat_positions, dtype=np.float64)
+        
+        segments = cls._fit_segments(beats, tolerance)
+        if len(segments) > max(1, len(beats) * MAX_SEGMENT_RATIO):
+            return cls(len(beats), beats=beats.astype(np.float32))
+        
+        starts, times, periods = (np.array(col) for col in zip(*segments))
+        return cls(
+            len(beats),
+            segment_beats=starts.astype(np.int64),
+            segment_times=times,
+            segment_periods=periods
+        )
+    
+    @classmethod
+    def from_storage(cls, grid: Optional[Dict], beat_times: Optional[bytes] = None) -> Optional['BeatGrid']:
+        """
+        Load a grid from its stored form
+        
+        Args:
+            grid: The TrackAnalysis.beat_grid dict
+            beat_times: The TrackAnalysis.beat_times float32 fallback
+        """
+        if beat_times:
+            beats = np.frombuffer(beat_times, dtype='<f4')
+            return cls(len(beats), beats=beats) if len(beats) >= 2 else None
+        if not grid or grid.get('count', 0) < 2:
+            return None
+        
+        rows = [[0, grid['anchor'], grid['bpm']]] + grid.get('segments', [])
+        starts, times, bpms = (np.array(col, dtype=np.float64) for col in zip(*rows))
+        return cls(
+            int(grid['count']),
+            segment_beats=starts.astype(np.int64),
+            segment_times=times,
+            segment_periods=60.0 / bpms
+        )
+    
+    @classmethod
+    def from_analysis(cls, analysis) -> Optional['BeatGrid']:
+        """Load the grid stored on a TrackAnalysis row"""
+        if analysis is None:
+            return None
+        return cls.from_storage(analysis.beat_grid, analysis.beat_times)
+    
+    def to_storage(self) -> Tuple[Dict, Optional[bytes]]:
+        """
+        Serialize for TrackAnalysis.beat_grid / TrackAnalysis.beat_times
+        
+        Returns:
+            (grid dict, float32 beat times or None if the grid is parametric)
+        """
+        if self.explicit_beats is not None:
+            return {'count': self.count}, self.explicit_beats.astype('<f4').tobytes()
+        
+        bpms = 60.0 / self.segment_periods
+        return {
+            'anchor': float(self.segment_times[0]),
+            'bpm': float(bpms[0]),
+            'count': self.count,
+            # Tempo changes / drift corrections: [beat index, time, bpm]
+            'segments': [
+                [int(b), float(t), float(bpm)]
+                for b, t, bpm in zip(self.segment_beats[1:], self.segment_times[1:], bpms[1:])
+            ]
+        }, None
+    
+    @staticmethod
+    def _fit_segments(beats: np.ndarray, tolerance: float) -> List[Tuple[int, float, float]]:
+        """
+        Greedily split beats into constant-period segments
+        
+        Each segment is grown by exponential then binary search to the longest
+        run whose least-squares line stays within tolerance of every beat.
+        """
+        n = len(beats)
+        segments = []
+        start = 0
+        while start < n:
+            if n - start == 1:
+                period = segments[-1][2] if segments else 0.5
+                segments.append((start, float(beats[start]), period))
+                break
+            
+            # Exponential search for an end that no longer fits
+            good = start + 1
+            step = 2
+            while True:
+                end = min(start + step, n - 1)
+                if BeatGrid._fit(beats, start, end, tolerance) is None:
+                    bad = end
+                    break
+                good = end
+                if end == n - 1:
+                    bad = None
+                    break
+                step *= 2
+            
+            # Binary search for the last end that fits
+            if bad is not None:
+                while bad - good > 1:
+                    mid = (good + bad) // 2
+                    if BeatGrid._fit(beats, start, mid, tolerance) is None:
+                        bad = mid
+                    else:
+                        good = mid
+            
+            intercept, period = BeatGrid._fit(beats, start, good, tolerance)
+            segments.append((start, intercept, period))
+            start = good + 1
+        return segments
+    
+    @staticmethod
+    def _fit(beats: np.ndarray, start: int, end: int, tolerance: float) -> Optional[Tuple[float, float]]:
+        """Least-squares (time at start, period) for beats[start:end + 1], or None if it doesn't fit"""
+        window = beats[start:end + 1]
+        offsets = np.arange(len(window), dtype=np.float64)
+        if len(window) == 2:
+            return float(window[0]), float(window[1] - window[0])
+        period, intercept = np.polyfit(offsets, window, 1)
+        if period <= 0 or np.max(np.abs(intercept + period * offsets - window)) > tolerance:
+            return None
+        return float(intercept), float(period)
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    @property
+    def is_parametric(self) -> bool:
+        return self.explicit_beats is None
+    
+    def time_at(self, index):
+        """Time of beat index (scalar or array), extrapolating past the grid ends"""
+        if not self.is_parametric:
+            clamped = np.clip(index, 0, self.count - 1)
+            return self.explicit_beats[clamped].astype(np.float64)
+        seg = np.searchsorted(self.segment_beats, index, side='right') - 1
+        seg = np.maximum(seg, 0)
+        return self.segment_times[seg] + (index - self.segment_beats[seg]) * self.segment_periods[seg]
+    
+    def index_at(self, time: float) -> float:
+        """Fractional beat index at a time"""
+        if not self.is_parametric:
+            i = int(np.searchsorted(self.explicit_beats, time))
+            if i == 0:
+                return 0.0
+            if i == self.count:
+                return float(self.count - 1)
+            t0, t1 = float(self.explicit_beats[i - 1]), float(self.explicit_beats[i])
+            return i - 1 + (time - t0) / (t1 - t0)
+        seg = max(int(np.searchsorted(self.segment_times, time, side='right')) - 1, 0)
+        return float(self.segment_beats[seg] + (time - self.segment_times[seg]) / self.segment_periods[seg])
+    
+    def beats_between(self, start: float, end: float) -> np.ndarray:
+        """Expand the beat times falling in [start, end]"""
+        if not self.is_parametric:
+            lo = np.searchsorted(self.explicit_beats, start, side='left')
+            hi = np.searchsorted(self.explicit_beats, end, side='right')
+            return self.explicit_beats[lo:hi].astype(np.float64)
+        first = max(int(np.ceil(self.index_at(start) - 1e-9)), 0)
+        last = min(int(np.floor(self.index_at(end) + 1e-9)), self.count - 1)
+        if last < first:
+            return np.empty(0, dtype=np.float64)
+        return self.time_at(np.arange(first, last + 1))
+    
+    def to_positions(self) -> List[float]:
+        """Expand the whole grid to a list of beat times"""
+        return self.time_at(np.arange(self.count)).tolist()
+    
+    def nearest_index(self, time: float, step: int = 1) -> int:
+        """
+        Index of the beat closest to time, restricted to every step-th beat
+        
+        Args:
+            time: Position in seconds
+            step: Only consider beats whose index is a multiple of step
+                  (BEATS_PER_BAR for downbeats, BEATS_PER_PHRASE for phrases)
+        
+        Returns:
+            Beat index into the full grid
+        """
+        last = ((self.count - 1) // step) * step
+        lower = int(np.floor(self.index_at(time) / step)) * step
+        lower = min(max(lower, 0), last)
+        upper = min(lower + step, last)
+        if abs(self.beat_time(upper) - time) < abs(time - self.beat_time(lower)):
+            return upper
+        return lower
+    
+    def beat_time(self, index: int) -> float:
+        """Time of a beat, clamped to the grid"""
+        index = min(max(index, 0), self.count - 1)
+        return float(self.time_at(index))
+    
+    def snap_to_beat(self, time: float) -> float:
+        """Snap a position to the nearest beat"""
+        return self.beat_time(self.nearest_index(time))
+    
+    def snap_to_phrase(self, time: float, phrase_beats: int = BEATS_PER_PHRASE) -> float:
+        """Snap a position to the nearest phrase boundary"""
+        return self.beat_time(self.nearest_index(time, step=phrase_beats))
+    
+    def beat_period(self) -> float:
+        """Median beat period in seconds"""
+        if not self.is_parametric:
+            return float(np.median(np.diff(self.explicit_beats)))
+        lengths = np.diff(np.append(self.segment_beats, self.count))
+        order = np.argsort(self.segment_periods)
+        cumulative = np.cumsum(lengths[order])
+        return float(self.segment_periods[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
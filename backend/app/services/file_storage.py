@@ -0,0 +1,94 @@
+"""
+File storage helpers for DJ Mixing Platform
+Uploads are stored under their content hash, which also identifies audio
+files independently of their path, so caches keyed by it stay valid across
+renames and re-imports
+"""
+
+from typing import Dict
+import hashlib
+import os
+from mutagen import File as MutagenFile
+from app.core.config import settings
+from app.models.models import Track
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class FileStorageService:
+    """Service for stored audio files"""
+    
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        """SHA-256 of a file's contents, read in chunks"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def content_hash(track: Track) -> str:
+        """
+        Content hash of a track's file
+        
+        Tracks not hashed yet (synced but not analyzed) are hashed here
+        without saving it: reads do not write, the sync stores it.
+        """
+        return track.content_hash or FileStorageService.hash_file(track.file_path)
+    
+    @staticmethod
+    def content_path(content_hash: str, extension: str) -> str:
+        """Content-addressed location of an uploaded file, fanned out over 256 directories"""
+        return os.path.join(settings.UPLOAD_DIR, content_hash[:2], f"{content_hash}{extension}")
+    
+    @staticmethod
+    def store(temp_path: str, content_hash: str, extension: str) -> str:
+        """
+        Move a received upload to its content-addressed location
+        
+        Returns:
+            The final path (an identical file already stored there is kept)
+        """
+        path = FileStorageService.content_path(content_hash, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+        return path
+    
+    @staticmethod
+    def is_stored(file_path: str) -> bool:
+        """Whether a file lives in UPLOAD_DIR (as opposed to a synced library folder)"""
+        upload_dir = os.path.realpath(settings.UPLOAD_DIR)
+        return os.path.realpath(file_path).startswith(upload_dir + os.sep)
+    
+    @staticmethod
+    def read_tags(file_path: str, fallback_title: str) -> Dict:
+        """
+        Read title, artist, album and genre tags and the duration with mutagen
+        
+        Args:
+            file_path: Audio file
+            fallback_title: Title to use when the file has none (e.g. the filename)
+        
+        Returns:
+            Dict of tags, with 'duration' in seconds or None if unknown
+        """
+        try:
+            audio_file = MutagenFile(file_path, easy=True)
+        except Exception:
+            audio_file = None
+        if not audio_file:
+            return {
+                'title': fallback_title, 'artist': 'Unknown', 'album': None, 'genre': None,
+                'duration': None
+            }
+        return {
+            'title': audio_file.get('title', [fallback_title])[0],
+            'artist': audio_file.get('artist', ['Unknown'])[0],
+            'album': audio_file.get('album', [None])[0],
+            'genre': audio_file.get('genre', [None])[0],
+            'duration': getattr(audio_file.info, 'length', None)
+        }
@@ -0,0 +1,256 @@
+"""
+Acoustic fingerprinting for DJ Mixing Platform
+Compact fingerprints in the style of Haitsma & Kalker: one 32-bit value per
+~93 ms frame, each bit the sign of an energy difference between neighboring
+bands and frames. Encodings of the same recording (MP3 rip, FLAC, re-tagged
+copy) differ in a small fraction of bits, different recordings in about half.
+A sample of the values is kept in an inverted index for fast candidate lookup.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.models import FingerprintHash, Track, TrackAnalysis
+
+# Energy bands between FINGERPRINT_FMIN and FINGERPRINT_FMAX (Hz), giving
+# FINGERPRINT_BANDS - 1 bits per frame
+FINGERPRINT_BANDS = 33
+FINGERPRINT_FMIN = 300.0
+FINGERPRINT_FMAX = 5000.0
+
+# Spectrogram frames summed into one fingerprint frame (512-sample hops at
+# 44.1 kHz -> ~93 ms)
+FINGERPRINT_POOL = 8
+
+# Only values divisible by INDEX_SAMPLING are indexed; choosing them by value
+# rather than position keeps the sample aligned between encodings
+INDEX_SAMPLING = 16
+
+# Candidates need this share of the query's index keys (and at least
+# MIN_MATCHING_KEYS) before their full fingerprints are compared
+MIN_MATCHING_SHARE = 0.1
+MIN_MATCHING_KEYS = 4
+MAX_CANDIDATES = 5
+
+# Frames of misalignment tried when comparing fingerprints (encoder delay)
+MAX_OFFSET = 4
+
+# Bit error rates at or below this are the same recording
+DUPLICATE_BER = 0.3
+
+# Duplicates have (nearly) the same length
+MIN_LENGTH_RATIO = 0.95
+
+_BIT_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class FingerprintService:
+    """Service for acoustic fingerprints and duplicate detection"""
+    
+    @staticmethod
+    def compute(S: np.ndarray, sr: int) -> bytes:
+        """
+        Fingerprint a track from its magnitude spectrogram
+        
+        Args:
+            S: Magnitude spectrogram (frequency bins x frames), as from librosa.stft
+            sr: Sample rate of the audio
+        
+        Returns:
+            Little-endian uint32 values, one per fingerprint frame
+        """
+        frequencies = np.linspace(0, sr / 2, S.shape[0])
+        edges = np.geomspace(FINGERPRINT_FMIN, FINGERPRINT_FMAX, FINGERPRINT_BANDS + 1)
+        band = np.digitize(frequencies, edges) - 1
+        in_range = (band >= 0) & (band < FINGERPRINT_BANDS)
+        
+        # Band energies per spectrogram frame, then summed into fingerprint frames
+        energy = np.zeros((FINGERPRINT_BANDS, S.shape[1]))
+        np.add.at(energy, band[in_range], S[in_range] ** 2)
+        frames = S.shape[1] // FINGERPRINT_POOL
+        energy = energy[:, :frames * FINGERPRINT_POOL]
+        energy = energy.reshape(FINGERPRINT_BANDS, frames, FINGERPRINT_POOL).sum(axis=2)
+        
+        band_diff = energy[:-1] - energy[1:]
+        bits = (band_diff[:, 1:] - band_diff[:, :-1]) > 0
+        
+        weights = (1 << np.arange(FINGERPRINT_BANDS - 1, dtype=np.uint64))
+        values = (bits.astype(np.uint64) * weights[:, None]).sum(axis=0)
+        return values.astype('<u4').tobytes()
+    
+    @staticmethod
+    def decode(fingerprint: bytes) -> np.ndarray:
+        return np.frombuffer(fingerprint, dtype='<u4')
+    
+    @staticmethod
+    def index_keys(fingerprint: bytes) -> List[int]:
+        """
+        Sampled fingerprint values for the inverted index, as signed 32-bit
+        integers
+        
+        Silent frames (all bits equal) are left out, they match any silence.
+        """
+        values = np.unique(FingerprintService.decode(fingerprint))
+        values = values[
+            (values % INDEX_SAMPLING == 0) & (values != 0) & (values != 0xFFFFFFFF)
+        ]
+        return values.view('<i4').tolist()
+    
+    @staticmethod
+    def bit_error_rate(a: bytes, b: bytes) -> float:
+        """
+        Share of differing bits between two fingerprints at their best alignment
+        
+        Returns:
+            0.0 for identical fingerprints, around 0.5 for unrelated audio, 1.0
+            if they cannot be compared
+        """
+        x = FingerprintService.decode(a)
+        y = FingerprintService.decode(b)
+        best = 1.0
+        for offset in range(-MAX_OFFSET, MAX_OFFSET + 1):
+            xs = x[max(offset, 0):]
+            ys = y[max(-offset, 0):]
+            n = min(len(xs), len(ys))
+            if n == 0:
+                continue
+            errors = _BIT_COUNTS[(xs[:n] ^ ys[:n]).view(np.uint8)].sum()
+            best = min(best, float(errors) / (32 * n))
+        return best
+    
+    @staticmethod
+    def compare(a: bytes, b: bytes) -> Optional[float]:
+        """
+        Compare two fingerprints
+        
+        Returns:
+            The bit error rate if they are of the same recording, else None
+        """
+        length_a, length_b = len(a) // 4, len(b) // 4
+        if not length_a or not length_b:
+            return None
+        if min(length_a, length_b) / max(length_a, length_b) < MIN_LENGTH_RATIO:
+            return None
+        ber = FingerprintService.bit_error_rate(a, b)
+        return ber if ber <= DUPLICATE_BER else None
+    
+    @staticmethod
+    def find_matches(
+        db: Session,
+        fingerprint: bytes,
+        exclude_track_id: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Find indexed tracks of the same recording
+        
+        Candidates sharing index keys are looked up in the inverted index
+        and confirmed by comparing their full fingerprints.
+        
+        Returns:
+            (track_id, bit error rate) of the matches, best first
+        """
+        keys = FingerprintService.index_keys(fingerprint)
+        if not keys:
+            return []
+        
+        hits = func.count(FingerprintHash.hash)
+        query = (
+            db.query(FingerprintHash.track_id, hits)
+            .filter(FingerprintHash.hash.in_(keys))
+            .group_by(FingerprintHash.track_id)
+            .having(hits >= max(MIN_MATCHING_KEYS, int(len(keys) * MIN_MATCHING_SHARE)))
+        )
+        if exclude_track_id is not None:
+            query = query.filter(FingerprintHash.track_id != exclude_track_id)
+        candidates = [track_id for track_id, _ in query.order_by(hits.desc()).limit(MAX_CANDIDATES)]
+        if not candidates:
+            return []
+        
+        matches = []
+        fingerprints = db.query(TrackAnalysis.track_id, TrackAnalysis.fingerprint).filter(
+            TrackAnalysis.track_id.in_(candidates),
+            TrackAnalysis.fingerprint.isnot(None)
+        )
+        for track_id, candidate in fingerprints:
+            ber = FingerprintService.compare(fingerprint, candidate)
+            if ber is not None:
+                matches.append((track_id, ber))
+        return sorted(matches, key=lambda match: match[1])
+    
+    @staticmethod
+    def find_duplicate(
+        db: Session,
+        fingerprint: bytes,
+        exclude_track_id: Optional[int] = None
+    ) -> Optional[int]:
+        """Id of the library track a fingerprint duplicates, or None"""
+        matches = FingerprintService.find_matches(db, fingerprint, exclude_track_id)
+        return matches[0][0] if matches else None
+    
+    @staticmethod
+    def index(db: Session, track_id: int, fingerprint: bytes):
+        """Replace the index entries of a track"""
+        db.query(FingerprintHash).filter(FingerprintHash.track_id == track_id).delete(
+            synchronize_session=False
+        )
+        db.add_all([
+            FingerprintHash(hash=key, track_id=track_id)
+            for key in FingerprintService.index_keys(fingerprint)
+        ])
+    
+    @staticmethod
+    def remove(db: Session, track: Track):
+        """
+        Take a track out of the index before it is deleted or re-analyzed
+        
+        If it is the original of duplicates, the oldest duplicate becomes the
+        original in its place.
+        """
+        db.query(FingerprintHash).filter(FingerprintHash.track_id == track.id).delete(
+            synchronize_session=False
+        )
+        duplicates = (
+            db.query(Track)
+            .filter(Track.duplicate_of == track.id)
+            .order_by(Track.id)
+            .all()
+        )
+        if not duplicates:
+            return
+        
+        original, *others = duplicates
+        original.duplicate_of = None
+        for duplicate in others:
+            duplicate.duplicate_of = original.id
+        if original.analysis is not None and original.analysis.fingerprint:
+            FingerprintService.index(db, original.id, original.analysis.fingerprint)
+        db.flush()
+    
+    @staticmethod
+    def copy_analysis(original: Track) -> Dict:
+        """
+        Analysis result of a duplicate, taken from its original instead of
+        analyzing the file again
+        
+        Returns:
+            Dict in the format of AudioAnalysisService.analyze_track
+        """
+        analysis = original.analysis
+        return {
+            'duration': original.duration,
+            'bpm': analysis.bpm,
+            'key': analysis.key,
+            'camelot_key': analysis.camelot_key,
+            'energy_level': analysis.energy_level,
+            'energy_envelope': analysis.energy_envelope,
+            'beat_grid': analysis.beat_grid,
+            'beat_times': analysis.beat_times,
+            'spectral_centroid': analysis.spectral_centroid,
+            'spectral_rolloff': analysis.spectral_rolloff,
+            'waveform': original.waveform,
+            'structure': analysis.structure,
+            'intro_envelope': analysis.intro_envelope,
+            'outro_envelope': analysis.outro_envelope,
+            'fingerprint': analysis.fingerprint
+        }
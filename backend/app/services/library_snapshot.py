@@ -0,0 +1,98 @@
+"""
+In-memory library snapshot for DJ Mixing Platform
+BPM, key and energy of every analyzed track (one copy per recording), kept
+per API worker for compatibility lookups. Changes announced by other
+processes (see app.core.library_events) reload only the affected tracks.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import library_events
+from app.models.models import Track, TrackAnalysis
+from bisect import bisect_left
+import asyncio
+
+# Tracks in id order (the order of database reads): their ids and rows
+_ids: List[int] = []
+_rows: Optional[List[Dict]] = None
+_stale: Set[int] = set()
+# Bumped on every reset, so a load that overlapped one is not kept
+_generation = 0
+_lock = asyncio.Lock()
+
+
+@library_events.on_change
+def _library_changed(track_ids: Optional[Set[int]]):
+    global _rows, _generation
+    if track_ids is None:
+        _rows = None
+        _generation += 1
+    else:
+        _stale.update(track_ids)
+
+
+class LibrarySnapshotService:
+    """Service for the in-memory snapshot of analyzed tracks"""
+    
+    @staticmethod
+    async def analyzed_tracks(db: AsyncSession) -> List[Dict]:
+        """
+        Analyzed tracks, one copy per recording, as dicts with id, title,
+        artist, bpm, camelot_key and energy_level
+        
+        Served from memory while library changes are received, read from
+        the database otherwise. Either way the result reflects every change
+        up to library_events.version() at the time of the call (which keys
+        cached responses of the library scope, see app.core.cache).
+        """
+        global _ids, _rows
+        if not library_events.is_live():
+            return list((await LibrarySnapshotService._load(db)).values())
+        
+        async with _lock:
+            generation = _generation
+            if _rows is None:
+                _stale.clear()
+                tracks = await LibrarySnapshotService._load(db)
+                if generation == _generation:
+                    _ids, _rows = list(tracks.keys()), list(tracks.values())
+                return list(tracks.values())
+            
+            if _stale:
+                track_ids = sorted(_stale)
+                _stale.clear()
+                loaded = await LibrarySnapshotService._load(db, track_ids)
+                if generation != _generation:
+                    return list((await LibrarySnapshotService._load(db)).values())
+                # Update in place, keeping the id order
+                for track_id in track_ids:
+                    index = bisect_left(_ids, track_id)
+                    present = index < len(_ids) and _ids[index] == track_id
+                    if track_id in loaded:
+                        if present:
+                            _rows[index] = loaded[track_id]
+                        else:
+                            _ids.insert(index, track_id)
+                            _rows.insert(index, loaded[track_id])
+                    elif present:
+                        del _ids[index]
+                        del _rows[index]
+            return list(_rows)
+    
+    @staticmethod
+    async def _load(db: AsyncSession, track_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict]:
+        """Read analyzed tracks (all, or some ids) from the database"""
+        query = (
+            select(
+                Track.id, Track.title, Track.artist,
+                TrackAnalysis.bpm, TrackAnalysis.camelot_key, TrackAnalysis.energy_level
+            )
+            .join(TrackAnalysis, TrackAnalysis.track_id == Track.id)
+            .where(Track.duplicate_of.is_(None))
+            .order_by(Track.id)
+        )
+        if track_ids is not None:
+            query = query.where(Track.id.in_(track_ids))
+        rows = await db.execute(query)
+        return {row.id: dict(row._mapping) for row in rows}
@@ -0,0 +1,439 @@
+"""
+Library sync service for DJ Mixing Platform
+Indexes local music folders in place: a rescan compares each file's size and
+mtime with the index and only reads tags of new or changed files, then
+analyzes tracks without analysis on a process pool
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.locks import JobLock
+from app.core.metrics import ANALYSIS_DURATION, ANALYSIS_PENDING
+from app.models.models import Track, TrackAnalysis
+from app.services.analysis_pool import analyze_file
+from app.services.file_storage import FileStorageService
+from app.services.fingerprint import FingerprintService
+
+logger = logging.getLogger(__name__)
+
+# Rows written per commit while indexing and analyzing
+SYNC_BATCH_SIZE = 500
+ANALYSIS_BATCH_SIZE = 20
+
+
+class LibrarySyncService:
+    """Service for syncing music folders into the track library"""
+    
+    @staticmethod
+    def scan(root: str, extensions: Set[str]) -> Dict[str, Tuple[int, float]]:
+        """
+        Find the audio files under a directory
+        
+        Hidden files and directories are skipped and symlinked directories
+        are not followed.
+        
+        Returns:
+            {absolute path: (size, mtime)}
+        """
+        files = {}
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name.startswith('.'):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif (
+                            entry.is_file()
+                            and os.path.splitext(entry.name)[1].lower() in extensions
+                        ):
+                            stat = entry.stat()
+                            files[entry.path] = (stat.st_size, stat.st_mtime)
+            except OSError as e:
+                logger.warning(f"Skipping {directory}: {e}")
+        return files
+    
+    @staticmethod
+    def read_files(paths: List[str], workers: Optional[int] = None) -> Dict[str, Dict]:
+        """Read the tags of files in parallel (mostly I/O, so on threads)"""
+        if not paths:
+            return {}
+        with ThreadPoolExecutor(max_workers=workers or settings.SYNC_TAG_WORKERS) as pool:
+            tags = pool.map(
+                lambda path: FileStorageService.read_tags(path, os.path.basename(path)),
+                paths
+            )
+            return dict(zip(paths, tags))
+    
+    @staticmethod
+    def sync_lock() -> JobLock:
+        """Lock held while a sync runs, by whichever process runs it (API or command line)"""
+        return JobLock(os.path.join(settings.UPLOAD_DIR, 'library_sync.lock'))
+    
+    @staticmethod
+    def sync(
+        db: Session,
+        directories: List[str],
+        extensions: Set[str],
+        analyze: bool = True,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Sync music folders into the library
+        
+        New files are added as tracks, tracks of changed files (size or mtime)
+        are re-tagged and re-queued for analysis, and tracks of deleted files
+        are removed. Directories that do not exist are skipped rather than
+        treated as empty, so an unmounted drive does not empty the library.
+        
+        Callers hold sync_lock, so two syncs never index the same files at once.
+        
+        Args:
+            db: Database session
+            directories: Folders to sync
+            extensions: Audio file extensions to index
+            analyze: Analyze tracks that have no analysis after indexing
+            workers: Analysis processes (default: ANALYSIS_WORKERS, or one per core)
+            progress: Called with the stats as they change
+        
+        Returns:
+            Dict of counts: scanned, added, updated, removed, unchanged,
+            to_analyze, analyzed, failed, skipped (removed while analyzed)
+        """
+        stats = {
+            'scanned': 0, 'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0,
+            'to_analyze': 0, 'analyzed': 0, 'failed': 0, 'skipped': 0
+        }
+        report = progress or (lambda stats: None)
+        
+        roots = []
+        for directory in directories:
+            root = os.path.realpath(directory)
+            if os.path.isdir(root):
+                roots.append(root)
+            else:
+                logger.warning(f"Library folder {directory} not found, skipping")
+        
+        for root in roots:
+            LibrarySyncService._sync_root(db, root, extensions, stats)
+            report(stats)
+        
+        if analyze and roots:
+            pending = LibrarySyncService.unanalyzed(db, roots)
+            stats['to_analyze'] = len(pending)
+            report(stats)
+            
+            def on_result(outcome: str):
+                stats[outcome] += 1
+                report(stats)
+            
+            LibrarySyncService.analyze_tracks(db, pending, workers, on_result)
+        
+        return stats
+    
+    @staticmethod
+    def _sync_root(db: Session, root: str, extensions: Set[str], stats: Dict):
+        """Bring the index of one folder up to date with the files on disk"""
+        files = LibrarySyncService.scan(root, extensions)
+        stats['scanned'] += len(files)
+        
+        # Only the columns needed for the comparison, not whole tracks
+        indexed = {
+            path: (track_id, size, mtime)
+            for track_id, path, size, mtime in db.query(
+                Track.id, Track.file_path, Track.file_size, Track.file_mtime
+            ).filter(Track.file_path.startswith(root + os.sep, autoescape=True))
+        }
+        
+        new_paths = [path for path in files if path not in indexed]
+        changed = {
+            indexed[path][0]: path for path, (size, mtime) in files.items()
+            if path in indexed and indexed[path][1:] != (size, mtime)
+        }
+        removed = [track_id for path, (track_id, _, _) in indexed.items() if path not in files]
+        stats['unchanged'] += len(files) - len(new_paths) - len(changed)
+        
+        tags = LibrarySyncService.read_files(new_paths + list(changed.values()))
+        
+        for i in range(0, len(new_paths), SYNC_BATCH_SIZE):
+            db.add_all([
+                LibrarySyncService._new_track(path, files[path], tags[path])
+                for path in new_paths[i:i + SYNC_BATCH_SIZE]
+            ])
+            db.commit()
+        stats['added'] += len(new_paths)
+        
+        if changed:
+            for track in db.query(Track).filter(Track.id.in_(list(changed))):
+                path = changed[track.id]
+                LibrarySyncService._update_track(track, files[path], tags[path])
+                # Queue the track for analysis again
+                FingerprintService.remove(db, track)
+                track.duplicate_of = None
+                if track.analysis:
+                    db.delete(track.analysis)
+            db.commit()
+            stats['updated'] += len(changed)
+        
+        if removed:
+            for i in range(0, len(removed), SYNC_BATCH_SIZE):
+                batch = removed[i:i + SYNC_BATCH_SIZE]
+                for track in db.query(Track).filter(Track.id.in_(batch)):
+                    FingerprintService.remove(db, track)
+                    if track.analysis:
+                        db.delete(track.analysis)
+                    db.delete(track)
+                db.commit()
+            stats['removed'] += len(removed)
+        
+        logger.info(
+            f"Synced {root}: {len(files)} files, {len(new_paths)} new, "
+            f"{len(changed)} changed, {len(removed)} removed"
+        )
+    
+    @staticmethod
+    def _new_track(path: str, stat: Tuple[int, float], tags: Dict) -> Track:
+        size, mtime = stat
+        return Track(
+            title=tags['title'],
+            artist=tags['artist'],
+            album=tags['album'],
+            genre=tags['genre'],
+            duration=tags['duration'] or 0.0,  # Replaced by the analyzed duration
+            file_path=path,
+            file_format=os.path.splitext(path)[1].lower(),
+            file_size=size,
+            file_mtime=mtime
+        )
+    
+    @staticmethod
+    def _update_track(track: Track, stat: Tuple[int, float], tags: Dict):
+        track.file_size, track.file_mtime = stat
+        track.title = tags['title']
+        track.artist = tags['artist']
+        track.album = tags['album']
+        track.genre = tags['genre']
+        track.duration = tags['duration'] or 0.0
+        track.content_hash = None
+    
+    @staticmethod
+    def unanalyzed(db: Session, roots: Iterable[str]) -> List[Tuple[int, str]]:
+        """(id, file path) of the tracks under the given folders that have no analysis"""
+        pending = []
+        for root in roots:
+            pending.extend(
+                db.query(Track.id, Track.file_path)
+                .outerjoin(TrackAnalysis)
+                .filter(
+                    TrackAnalysis.id.is_(None),
+                    Track.file_path.startswith(root + os.sep, autoescape=True)
+                )
+                .order_by(Track.id)
+                .all()
+            )
+        return pending
+    
+    @staticmethod
+    def analyze_tracks(
+        db: Session,
+        tracks: List[Tuple[int, str]],
+        workers: Optional[int] = None,
+        on_result: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Analyze tracks in bulk on a process pool
+        
+        Results are committed in batches as they come in, so an interrupted
+        run keeps the finished analyses and the next sync picks up the rest.
+        
+        Args:
+            db: Database session
+            tracks: (id, file path) of the tracks to analyze
+            workers: Analysis processes (default: ANALYSIS_WORKERS, or one per core)
+            on_result: Called per track with 'analyzed', 'failed', or 'skipped'
+                       when the track was removed before its result came in
+        """
+        if not tracks:
+            return
+        on_result = on_result or (lambda outcome: None)
+        
+        # Tracks of this run still waiting for analysis
+        pending = len(tracks)
+        ANALYSIS_PENDING.inc(pending)
+        
+        def finished():
+            nonlocal pending
+            pending -= 1
+            ANALYSIS_PENDING.dec()
+        
+        def fail(path: str, e: Exception):
+            logger.error(f"Analyzing {path} failed: {e}")
+            on_result('failed')
+        
+        def apply(track_id: int, path: str, result: Dict, content_hash: str, done: int):
+            track = db.query(Track).filter(Track.id == track_id).first()
+            outcome = 'skipped'
+            if track:
+                try:
+                    LibrarySyncService.apply_analysis(db, track, result, content_hash)
+                except ValueError as e:
+                    fail(path, e)
+                    return
+                outcome = 'analyzed'
+            if done % ANALYSIS_BATCH_SIZE == 0:
+                db.commit()
+            on_result(outcome)
+        
+        workers = workers or settings.ANALYSIS_WORKERS or os.cpu_count() or 1
+        try:
+            # A process even for one worker, so syncs started by the API do
+            # not load the analysis stack into the API process; spawn:
+            # forking a threaded server process is unsafe
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(tracks)),
+                mp_context=multiprocessing.get_context('spawn')
+            ) as pool:
+                futures = {
+                    pool.submit(_analyze_file, path): (track_id, path)
+                    for track_id, path in tracks
+                }
+                for done, future in enumerate(as_completed(futures), start=1):
+                    track_id, path = futures[future]
+                    try:
+                        result, content_hash, seconds = future.result()
+                    except Exception as e:
+                        fail(path, e)
+                        continue
+                    finally:
+                        finished()
+                    ANALYSIS_DURATION.labels("library").observe(seconds)
+                    apply(track_id, path, result, content_hash, done)
+        finally:
+            ANALYSIS_PENDING.dec(pending)
+            db.commit()
+    
+    @staticmethod
+    def apply_analysis(db: Session, track: Track, result: Dict, content_hash: Optional[str] = None):
+        """
+        Store the result of AudioAnalysisService.analyze_track on a track and
+        its analysis
+        
+        Tracks whose fingerprint matches an indexed track are flagged as its
+        duplicates and take its analysis (when analysis stopped early, it is
+        all they have); other tracks are added to the fingerprint index.
+        """
+        fingerprint = result.get('fingerprint')
+        duplicate_of = result.get('duplicate_of')
+        if duplicate_of is None and fingerprint:
+            duplicate_of = FingerprintService.find_duplicate(db, fingerprint, exclude_track_id=track.id)
+        
+        if duplicate_of is not None:
+            original = db.query(Track).filter(Track.id == duplicate_of).first()
+            if original is None or original.analysis is None:
+                # Deleted since the lookup
+                if 'bpm' not in result:
+                    raise ValueError(f"Original track {duplicate_of} not found")
+                duplicate_of = None
+            elif 'bpm' not in result:
+                result = {**FingerprintService.copy_analysis(original), 'fingerprint': fingerprint}
+        track.duplicate_of = duplicate_of
+        
+        track.duration = result['duration']
+        track.bpm = result['bpm']
+        track.key = result['key']
+        track.energy = result['energy_level']
+        track.waveform = result['waveform']
+        if content_hash:
+            track.content_hash = content_hash
+        
+        analysis = track.analysis
+        if analysis is None:
+            analysis = TrackAnalysis(track_id=track.id)
+            db.add(analysis)
+        analysis.bpm = result['bpm']
+        analysis.key = result['key']
+        analysis.camelot_key = result['camelot_key']
+        analysis.energy_level = result['energy_level']
+        analysis.structure = result['structure']
+        analysis.beat_grid = result['beat_grid']
+        analysis.beat_times = result['beat_times']
+        analysis.energy_envelope = result['energy_envelope']
+        analysis.intro_envelope = result['intro_envelope']
+        analysis.outro_envelope = result['outro_envelope']
+        analysis.fingerprint = fingerprint
+        analysis.spectral_centroid = result['spectral_centroid']
+        analysis.spectral_rolloff = result['spectral_rolloff']
+        
+        if duplicate_of is None and fingerprint:
+            FingerprintService.index(db, track.id, fingerprint)
+        # Make the index entries visible to lookups for the next tracks
+        db.flush()
+
+
+def _analyze_file(file_path: str) -> Tuple[Dict, str, float]:
+    """
+    Analyze and hash one file (process pool worker)
+    
+    Analysis stops after the fingerprint for duplicates of indexed tracks.
+    
+    Returns:
+        The analysis result, the content hash and the analysis time in seconds
+    """
+    started = time.perf_counter()
+    result = analyze_file(file_path, find_duplicates=True)
+    seconds = time.perf_counter() - started
+    return result, FileStorageService.hash_file(file_path), seconds
+
+
+def main():
+    """Command line entry point: python -m app.services.library_sync [folder ...]"""
+    from app.api.tracks import ALLOWED_EXTENSIONS
+    from app.core.cache import register_session_hooks
+    
+    parser = argparse.ArgumentParser(description="Sync music folders into the track library")
+    parser.add_argument(
+        'directories', nargs='*',
+        help="Folders to sync (default: LIBRARY_DIRS)"
+    )
+    parser.add_argument(
+        '--no-analyze', action='store_true',
+        help="Only index files, leave analysis for a later sync"
+    )
+    args = parser.parse_args()
+    
+    directories = args.directories or settings.LIBRARY_DIRS
+    if not directories:
+        parser.error("No folders given and LIBRARY_DIRS is not set")
+    
+    lock = LibrarySyncService.sync_lock()
+    if not lock.acquire():
+        parser.error("A library sync is already running")
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Let API workers know what this run changes
+    register_session_hooks()
+    db = SessionLocal()
+    try:
+        stats = LibrarySyncService.sync(
+            db, directories, ALLOWED_EXTENSIONS, analyze=not args.no_analyze
+        )
+    finally:
+        db.close()
+        lock.release()
+    print(', '.join(f"{key}: {value}" for key, value in stats.items()))
+
+
+if __name__ == '__main__':
+    main()
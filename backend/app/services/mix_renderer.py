@@ -0,0 +1,689 @@
+"""
+Mix rendering service for DJ Mixing Platform
+Renders a saved mix to audio in fixed-size blocks, so memory use stays
+constant whatever the length of the mix, and long mixes in parallel segments
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+import numpy as np
+import soundfile as sf
+from sqlalchemy.orm import Session, joinedload
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.locks import JobLock
+from app.models.models import Mix, Track
+from app.services.mix_timeline import MixTimelineService
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+BLOCK_FRAMES = 32768  # ~0.74s per block
+
+# Beat-matching stretch limits; outside them a track plays at its own tempo
+MIN_TEMPO_RATIO = 0.8
+MAX_TEMPO_RATIO = 1.25
+
+# Parallel rendering: segments are joined with a JOIN_FRAMES crossfade inside
+# single-track stretches; PREROLL_FRAMES are rendered and dropped before it
+JOIN_FRAMES = 2048
+PREROLL_FRAMES = 8192
+SEGMENT_FORMAT = 'FLAC'
+SEGMENT_SUBTYPE = 'PCM_24'
+
+# Export format -> (libsndfile format, subtype, media type)
+EXPORT_FORMATS = {
+    'wav': ('WAV', 'PCM_16', 'audio/wav'),
+    'flac': ('FLAC', 'PCM_16', 'audio/flac'),
+}
+
+# Compressed format for streaming -> (ffmpeg encoder options, container, media type)
+STREAM_FORMATS = {
+    'mp3': (['-c:a', 'libmp3lame', '-b:a', '192k', '-compression_level', '7'], 'mp3', 'audio/mpeg'),
+    'ogg': (['-c:a', 'libopus', '-b:a', '128k'], 'ogg', 'audio/ogg'),
+}
+STREAM_CHUNK_BYTES = 16384
+
+
+class TrackStream:
+    """Decodes a track to float32 PCM blocks through ffmpeg, time-stretched by a tempo ratio"""
+    
+    def __init__(self, file_path: str, tempo_ratio: float = 1.0, skip_frames: int = 0, exact: bool = True):
+        """
+        Args:
+            file_path: Audio file to decode
+            tempo_ratio: Playback speed (played BPM / native BPM)
+            skip_frames: Output frames to skip, i.e. where playback starts
+            exact: Keep mid-track starts of stretched tracks sample-identical
+                   to continuous playback (slower, decodes from the top);
+                   otherwise seek, landing within a few milliseconds
+        """
+        command = ['ffmpeg', '-v', 'error', '-nostdin']
+        stretched = abs(tempo_ratio - 1.0) > 1e-4
+        seek = bool(skip_frames) and not (stretched and exact)
+        if seek:
+            source_frames = skip_frames * tempo_ratio if stretched else skip_frames
+            command += ['-ss', f'{source_frames / SAMPLE_RATE:.6f}']
+        command += ['-i', file_path]
+        if stretched:
+            # atempo output depends on where it starts, so exact stretched
+            # tracks are decoded from the top and trimmed afterwards; this keeps
+            # mid-track starts sample-identical to continuous playback
+            filters = [f'atempo={tempo_ratio:.6f}']
+            if skip_frames and not seek:
+                filters += [f'atrim=start_sample={skip_frames}', 'asetpts=PTS-STARTPTS']
+            command += ['-af', ','.join(filters)]
+        command += ['-f', 'f32le', '-ac', str(CHANNELS), '-ar', str(SAMPLE_RATE), 'pipe:1']
+        
+        self.process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+    
+    def read(self, frames: int) -> np.ndarray:
+        """Read the next frames as a (frames, CHANNELS) array, zero-padded past the end"""
+        data = self.process.stdout.read(frames * CHANNELS * 4)
+        samples = np.frombuffer(data, dtype='<f4')
+        available = len(samples) // CHANNELS
+        block = np.zeros((frames, CHANNELS), dtype=np.float32)
+        block[:available] = samples[:available * CHANNELS].reshape(-1, CHANNELS)
+        return block
+    
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.stdout.close()
+        self.process.wait()
+
+
+class MixRendererService:
+    """Service for rendering mixes to audio"""
+    
+    @staticmethod
+    def plan(
+        tracklist: List[Dict],
+        transitions: Optional[List[Dict]],
+        tracks: Dict[int, Track]
+    ) -> List[Dict]:
+        """
+        Work out what each mix entry contributes to the rendered audio
+        
+        Tempo is beat-matched: an entry plays at its 'target_bpm' if given,
+        otherwise at the tempo the previous entry was played at, stretched by
+        at most MIN/MAX_TEMPO_RATIO. Entries are placed on the timeline by
+        MixTimelineService.layout, which stretches their durations, start
+        offsets and overlaps by those ratios.
+        
+        Args:
+            tracklist: Mix tracklist entries ('track_id', 'start_time',
+                       optional 'target_bpm' and 'gain')
+            transitions: Mix transitions (overlap length, optional 'curve':
+                         'equal_power' or 'linear')
+            tracks: Tracks (with analysis loaded) by id
+        
+        Returns:
+            List of render entries with frame positions on the mix timeline
+        """
+        entries = [e for e in tracklist if e.get('track_id') in tracks]
+        
+        ratios = []
+        played_bpm = None
+        for entry in entries:
+            track = tracks[entry['track_id']]
+            native_bpm = (track.analysis.bpm if track.analysis else None) or track.bpm
+            target_bpm = entry.get('target_bpm') or played_bpm or native_bpm
+            
+            ratio = target_bpm / native_bpm if native_bpm and target_bpm else 1.0
+            if not MIN_TEMPO_RATIO <= ratio <= MAX_TEMPO_RATIO:
+                ratio = 1.0
+            ratios.append(ratio)
+            played_bpm = native_bpm * ratio if native_bpm else played_bpm
+        
+        layout = MixTimelineService.layout(entries, transitions, tracks, tempo_ratios=np.array(ratios))
+        
+        curves = [(t or {}).get('curve', 'equal_power') for t in layout['transitions']]
+        curves_in = ['linear'] + curves
+        curves_out = curves + ['linear']
+        
+        plan = []
+        for i, entry in enumerate(layout['entries']):
+            plan.append({
+                'track_id': entry['track_id'],
+                'file_path': tracks[entry['track_id']].file_path,
+                'tempo_ratio': ratios[i],
+                'gain': float(entry.get('gain', 1.0)),
+                'start': int(round(layout['starts'][i] * SAMPLE_RATE)),
+                'end': int(round(layout['ends'][i] * SAMPLE_RATE)),
+                'fade_in': int(round(layout['fade_in'][i] * SAMPLE_RATE)),
+                'fade_out': int(round(layout['fade_out'][i] * SAMPLE_RATE)),
+                'curve_in': curves_in[i],
+                'curve_out': curves_out[i]
+            })
+        return plan
+    
+    @staticmethod
+    def total_frames(plan: List[Dict]) -> int:
+        """Length of the rendered mix in frames"""
+        return max((entry['end'] for entry in plan), default=0)
+    
+    @staticmethod
+    def iter_blocks(
+        plan: List[Dict],
+        start: int = 0,
+        end: Optional[int] = None,
+        block_frames: int = BLOCK_FRAMES,
+        exact: bool = True
+    ) -> Iterator[np.ndarray]:
+        """
+        Render a frame range of the mix block by block
+        
+        At most the entries overlapping the current block have an open decoder,
+        so memory use does not grow with the length of the mix.
+        
+        Args:
+            plan: Render entries from plan()
+            start: First frame to render
+            end: Frame to stop at (default: end of the mix)
+            block_frames: Frames per yielded block
+            exact: Decode stretched tracks exactly as a full render would
+                   (see TrackStream); previews can seek instead
+        
+        Yields:
+            float32 arrays of shape (frames, CHANNELS)
+        """
+        if end is None:
+            end = MixRendererService.total_frames(plan)
+        
+        pending = sorted(
+            (entry for entry in plan if entry['end'] > start and entry['start'] < end),
+            key=lambda entry: entry['start']
+        )
+        active = []
+        streams = {}
+        
+        try:
+            for block_start in range(start, end, block_frames):
+                block_end = min(block_start + block_frames, end)
+                block = np.zeros((block_end - block_start, CHANNELS), dtype=np.float32)
+                
+                while pending and pending[0]['start'] < block_end:
+                    entry = pending.pop(0)
+                    # Entries already playing at the range start are decoded from mid-track
+                    skip = max(block_start - entry['start'], 0)
+                    streams[id(entry)] = TrackStream(
+                        entry['file_path'], entry['tempo_ratio'], skip, exact=exact
+                    )
+                    active.append(entry)
+                
+                for entry in list(active):
+                    lo = max(block_start, entry['start'])
+                    hi = min(block_end, entry['end'])
+                    if hi > lo:
+                        samples = streams[id(entry)].read(hi - lo)
+                        gains = MixRendererService._gains(entry, np.arange(lo, hi))
+                        block[lo - block_start:hi - block_start] += samples * gains[:, None]
+                    if entry['end'] <= block_end:
+                        streams.pop(id(entry)).close()
+                        active.remove(entry)
+                
+                yield block
+        finally:
+            for stream in streams.values():
+                stream.close()
+    
+    @staticmethod
+    def _gains(entry: Dict, frames: np.ndarray) -> np.ndarray:
+        """Gain of an entry at the given timeline frames, including crossfades"""
+        gains = np.full(len(frames), entry['gain'], dtype=np.float32)
+        if entry['fade_in'] > 0:
+            x = np.clip((frames - entry['start']) / entry['fade_in'], 0.0, 1.0)
+            gains *= MixRendererService._curve(x, entry['curve_in'])
+        if entry['fade_out'] > 0:
+            x = np.clip((entry['end'] - frames) / entry['fade_out'], 0.0, 1.0)
+            gains *= MixRendererService._curve(x, entry['curve_out'])
+        return gains
+    
+    @staticmethod
+    def _curve(x: np.ndarray, curve: str) -> np.ndarray:
+        """Crossfade curve: 0 -> 1 as x goes 0 -> 1"""
+        if curve == 'linear':
+            return x
+        return np.sin(x * np.pi / 2)  # equal power
+    
+    @staticmethod
+    def write_blocks(blocks: Iterator[np.ndarray], file_path: str, export_format: str):
+        """Write rendered blocks to a WAV/FLAC file as they arrive"""
+        sf_format, subtype, _ = EXPORT_FORMATS[export_format]
+        with sf.SoundFile(
+            file_path, 'w',
+            samplerate=SAMPLE_RATE,
+            channels=CHANNELS,
+            format=sf_format,
+            subtype=subtype
+        ) as output:
+            for block in blocks:
+                output.write(np.clip(block, -1.0, 1.0))
+    
+    @staticmethod
+    def encode_blocks(
+        blocks: Iterator[np.ndarray],
+        stream_format: str,
+        chunk_bytes: int = STREAM_CHUNK_BYTES
+    ) -> Iterator[bytes]:
+        """
+        Encode rendered blocks through ffmpeg, yielding encoded bytes as they come out
+        
+        Blocks are fed to the encoder from a thread, which blocks once the
+        encoder's pipes are full; rendering therefore only runs a pipe buffer
+        ahead of whoever consumes the encoded bytes. Closing the iterator early
+        stops the encoder and the renderer.
+        
+        Args:
+            blocks: Rendered blocks, e.g. from iter_blocks()
+            stream_format: Key of STREAM_FORMATS
+            chunk_bytes: Maximum size of a yielded chunk
+        """
+        options, container, _ = STREAM_FORMATS[stream_format]
+        process = subprocess.Popen(
+            [
+                'ffmpeg', '-v', 'error', '-nostdin',
+                '-f', 'f32le', '-ac', str(CHANNELS), '-ar', str(SAMPLE_RATE), '-i', 'pipe:0',
+                *options, '-f', container, 'pipe:1'
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        errors = []
+        
+        def feed():
+            try:
+                for block in blocks:
+                    process.stdin.write(np.clip(block, -1.0, 1.0).astype('<f4').tobytes())
+            except (BrokenPipeError, ValueError):
+                pass  # The encoder was stopped because the consumer went away
+            except Exception as e:
+                errors.append(e)
+            finally:
+                if hasattr(blocks, 'close'):
+                    blocks.close()
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+        
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        try:
+            while True:
+                chunk = process.stdout.read1(chunk_bytes)
+                if not chunk:
+                    break
+                yield chunk
+            feeder.join()
+            if errors:
+                raise errors[0]
+            if process.wait() != 0:
+                raise RuntimeError(f"Encoding failed with exit code {process.returncode}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            feeder.join()
+            process.stdout.close()
+    
+    @staticmethod
+    def load_plan(db: Session, mix: Mix) -> List[Dict]:
+        """Load the tracks of a mix and plan its render"""
+        track_ids = {item.get('track_id') for item in mix.tracklist}
+        tracks = (
+            db.query(Track)
+            .options(joinedload(Track.analysis))
+            .filter(Track.id.in_(track_ids))
+            .all()
+        )
+        return MixRendererService.plan(
+            mix.tracklist,
+            mix.transitions,
+            {track.id: track for track in tracks}
+        )
+    
+    @staticmethod
+    def export_path(mix_id: int, export_format: str) -> str:
+        return os.path.join(settings.MIX_EXPORT_DIR, f"mix_{mix_id}.{export_format}")
+    
+    @staticmethod
+    def segments(plan: List[Dict], segment_frames: int) -> List[Dict]:
+        """
+        Split the mix into independently renderable segments
+        
+        Cuts are only placed where a single track plays at full gain, at least
+        PREROLL_FRAMES + JOIN_FRAMES away from any transition, so segments can
+        be joined with a short same-material crossfade.
+        
+        Args:
+            plan: Render entries from plan()
+            segment_frames: Target segment length in frames
+        
+        Returns:
+            List of {'index', 'start', 'end'} frame ranges covering the mix
+        """
+        total = MixRendererService.total_frames(plan)
+        margin = PREROLL_FRAMES + JOIN_FRAMES
+        
+        cuts = []
+        last = 0
+        for lo, hi in MixRendererService._solo_ranges(plan):
+            lo, hi = lo + margin, hi - margin
+            cut = max(lo, last + segment_frames)
+            while cut <= hi and total - cut >= segment_frames // 2:
+                cuts.append(cut)
+                last = cut
+                cut = last + segment_frames
+        
+        bounds = [0] + cuts + [total]
+        return [
+            {'index': i, 'start': bounds[i], 'end': bounds[i + 1]}
+            for i in range(len(bounds) - 1)
+        ]
+    
+    @staticmethod
+    def _solo_ranges(plan: List[Dict]) -> List[Tuple[int, int]]:
+        """Frame ranges where exactly one entry plays and it is not fading"""
+        events = []
+        for entry in plan:
+            events.append((entry['start'], 1, 0))
+            events.append((entry['end'], -1, 0))
+            if entry['fade_in'] > 0:
+                events.append((entry['start'], 0, 1))
+                events.append((entry['start'] + entry['fade_in'], 0, -1))
+            if entry['fade_out'] > 0:
+                events.append((entry['end'] - entry['fade_out'], 0, 1))
+                events.append((entry['end'], 0, -1))
+        events.sort()
+        
+        ranges = []
+        playing = fading = 0
+        previous = None
+        for frame, playing_change, fading_change in events:
+            if previous is not None and frame > previous and playing == 1 and fading == 0:
+                if ranges and ranges[-1][1] == previous:
+                    ranges[-1] = (ranges[-1][0], frame)
+                else:
+                    ranges.append((previous, frame))
+            playing += playing_change
+            fading += fading_change
+            previous = frame
+        return ranges
+    
+    @staticmethod
+    def join_segments(paths: List[str], file_path: str, export_format: str):
+        """
+        Concatenate rendered segments into the export file
+        
+        Every segment after the first starts JOIN_FRAMES before its cut; that
+        overlap is crossfaded with the end of the previous segment.
+        """
+        sf_format, subtype, _ = EXPORT_FORMATS[export_format]
+        ramp = np.linspace(0.0, 1.0, JOIN_FRAMES, dtype=np.float32)[:, None]
+        
+        with sf.SoundFile(
+            file_path, 'w',
+            samplerate=SAMPLE_RATE,
+            channels=CHANNELS,
+            format=sf_format,
+            subtype=subtype
+        ) as output:
+            tail = None
+            for i, path in enumerate(paths):
+                frames = sf.info(path).frames
+                start = 0
+                if tail is not None:
+                    head, _ = sf.read(path, frames=JOIN_FRAMES, dtype='float32', always_2d=True)
+                    output.write(tail * (1.0 - ramp) + head * ramp)
+                    start = JOIN_FRAMES
+                
+                stop = frames if i == len(paths) - 1 else frames - JOIN_FRAMES
+                for block in sf.blocks(
+                    path,
+                    blocksize=BLOCK_FRAMES,
+                    start=start,
+                    stop=stop,
+                    dtype='float32',
+                    always_2d=True
+                ):
+                    output.write(block)
+                
+                if i < len(paths) - 1:
+                    tail, _ = sf.read(path, start=stop, dtype='float32', always_2d=True)
+    
+    @staticmethod
+    def job_dir(mix_id: int, export_format: str) -> str:
+        """Directory holding the segments of an in-progress render"""
+        return f"{MixRendererService.export_path(mix_id, export_format)}.segments"
+    
+    @staticmethod
+    def render_status(mix: Mix, export_format: str = 'wav') -> Dict:
+        """
+        Progress of a mix render, read from its job directory
+        
+        Segment files are only renamed into place once complete, so counting
+        them gives progress across processes and survives restarts.
+        """
+        job_dir = MixRendererService.job_dir(mix.id, export_format)
+        manifest_path = os.path.join(job_dir, 'manifest.json')
+        
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            total = len(manifest['segments'])
+            completed = sum(
+                os.path.exists(os.path.join(job_dir, _segment_name(segment['index'])))
+                for segment in manifest['segments']
+            )
+            return {
+                'status': manifest.get('status', 'rendering'),
+                'format': export_format,
+                'completed_segments': completed,
+                'total_segments': total,
+                'progress': completed / total if total else 0.0,
+                'error': manifest.get('error')
+            }
+        
+        if mix.export_format == export_format and mix.export_path and os.path.exists(mix.export_path):
+            return {'status': 'rendered', 'format': export_format, 'progress': 1.0}
+        return {'status': 'idle', 'format': export_format, 'progress': 0.0}
+    
+    @staticmethod
+    def render_lock(mix_id: int, export_format: str) -> JobLock:
+        """Lock of a mix render, held while its job directory is in use"""
+        return JobLock(f"{MixRendererService.export_path(mix_id, export_format)}.lock")
+    
+    @staticmethod
+    def render_mix(
+        db: Session,
+        mix_id: int,
+        export_format: str = 'wav',
+        workers: Optional[int] = None,
+        lock: Optional[JobLock] = None
+    ) -> str:
+        """
+        Render a saved mix to MIX_EXPORT_DIR and record it on the mix
+        
+        The mix is split into segments() that are rendered on a process pool.
+        Completed segments are kept in the job directory until the export is
+        joined, so re-running a crashed or interrupted render of an unchanged
+        mix only renders the missing segments.
+        
+        Args:
+            db: Database session
+            mix_id: Mix to render
+            export_format: 'wav' or 'flac'
+            workers: Render processes (default: RENDER_WORKERS)
+            lock: The render_lock, if the caller already holds it; released
+                  when the render ends
+        
+        Returns:
+            Path of the exported file
+        
+        Raises:
+            LockHeldError: Another process is rendering the mix in this format
+        """
+        with lock or MixRendererService.render_lock(mix_id, export_format):
+            return MixRendererService._render_locked(db, mix_id, export_format, workers)
+    
+    @staticmethod
+    def _render_locked(db: Session, mix_id: int, export_format: str, workers: Optional[int]) -> str:
+        """Render a mix while holding its render_lock (see render_mix)"""
+        mix = db.query(Mix).filter(Mix.id == mix_id).first()
+        if not mix:
+            raise ValueError(f"Mix {mix_id} not found")
+        
+        plan = MixRendererService.load_plan(db, mix)
+        if not plan:
+            raise ValueError("Mix has no playable tracks")
+        
+        path = MixRendererService.export_path(mix_id, export_format)
+        job_dir = MixRendererService.job_dir(mix_id, export_format)
+        manifest_path = os.path.join(job_dir, 'manifest.json')
+        
+        # Completed segments are only reusable if the mix hasn't changed
+        plan_hash = hashlib.sha256(json.dumps(plan, sort_keys=True).encode()).hexdigest()
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                if json.load(f).get('plan_hash') != plan_hash:
+                    shutil.rmtree(job_dir)
+        os.makedirs(job_dir, exist_ok=True)
+        
+        segments = MixRendererService.segments(
+            plan,
+            int(settings.RENDER_SEGMENT_SECONDS * SAMPLE_RATE)
+        )
+        manifest = {'plan_hash': plan_hash, 'segments': segments, 'status': 'rendering'}
+        _write_manifest(manifest_path, manifest)
+        
+        paths = [os.path.join(job_dir, _segment_name(s['index'])) for s in segments]
+        pending = [(s, p) for s, p in zip(segments, paths) if not os.path.exists(p)]
+        logger.info(
+            f"Rendering mix {mix_id}: {len(pending)}/{len(segments)} segments to render"
+        )
+        
+        try:
+            workers = workers or settings.RENDER_WORKERS
+            if workers == 1 or len(pending) <= 1:
+                for segment, segment_path in pending:
+                    _render_segment(plan, segment, segment_path)
+            else:
+                # spawn: forking a threaded server process is unsafe
+                with ProcessPoolExecutor(
+                    max_workers=min(workers, len(pending)),
+                    mp_context=multiprocessing.get_context('spawn')
+                ) as pool:
+                    futures = [
+                        pool.submit(_render_segment, plan, segment, segment_path)
+                        for segment, segment_path in pending
+                    ]
+                    for done, future in enumerate(as_completed(futures), start=1):
+                        future.result()
+                        logger.info(f"Mix {mix_id}: segment {done}/{len(pending)} rendered")
+            
+            partial_path = f"{path}.part"
+            MixRendererService.join_segments(paths, partial_path, export_format)
+            os.replace(partial_path, path)
+        except Exception as e:
+            _write_manifest(manifest_path, {**manifest, 'status': 'failed', 'error': str(e)})
+            raise
+        
+        shutil.rmtree(job_dir)
+        
+        mix.export_path = path
+        mix.export_format = export_format
+        db.commit()
+        
+        logger.info(f"Mix {mix_id} rendered")
+        return path
+
+
+def _segment_name(index: int) -> str:
+    return f"segment_{index:05d}.flac"
+
+
+def _write_manifest(manifest_path: str, manifest: Dict):
+    """Atomically replace a render job manifest"""
+    with open(f"{manifest_path}.tmp", 'w') as f:
+        json.dump(manifest, f)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+
+
+def _render_segment(plan: List[Dict], segment: Dict, segment_path: str):
+    """
+    Render one segment to a lossless intermediate file (process pool worker)
+    
+    Segments after the first start JOIN_FRAMES early for the join crossfade,
+    plus PREROLL_FRAMES that are rendered and discarded so the decoder and
+    time-stretch have settled by the time audio is kept.
+    """
+    start = segment['start']
+    skip = 0
+    if segment['index'] > 0:
+        start -= JOIN_FRAMES
+        skip = PREROLL_FRAMES
+    
+    with sf.SoundFile(
+        f"{segment_path}.part", 'w',
+        samplerate=SAMPLE_RATE,
+        channels=CHANNELS,
+        format=SEGMENT_FORMAT,
+        subtype=SEGMENT_SUBTYPE
+    ) as output:
+        for block in MixRendererService.iter_blocks(plan, start - skip, segment['end']):
+            if skip:
+                dropped = min(skip, len(block))
+                block = block[dropped:]
+                skip -= dropped
+            if len(block):
+                output.write(np.clip(block, -1.0, 1.0))
+    os.replace(f"{segment_path}.part", segment_path)
+
+
+def main():
+    """
+    Command line entry point: python -m app.services.mix_renderer mix_id
+    
+    Renders in this process's own pool, one process per core by default;
+    renders started by the API are limited to RENDER_WORKERS.
+    """
+    parser = argparse.ArgumentParser(description="Render a saved mix to an audio file")
+    parser.add_argument('mix_id', type=int, help="Mix to render")
+    parser.add_argument(
+        '--format', choices=list(EXPORT_FORMATS), default='wav',
+        help="Export format (default: wav)"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=os.cpu_count() or 1,
+        help="Render processes (default: one per core)"
+    )
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db = SessionLocal()
+    try:
+        path = MixRendererService.render_mix(db, args.mix_id, args.format, workers=args.workers)
+    finally:
+        db.close()
+    print(path)
+
+
+if __name__ == '__main__':
+    main()
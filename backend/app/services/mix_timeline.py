@@ -0,0 +1,213 @@
+"""
+Mix timeline service for DJ Mixing Platform
+Builds BPM, key and energy curves for a whole mix from cached per-track
+energy envelopes, without decoding any audio
+"""
+
+from typing import Dict, List, Optional
+import numpy as np
+from app.models.models import Track
+
+# Per-track energy envelopes are stored at this resolution (seconds per value)
+ENERGY_ENVELOPE_RESOLUTION = 1.0
+
+
+class MixTimelineService:
+    """Service for summarizing mixes over time"""
+    
+    @staticmethod
+    def encode_energy_envelope(rms: np.ndarray, frame_times: np.ndarray) -> bytes:
+        """
+        Average frame RMS into ENERGY_ENVELOPE_RESOLUTION bins, stored as float16
+        
+        Values keep their absolute scale so envelopes of different tracks
+        can be compared and summed
+        """
+        bins = (frame_times / ENERGY_ENVELOPE_RESOLUTION).astype(np.int64)
+        counts = np.bincount(bins)
+        sums = np.bincount(bins, weights=rms)
+        envelope = np.divide(sums, counts, out=np.zeros(len(counts)), where=counts > 0)
+        return envelope.astype('<f2').tobytes()
+    
+    @staticmethod
+    def decode_energy_envelope(blob: Optional[bytes]) -> Optional[np.ndarray]:
+        """Decode a stored energy envelope (None if missing)"""
+        if not blob:
+            return None
+        return np.frombuffer(blob, dtype='<f2').astype(np.float64)
+    
+    @staticmethod
+    def build_timeline(
+        tracklist: List[Dict],
+        transitions: Optional[List[Dict]],
+        tracks: Dict[int, Track],
+        resolution: float = 1.0
+    ) -> Dict:
+        """
+        Stitch per-track envelopes into whole-mix curves
+        
+        Tracks are placed by layout() and crossfaded linearly.
+        
+        Args:
+            tracklist: Mix tracklist entries with 'track_id' and 'start_time'
+            transitions: Mix transitions with the overlap length
+            tracks: Tracks (with analysis loaded) by id
+            resolution: Seconds per timeline point
+        
+        Returns:
+            Dict with the timeline duration, energy and BPM curves, key
+            segments and the audible span of each track
+        """
+        layout = MixTimelineService.layout(tracklist, transitions, tracks)
+        entries = layout['entries']
+        if not entries:
+            return {'duration': 0.0, 'energy': [], 'bpm': [], 'keys': [], 'tracks': []}
+        
+        starts, ends = layout['starts'], layout['ends']
+        fade_in, fade_out = layout['fade_in'], layout['fade_out']
+        
+        total = float(ends.max())
+        times = np.arange(int(np.ceil(total / resolution)) + 1) * resolution
+        energy = np.zeros(len(times))
+        bpm_weighted = np.zeros(len(times))
+        weight = np.zeros(len(times))
+        keys = []
+        spans = []
+        
+        for i, entry in enumerate(entries):
+            track = tracks[entry['track_id']]
+            analysis = track.analysis
+            
+            lo, hi = np.searchsorted(times, [starts[i], ends[i]])
+            local = times[lo:hi] - starts[i]
+            
+            # Linear crossfade gains
+            gain = np.ones(hi - lo)
+            if fade_in[i] > 0:
+                gain = np.minimum(gain, local / fade_in[i])
+            if fade_out[i] > 0:
+                gain = np.minimum(gain, (ends[i] - times[lo:hi]) / fade_out[i])
+            gain = np.clip(gain, 0.0, 1.0)
+            
+            envelope = MixTimelineService.decode_energy_envelope(
+                analysis.energy_envelope if analysis else None
+            )
+            if envelope is not None and len(envelope):
+                env_times = (np.arange(len(envelope)) + 0.5) * ENERGY_ENVELOPE_RESOLUTION
+                track_energy = np.interp(local, env_times, envelope)
+            else:
+                level = (analysis.energy_level if analysis else None) or track.energy or 0.0
+                track_energy = np.full(hi - lo, level)
+            energy[lo:hi] += gain * track_energy
+            
+            track_bpm = (analysis.bpm if analysis else None) or track.bpm
+            if track_bpm:
+                bpm_weighted[lo:hi] += gain * track_bpm
+                weight[lo:hi] += gain
+            
+            # The key switches halfway through each crossfade
+            key_start = float(starts[i] + fade_in[i] / 2)
+            key_end = float(ends[i] - fade_out[i] / 2)
+            key = (analysis.camelot_key if analysis else None) or track.key
+            keys.append({'track_id': track.id, 'key': key, 'start': key_start, 'end': key_end})
+            
+            spans.append({
+                'track_id': track.id,
+                'title': track.title,
+                'artist': track.artist,
+                'start': float(starts[i]),
+                'end': float(ends[i]),
+                'bpm': track_bpm,
+                'key': key
+            })
+        
+        bpm = np.divide(bpm_weighted, weight, out=np.zeros(len(times)), where=weight > 0)
+        
+        return {
+            'duration': total,
+            'energy': energy.round(5).tolist(),
+            'bpm': bpm.round(2).tolist(),
+            'keys': keys,
+            'tracks': spans
+        }
+    
+    @staticmethod
+    def layout(
+        tracklist: List[Dict],
+        transitions: Optional[List[Dict]],
+        tracks: Dict[int, Track],
+        tempo_ratios: Optional[np.ndarray] = None
+    ) -> Dict:
+        """
+        Place mix entries on the timeline
+        
+        Each track plays from its start_time until the next track has fully
+        faded in; during a transition's overlap the outgoing track fades out
+        while the incoming one fades in.
+        
+        Start times and overlaps are planned on the unstretched tracks: the
+        time from one entry's start to the next, and the overlap at its end,
+        are measured in that entry's own audio. Played at a tempo ratio, they
+        shrink or grow with it, so transitions stay on the same beats.
+        
+        Args:
+            tracklist: Mix tracklist entries with 'track_id' and 'start_time'
+            transitions: Mix transitions with the overlap length
+            tracks: Tracks by id (entries for unknown tracks are skipped)
+            tempo_ratios: Playback speed per kept entry (default: all 1.0)
+        
+        Returns:
+            Dict with the kept 'entries', their 'transitions' (one per gap,
+            None where missing) and 'starts', 'ends', 'fade_in', 'fade_out'
+            arrays in seconds
+        """
+        entries = [e for e in tracklist if e.get('track_id') in tracks]
+        joins = MixTimelineService._transitions(entries, transitions or [])
+        
+        starts = np.array([float(e.get('start_time') or 0.0) for e in entries])
+        durations = np.array([tracks[e['track_id']].duration for e in entries])
+        overlaps = np.array([
+            float(t.get('overlap_duration', t.get('duration')) or 0.0) if t else 0.0
+            for t in joins
+        ])
+        
+        if tempo_ratios is not None and len(entries):
+            outgoing = tempo_ratios[:-1]
+            durations = durations / tempo_ratios
+            overlaps = overlaps / outgoing
+            starts[1:] = starts[0] + np.cumsum(np.diff(starts) / outgoing)
+        
+        # A track stops once the next one has fully faded in
+        ends = starts + durations
+        ends[:-1] = np.minimum(ends[:-1], starts[1:] + overlaps)
+        
+        return {
+            'entries': entries,
+            'transitions': joins,
+            'starts': starts,
+            'ends': ends,
+            'fade_in': np.concatenate([[0.0], overlaps]),
+            'fade_out': np.concatenate([overlaps, [0.0]])
+        }
+    
+    @staticmethod
+    def _transitions(entries: List[Dict], transitions: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Transition between each pair of consecutive entries
+        
+        Transitions are matched by track ids; both the auto-mixer's format
+        (from_track_id/to_track_id/overlap_duration) and the saved-mix format
+        (from_track/to_track/duration) are accepted.
+        """
+        by_pair = {}
+        for t in transitions:
+            pair = (
+                t.get('from_track_id', t.get('from_track')),
+                t.get('to_track_id', t.get('to_track'))
+            )
+            by_pair[pair] = t
+        
+        return [
+            by_pair.get((a['track_id'], b['track_id']))
+            for a, b in zip(entries[:-1], entries[1:])
+        ]
@@ -0,0 +1,98 @@
+"""
+Audio rendition service for DJ Mixing Platform
+Encodes compact preview renditions of tracks, so decks can load and cue a
+track without downloading the original file
+"""
+
+from typing import Optional
+import logging
+import os
+import subprocess
+import tempfile
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 128 kbps MP3 decodes in every browser's Web Audio API and is roughly a
+# tenth of the size of a lossless original
+PREVIEW_OPTIONS = ['-c:a', 'libmp3lame', '-b:a', '128k']
+PREVIEW_FORMAT = 'mp3'
+PREVIEW_MEDIA_TYPE = 'audio/mpeg'
+
+# Content hashes being encoded by this process
+_pending = set()
+
+
+class RenditionService:
+    """Service for preview renditions, stored by content hash"""
+    
+    @staticmethod
+    def preview_path(content_hash: str) -> str:
+        return os.path.join(settings.RENDITION_DIR, f"{content_hash}.{PREVIEW_FORMAT}")
+    
+    @staticmethod
+    def get_preview(content_hash: str) -> Optional[str]:
+        """Path of the preview rendition, or None if it has not been created yet"""
+        path = RenditionService.preview_path(content_hash)
+        return path if os.path.exists(path) else None
+    
+    @staticmethod
+    def create_preview(file_path: str, content_hash: str) -> Optional[str]:
+        """
+        Encode the preview rendition of an audio file (meant to run as a background task)
+        
+        Args:
+            file_path: Original audio file
+            content_hash: Content hash of the original, naming the rendition
+        
+        Returns:
+            Path of the rendition, or None if encoding failed or is already
+            running in this process
+        """
+        path = RenditionService.preview_path(content_hash)
+        if os.path.exists(path):
+            return path
+        if content_hash in _pending:
+            return None
+        
+        _pending.add(content_hash)
+        temp_path = None
+        try:
+            os.makedirs(settings.RENDITION_DIR, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=settings.RENDITION_DIR, suffix='.part')
+            os.close(fd)
+            subprocess.run(
+                [
+                    'ffmpeg', '-v', 'error', '-nostdin', '-y', '-i', file_path,
+                    # Audio only: drop embedded cover art and tags
+                    '-map', '0:a:0', '-map_metadata', '-1',
+                    *PREVIEW_OPTIONS, '-f', PREVIEW_FORMAT, temp_path
+                ],
+                check=True,
+                capture_output=True
+            )
+            os.replace(temp_path, path)
+            logger.info(f"Created preview rendition of {file_path}")
+            return path
+        except subprocess.CalledProcessError as e:
+            logger.error(
+                f"Creating preview rendition of {file_path} failed: "
+                f"{e.stderr.decode(errors='replace').strip()}"
+            )
+            return None
+        except OSError as e:
+            logger.error(f"Creating preview rendition of {file_path} failed: {e}")
+            return None
+        finally:
+            _pending.discard(content_hash)
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    @staticmethod
+    def delete_preview(content_hash: Optional[str]):
+        """Delete the preview rendition of a file, if any"""
+        if not content_hash:
+            return
+        path = RenditionService.preview_path(content_hash)
+        if os.path.exists(path):
+            os.remove(path)
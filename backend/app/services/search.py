@@ -0,0 +1,109 @@
+"""
+Track search for DJ Mixing Platform
+Ranked, typo-tolerant search over title, artist and album. On PostgreSQL
+candidates come from trigram (pg_trgm) and full-text indexes on
+tracks.search_text; other databases (SQLite in development and tests) are
+scored in process with the same trigram measure.
+"""
+
+from typing import List, Optional
+from sqlalchemy import func, literal, or_, select
+from sqlalchemy.orm import Session
+from app.models.models import Track, TRACK_SEARCH_VECTOR, TRACK_SEARCH_CONFIG
+from app.services.text_match import TextMatchService
+
+# Minimum word similarity of the query to a track's search text
+SEARCH_THRESHOLD = 0.5
+
+MAX_SEARCH_RESULTS = 100
+
+# Local tracks matched to imported ones need this word similarity for both
+# title and artist
+MATCH_THRESHOLD = 0.7
+MATCH_CANDIDATES = 5
+
+
+class SearchService:
+    """Service for searching the track library"""
+    
+    @staticmethod
+    def search(db: Session, query: str, limit: int = 20) -> List[Track]:
+        """
+        Search tracks by title, artist and album
+        
+        Args:
+            db: Database session
+            query: Search text; words may be misspelled or incomplete
+            limit: Maximum number of results
+        
+        Returns:
+            Matching tracks, best match first
+        """
+        text = TextMatchService.normalize(query)
+        if not text:
+            return []
+        if db.get_bind().dialect.name == 'postgresql':
+            return SearchService._search_postgres(db, text, limit)
+        return SearchService._search_in_process(db, text, limit)
+    
+    @staticmethod
+    def _search_postgres(db: Session, text: str, limit: int) -> List[Track]:
+        """Search with the trigram and full-text indexes"""
+        # Threshold of the <% operator, for this transaction only
+        db.execute(select(func.set_config(
+            'pg_trgm.word_similarity_threshold', str(SEARCH_THRESHOLD), True
+        )))
+        
+        # Every word as a prefix, so results show up while typing
+        words = ' & '.join(f"{word}:*" for word in text.split())
+        tsquery = func.to_tsquery(TRACK_SEARCH_CONFIG, words)
+        score = (
+            func.word_similarity(text, Track.search_text)
+            + func.ts_rank(TRACK_SEARCH_VECTOR, tsquery)
+        )
+        query = (
+            select(Track)
+            .where(or_(
+                literal(text).op('<%')(Track.search_text),
+                TRACK_SEARCH_VECTOR.op('@@')(tsquery)
+            ))
+            .order_by(score.desc(), Track.id)
+            .limit(limit)
+        )
+        return db.scalars(query).all()
+    
+    @staticmethod
+    def _search_in_process(db: Session, text: str, limit: int) -> List[Track]:
+        """
+        Score every track in Python (no search indexes outside PostgreSQL);
+        the API runs it in the threadpool, see app.api.tracks
+        """
+        query_trigrams = TextMatchService.trigrams(text)
+        scored = []
+        rows = db.execute(select(Track.id, Track.search_text).where(Track.search_text.isnot(None)))
+        for track_id, search_text in rows:
+            score = TextMatchService.trigram_share(query_trigrams, search_text)
+            if score >= SEARCH_THRESHOLD:
+                scored.append((-score, track_id))
+        track_ids = [track_id for _, track_id in sorted(scored)[:limit]]
+        
+        tracks = {track.id: track for track in db.scalars(select(Track).where(Track.id.in_(track_ids)))}
+        return [tracks[track_id] for track_id in track_ids]
+    
+    @staticmethod
+    def match(db: Session, title: str, artist: str) -> Optional[Track]:
+        """
+        Find the local track for a title and artist from another source (e.g.
+        Spotify), tolerating differences in case, accents and punctuation
+        
+        Returns:
+            The best matching track, or None
+        """
+        title_text = TextMatchService.normalize(title)
+        artist_text = TextMatchService.normalize(artist)
+        for track in SearchService.search(db, f"{title} {artist}", limit=MATCH_CANDIDATES):
+            title_score = TextMatchService.word_similarity(title_text, TextMatchService.normalize(track.title))
+            artist_score = TextMatchService.word_similarity(artist_text, TextMatchService.normalize(track.artist))
+            if title_score >= MATCH_THRESHOLD and artist_score >= MATCH_THRESHOLD:
+                return track
+        return None
@@ -0,0 +1,68 @@
+"""
+Text matching for DJ Mixing Platform
+Normalizes track metadata for search and compares strings by trigrams, the
+way PostgreSQL's pg_trgm does, so results match between databases
+"""
+
+from typing import Optional, Set
+import re
+import unicodedata
+
+_NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+
+
+class TextMatchService:
+    """Service for search text normalization and trigram similarity"""
+    
+    @staticmethod
+    def normalize(*parts: Optional[str]) -> str:
+        """
+        Searchable form of some text: lowercase, accents removed and
+        punctuation collapsed to single spaces ("Beyoncé - Halo!" -> "beyonce halo")
+        
+        Args:
+            parts: Strings to join, e.g. title, artist and album; None is skipped
+        """
+        text = ' '.join(part for part in parts if part)
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+        return _NON_ALPHANUMERIC.sub(' ', text.lower()).strip()
+    
+    @staticmethod
+    def trigrams(text: str) -> Set[str]:
+        """Trigrams of normalized text, each word padded as in pg_trgm"""
+        result = set()
+        for word in text.split():
+            padded = f"  {word} "
+            result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return result
+    
+    @staticmethod
+    def pad(text: str) -> str:
+        """
+        Normalized text with every word padded as for trigrams; a trigram of
+        a query occurs in it exactly when it is one of the text's trigrams
+        """
+        return ''.join(f"  {word} " for word in text.split())
+    
+    @staticmethod
+    def trigram_share(query_trigrams: Set[str], text: str) -> float:
+        """Share of a query's trigrams (see trigrams) found in normalized text"""
+        if not query_trigrams:
+            return 0.0
+        padded = TextMatchService.pad(text)
+        return sum(trigram in padded for trigram in query_trigrams) / len(query_trigrams)
+    
+    @staticmethod
+    def word_similarity(query: str, text: str) -> float:
+        """
+        Share of the query's trigrams found in the text, between 0 and 1
+        
+        Close to pg_trgm's word_similarity: a query that is a (misspelled)
+        part of the text still scores high.
+        
+        Args:
+            query: Normalized query
+            text: Normalized text to search in
+        """
+        return TextMatchService.trigram_share(TextMatchService.trigrams(query), text)
@@ -0,0 +1,171 @@
+"""
+Transition preview service for DJ Mixing Platform
+Renders the short window around a single transition as a compressed clip and
+keeps clips in a size-bounded on-disk cache
+"""
+
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from app.core.config import settings
+from app.models.models import Track
+from app.services.file_storage import FileStorageService
+from app.services.mix_renderer import MixRendererService, SAMPLE_RATE, STREAM_FORMATS
+
+logger = logging.getLogger(__name__)
+
+# Seconds of audio rendered before and after the overlap
+PREVIEW_PADDING = 15.0
+
+PREVIEW_FORMAT = 'mp3'
+PREVIEW_MEDIA_TYPE = STREAM_FORMATS[PREVIEW_FORMAT][2]
+
+# Bump when the rendering changes, so cached clips are not reused
+PREVIEW_VERSION = 1
+
+
+class TransitionPreviewService:
+    """Service for rendering and caching transition previews"""
+    
+    @staticmethod
+    def window(plan: List[Dict], index: int, padding: float = PREVIEW_PADDING) -> Tuple[int, int]:
+        """
+        Frame range of the preview of a transition
+        
+        Args:
+            plan: Render entries from MixRendererService.plan()
+            index: Transition index (between entries index and index + 1)
+            padding: Seconds to include before and after the overlap
+        
+        Returns:
+            (start, end) frames on the mix timeline
+        """
+        if not 0 <= index < len(plan) - 1:
+            raise ValueError("Transition not found")
+        
+        incoming = plan[index + 1]
+        pad = int(round(padding * SAMPLE_RATE))
+        start = max(incoming['start'] - pad, 0)
+        end = min(incoming['start'] + incoming['fade_in'] + pad, MixRendererService.total_frames(plan))
+        return start, end
+    
+    @staticmethod
+    def cache_key(plan: List[Dict], tracks: Dict[int, Track], start: int, end: int) -> str:
+        """
+        Cache key of a preview
+        
+        Covers the content of every track audible in the window and how it is
+        played there (positions relative to the window, tempo, gain, fades),
+        so the key does not change when unrelated parts of the mix do.
+        """
+        entries = []
+        for entry in plan:
+            if entry['end'] <= start or entry['start'] >= end:
+                continue
+            entries.append({
+                'hash': FileStorageService.content_hash(tracks[entry['track_id']]),
+                'tempo_ratio': round(entry['tempo_ratio'], 6),
+                'gain': round(entry['gain'], 6),
+                'start': entry['start'] - start,
+                'end': entry['end'] - start,
+                'fade_in': entry['fade_in'],
+                'fade_out': entry['fade_out'],
+                'curve_in': entry['curve_in'],
+                'curve_out': entry['curve_out']
+            })
+        
+        key = {
+            'version': PREVIEW_VERSION,
+            'encoder': STREAM_FORMATS[PREVIEW_FORMAT][0],
+            'frames': end - start,
+            'entries': entries
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+    
+    @staticmethod
+    def get_preview(
+        tracklist: List[Dict],
+        transitions: Optional[List[Dict]],
+        tracks: Dict[int, Track],
+        index: int,
+        padding: float = PREVIEW_PADDING
+    ) -> Tuple[str, str]:
+        """
+        Get the preview clip of a transition, rendering it on a cache miss
+        
+        Args:
+            tracklist: Mix tracklist entries
+            transitions: Mix transitions
+            tracks: Tracks (with analysis loaded) by id
+            index: Transition index in the mix
+            padding: Seconds to include before and after the overlap
+        
+        Returns:
+            (clip path, cache key)
+        """
+        plan = MixRendererService.plan(tracklist, transitions, tracks)
+        start, end = TransitionPreviewService.window(plan, index, padding)
+        key = TransitionPreviewService.cache_key(plan, tracks, start, end)
+        path = TransitionPreviewService.cache_path(key)
+        
+        if os.path.exists(path):
+            # Mark as recently used for LRU eviction
+            os.utime(path)
+            return path, key
+        
+        # A temp file of its own: concurrent requests may render the same clip
+        os.makedirs(settings.PREVIEW_CACHE_DIR, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=settings.PREVIEW_CACHE_DIR, suffix='.part')
+        os.close(fd)
+        try:
+            TransitionPreviewService.render_clip(plan, start, end, temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        
+        TransitionPreviewService.evict()
+        return path, key
+    
+    @staticmethod
+    def cache_path(key: str) -> str:
+        return os.path.join(settings.PREVIEW_CACHE_DIR, f"{key}.{PREVIEW_FORMAT}")
+    
+    @staticmethod
+    def render_clip(plan: List[Dict], start: int, end: int, file_path: str):
+        """
+        Render a frame range of a mix and encode it as a preview clip
+        
+        Stretched tracks are seeked rather than decoded from the top
+        (exact=False), which keeps first previews fast.
+        """
+        blocks = MixRendererService.iter_blocks(plan, start, end, exact=False)
+        with open(file_path, 'wb') as f:
+            for chunk in MixRendererService.encode_blocks(blocks, PREVIEW_FORMAT):
+                f.write(chunk)
+    
+    @staticmethod
+    def evict(max_bytes: Optional[int] = None):
+        """Delete least recently used clips until the cache fits in max_bytes"""
+        if max_bytes is None:
+            max_bytes = settings.PREVIEW_CACHE_MAX_BYTES
+        
+        clips = []
+        with os.scandir(settings.PREVIEW_CACHE_DIR) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(f".{PREVIEW_FORMAT}"):
+                    stat = entry.stat()
+                    clips.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in clips)
+        for _, size, path in sorted(clips):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
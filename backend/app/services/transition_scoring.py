@@ -0,0 +1,155 @@
+"""
+Transition scoring service for DJ Mixing Platform
+Scores how well track B's intro rhythmically fits over track A's outro by
+cross-correlating beat-synchronous onset envelopes stored at analysis time
+"""
+
+from typing import List, Optional, Tuple
+import numpy as np
+from app.services.beat_grid import BeatGrid, BEATS_PER_BAR, BEATS_PER_PHRASE
+
+# Envelopes cover one phrase at 16th-note resolution
+ENVELOPE_BEATS = BEATS_PER_PHRASE
+SAMPLES_PER_BEAT = 4
+ENVELOPE_LENGTH = ENVELOPE_BEATS * SAMPLES_PER_BEAT
+
+# Beat offsets searched when aligning B's intro against A's outro (+/- one bar)
+MAX_OFFSET_BEATS = BEATS_PER_BAR
+
+
+class TransitionScoringService:
+    """Service for scoring transitions from stored onset envelopes"""
+    
+    @staticmethod
+    def extract_envelope(
+        onset_env: np.ndarray,
+        onset_times: np.ndarray,
+        grid: BeatGrid,
+        start_beat: int
+    ) -> np.ndarray:
+        """
+        Sample an onset envelope on the beat grid for one phrase
+        
+        Args:
+            onset_env: Onset strength per analysis frame
+            onset_times: Frame times in seconds
+            grid: Beat grid of the track
+            start_beat: First beat of the region
+        
+        Returns:
+            ENVELOPE_LENGTH samples, SAMPLES_PER_BEAT per beat
+        """
+        positions = start_beat + np.arange(ENVELOPE_LENGTH) / SAMPLES_PER_BEAT
+        # Interpolate beat times between grid beats for the subdivisions
+        beat_index = np.floor(positions).astype(np.int64)
+        frac = positions - beat_index
+        t0 = grid.time_at(beat_index)
+        t1 = grid.time_at(beat_index + 1)
+        times = t0 + frac * (t1 - t0)
+        return np.interp(times, onset_times, onset_env, left=0.0, right=0.0)
+    
+    @staticmethod
+    def encode_envelope(envelope: np.ndarray) -> bytes:
+        """Quantize an envelope to uint8 (scaled to its own peak)"""
+        peak = float(np.max(envelope)) if len(envelope) else 0.0
+        if peak <= 0:
+            return np.zeros(len(envelope), dtype=np.uint8).tobytes()
+        return np.round(envelope / peak * 255).astype(np.uint8).tobytes()
+    
+    @staticmethod
+    def decode_envelopes(blobs: List[Optional[bytes]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Stack stored envelopes into a matrix
+        
+        Returns:
+            (float32 matrix of shape (len(blobs), ENVELOPE_LENGTH),
+             boolean mask of rows that had a valid envelope)
+        """
+        matrix = np.zeros((len(blobs), ENVELOPE_LENGTH), dtype=np.float32)
+        valid = np.zeros(len(blobs), dtype=bool)
+        for i, blob in enumerate(blobs):
+            if blob and len(blob) == ENVELOPE_LENGTH:
+                matrix[i] = np.frombuffer(blob, dtype=np.uint8)
+                valid[i] = True
+        return matrix, valid
+    
+    @staticmethod
+    def score(outro: np.ndarray, intros: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score one outro envelope against many intro envelopes
+        
+        Computes the normalized cross-correlation at every whole-beat offset
+        within +/- MAX_OFFSET_BEATS for all candidates at once via FFT.
+        
+        Args:
+            outro: Envelope of the outgoing track's outro, shape (ENVELOPE_LENGTH,)
+            intros: Envelopes of candidate intros, shape (N, ENVELOPE_LENGTH)
+        
+        Returns:
+            (rhythmic fit in [0, 1] per candidate,
+             best offset in beats per candidate - positive delays B)
+        """
+        n = intros.shape[0]
+        if n == 0:
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+        
+        a = outro.astype(np.float64) - outro.mean()
+        b = intros.astype(np.float64) - intros.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(a) * np.linalg.norm(b, axis=1)
+        
+        size = 2 * ENVELOPE_LENGTH
+        spectrum = np.fft.rfft(a, size)[None, :] * np.conj(np.fft.rfft(b, size, axis=1))
+        correlation = np.fft.irfft(spectrum, size, axis=1)
+        
+        # correlation[:, lag] aligns b[k] with a[k + lag]; negative lags wrap around
+        offsets = np.arange(-MAX_OFFSET_BEATS, MAX_OFFSET_BEATS + 1)
+        lags = (offsets * SAMPLES_PER_BEAT) % size
+        candidates = correlation[:, lags]
+        
+        best = np.argmax(candidates, axis=1)
+        peak = candidates[np.arange(n), best]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fit = np.where(norms > 0, peak / norms, 0.0)
+        return np.clip(fit, 0.0, 1.0), offsets[best]
+    
+    @staticmethod
+    def score_pair(outro_blob: Optional[bytes], intro_blob: Optional[bytes]) -> Optional[Tuple[float, int]]:
+        """Rhythmic fit and best beat offset for a single pair (None if either envelope is missing)"""
+        envelopes, valid = TransitionScoringService.decode_envelopes([outro_blob, intro_blob])
+        if not valid.all():
+            return None
+        fit, offset = TransitionScoringService.score(envelopes[0], envelopes[1:])
+        return float(fit[0]), int(offset[0])
+
+
+class EnvelopeBank:
+    """Intro envelopes of a candidate pool, decoded once for repeated scoring"""
+    
+    def __init__(self, track_ids: List[int], intro_blobs: List[Optional[bytes]]):
+        self.rows = {track_id: i for i, track_id in enumerate(track_ids)}
+        self.intros, self.valid = TransitionScoringService.decode_envelopes(intro_blobs)
+    
+    def score(
+        self,
+        outro_blob: Optional[bytes],
+        track_ids: List[int]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score an outro against the intros of the given candidates
+        
+        Returns:
+            (rhythmic fit, best beat offset, mask of candidates that could be scored)
+        """
+        rows = np.array([self.rows.get(track_id, -1) for track_id in track_ids], dtype=np.int64)
+        known = rows >= 0
+        valid = np.zeros(len(rows), dtype=bool)
+        valid[known] = self.valid[rows[known]]
+        fit = np.zeros(len(rows))
+        offset = np.zeros(len(rows), dtype=np.int64)
+        
+        outro, outro_valid = TransitionScoringService.decode_envelopes([outro_blob])
+        if not outro_valid[0] or not valid.any():
+            return fit, offset, valid & outro_valid[0]
+        
+        fit[valid], offset[valid] = TransitionScoringService.score(outro[0], self.intros[rows[valid]])
+        return fit, offset, valid
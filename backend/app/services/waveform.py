@@ -0,0 +1,41 @@
+"""
+Waveform encoding for DJ Mixing Platform
+Packs normalized (0-1) overview waveforms into compact binary arrays
+"""
+
+from typing import List, Sequence
+import numpy as np
+
+# Binary waveform format -> numpy dtype
+WAVEFORM_FORMATS = {
+    'uint8': np.uint8,     # 0-255, one byte per point
+    'float16': np.dtype('<f2')
+}
+
+
+class WaveformService:
+    """Service for binary waveform encoding"""
+    
+    @staticmethod
+    def encode(values: Sequence[float], waveform_format: str = 'uint8') -> bytes:
+        """
+        Encode waveform values in [0, 1]
+        
+        Args:
+            values: Normalized waveform points
+            waveform_format: Key of WAVEFORM_FORMATS
+        
+        Returns:
+            Little-endian array bytes, one value per point
+        """
+        waveform = np.clip(np.asarray(values, dtype=np.float64), 0.0, 1.0)
+        if waveform_format == 'uint8':
+            return np.round(waveform * 255).astype(np.uint8).tobytes()
+        return waveform.astype(WAVEFORM_FORMATS[waveform_format]).tobytes()
+    
+    @staticmethod
+    def decode(blob: bytes, waveform_format: str = 'uint8') -> List[float]:
+        """Decode an encoded waveform back to floats in [0, 1]"""
+        if waveform_format == 'uint8':
+            return (np.frombuffer(blob, dtype=np.uint8) / 255.0).tolist()
+        return np.frombuffer(blob, dtype=WAVEFORM_FORMATS[waveform_format]).astype(np.float64).tolist()
@@ -0,0 +1,18 @@
+"""
+Shared test setup
+
+The tests need neither PostgreSQL nor Redis: settings point the database at
+an in-memory SQLite before any app module creates its engines, and async
+tests run on asyncio through the anyio pytest plugin.
+"""
+
+import os
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
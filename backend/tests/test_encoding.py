@@ -0,0 +1,71 @@
+"""Response encodings chosen by the Accept header (app.core.encoding)"""
+
+from starlette.requests import Request
+import msgpack
+import orjson
+import pytest
+import struct
+from app.core.encoding import (
+    FLOAT32_ARRAY_EXT, JSON_MEDIA_TYPE, MIN_PACKED_LENGTH, MSGPACK_MEDIA_TYPE, encode, negotiate
+)
+
+
+def _request(accept=None) -> Request:
+    headers = [] if accept is None else [(b'accept', accept.encode())]
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': headers})
+
+
+@pytest.mark.parametrize('accept, expected', [
+    (None, JSON_MEDIA_TYPE),
+    ('', JSON_MEDIA_TYPE),
+    ('*/*', JSON_MEDIA_TYPE),
+    ('text/html', JSON_MEDIA_TYPE),
+    ('application/json', JSON_MEDIA_TYPE),
+    ('application/msgpack', MSGPACK_MEDIA_TYPE),
+    ('application/x-msgpack', MSGPACK_MEDIA_TYPE),
+    ('Application/Vnd.Msgpack', MSGPACK_MEDIA_TYPE),
+    ('application/json, application/msgpack', JSON_MEDIA_TYPE),  # ties go to the first
+    ('application/msgpack, application/json', MSGPACK_MEDIA_TYPE),
+    ('application/json;q=0.5, application/msgpack', MSGPACK_MEDIA_TYPE),
+    ('application/msgpack;q=0.5, application/json;q=0.9', JSON_MEDIA_TYPE),
+    ('application/msgpack; q=0', JSON_MEDIA_TYPE),
+    ('application/msgpack;q=high', JSON_MEDIA_TYPE),  # invalid quality counts as 0
+])
+def test_negotiate(accept, expected):
+    assert negotiate(_request(accept)) == expected
+
+
+def _unpack(data: bytes):
+    def ext_hook(code, payload):
+        assert code == FLOAT32_ARRAY_EXT
+        return list(struct.unpack(f'<{len(payload) // 4}f', payload))
+    return msgpack.unpackb(data, ext_hook=ext_hook)
+
+
+def test_msgpack_packs_float_lists():
+    waveform = [0.25 * (i % 5) for i in range(MIN_PACKED_LENGTH)]
+    data = encode({'waveform': waveform}, MSGPACK_MEDIA_TYPE)
+    packed = msgpack.unpackb(data)['waveform']
+    assert isinstance(packed, msgpack.ExtType) and packed.code == FLOAT32_ARRAY_EXT
+    assert _unpack(data) == {'waveform': waveform}
+
+
+@pytest.mark.parametrize('value', [
+    [0.5] * (MIN_PACKED_LENGTH - 1),  # too short
+    list(range(MIN_PACKED_LENGTH)),  # integers only
+    ['a'] * MIN_PACKED_LENGTH,
+    [0.5, None] * MIN_PACKED_LENGTH,
+])
+def test_msgpack_keeps_other_lists(value):
+    assert msgpack.unpackb(encode({'value': value}, MSGPACK_MEDIA_TYPE)) == {'value': value}
+
+
+def test_msgpack_packs_nested_lists():
+    curve = [0.5] * MIN_PACKED_LENGTH
+    content = {'transitions': [{'curve': curve, 'bars': 8}]}
+    assert _unpack(encode(content, MSGPACK_MEDIA_TYPE)) == content
+
+
+def test_json_matches_msgpack_structure():
+    content = {'bpm': 128.0, 'beats': [0.5 * i for i in range(MIN_PACKED_LENGTH)], 'key': '8A'}
+    assert orjson.loads(encode(content)) == content == _unpack(encode(content, MSGPACK_MEDIA_TYPE))
@@ -0,0 +1,73 @@
+"""Acoustic fingerprints (app.services.fingerprint), without a database"""
+
+import numpy as np
+import pytest
+from app.services.fingerprint import (
+    DUPLICATE_BER, FINGERPRINT_POOL, INDEX_SAMPLING, MAX_OFFSET, FingerprintService
+)
+
+SR = 22050
+BINS = 1025  # n_fft 2048
+
+
+def _spectrogram(seed: int, frames: int = 400) -> np.ndarray:
+    return np.random.default_rng(seed).random((BINS, frames))
+
+
+def _fingerprint(values) -> bytes:
+    return np.asarray(values, dtype='<u4').tobytes()
+
+
+def test_compute_length():
+    fingerprint = FingerprintService.compute(_spectrogram(0), SR)
+    # One value per pooled frame, less one for the difference between frames
+    assert len(FingerprintService.decode(fingerprint)) == 400 // FINGERPRINT_POOL - 1
+
+
+def test_same_audio_matches_exactly():
+    a = FingerprintService.compute(_spectrogram(0), SR)
+    assert FingerprintService.compute(_spectrogram(0), SR) == a
+    assert FingerprintService.compare(a, a) == 0.0
+
+
+def test_slightly_changed_audio_matches():
+    S = _spectrogram(0)
+    noisy = S * (1 + 0.05 * np.random.default_rng(1).standard_normal(S.shape))
+    ber = FingerprintService.compare(
+        FingerprintService.compute(S, SR), FingerprintService.compute(np.abs(noisy), SR)
+    )
+    assert ber is not None and ber < DUPLICATE_BER
+
+
+def test_unrelated_audio_does_not_match():
+    a = FingerprintService.compute(_spectrogram(0), SR)
+    b = FingerprintService.compute(_spectrogram(1), SR)
+    assert 0.4 < FingerprintService.bit_error_rate(a, b) < 0.6
+    assert FingerprintService.compare(a, b) is None
+
+
+@pytest.mark.parametrize('offset', [-MAX_OFFSET, -1, 1, MAX_OFFSET])
+def test_bit_error_rate_aligns_shifted_fingerprints(offset):
+    values = np.random.default_rng(2).integers(0, 2 ** 32, 100, dtype=np.uint32)
+    shifted = values[offset:] if offset > 0 else np.concatenate([values[:-offset], values])
+    assert FingerprintService.bit_error_rate(_fingerprint(values), _fingerprint(shifted)) == 0.0
+
+
+def test_bit_error_rate_of_empty_fingerprint():
+    assert FingerprintService.bit_error_rate(b'', _fingerprint([1, 2, 3])) == 1.0
+
+
+@pytest.mark.parametrize('a, b', [
+    (b'', b''),
+    (_fingerprint([1] * 100), b''),
+    (_fingerprint([1] * 100), _fingerprint([1] * 90)),  # lengths too different
+])
+def test_compare_rejects_incomparable_fingerprints(a, b):
+    assert FingerprintService.compare(a, b) is None
+
+
+def test_index_keys():
+    values = [0, 0xFFFFFFFF, INDEX_SAMPLING, INDEX_SAMPLING, INDEX_SAMPLING + 1, 0xFFFFFFF0]
+    keys = FingerprintService.index_keys(_fingerprint(values))
+    # Sampled, unique, without silence, as signed 32-bit integers
+    assert sorted(keys) == [-16, INDEX_SAMPLING]
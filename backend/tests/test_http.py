@@ -0,0 +1,100 @@
+"""Conditional and byte-range responses (app.core.http)"""
+
+from starlette.requests import Request
+import pytest
+from app.core.http import etag_matches, file_response, parse_range
+
+SIZE = 10
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-3', (0, 4)),
+    ('bytes=2-', (2, SIZE)),
+    ('bytes=4-4', (4, 5)),
+    ('bytes=0-99', (0, SIZE)),  # end clamped to the size
+    ('bytes=-3', (7, SIZE)),
+    ('bytes=-99', (0, SIZE)),  # suffix longer than the file
+    ('Bytes = 1-2', (1, 3)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize('header', [
+    'bytes=-0',  # the last 0 bytes
+    f'bytes={SIZE}-',
+    f'bytes={SIZE}-{SIZE + 5}',
+    f'bytes={SIZE + 5}-',
+])
+def test_parse_range_unsatisfiable(header):
+    start, end = parse_range(header, SIZE)
+    assert start >= SIZE
+
+
+@pytest.mark.parametrize('header', [
+    'bytes=5-2',  # last before first
+    'bytes=0-1,4-5',  # multiple ranges
+    'items=0-1',
+    'bytes=1',
+    'bytes=a-b',
+    'bytes=-',
+    'bytes=',
+])
+def test_parse_range_ignored(header):
+    assert parse_range(header, SIZE) is None
+
+
+@pytest.mark.parametrize('if_none_match, expected', [
+    (None, False),
+    ('', False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", "abc"', True),
+    ('"xyz"', False),
+    ('*', True),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, '"abc"') is expected
+
+
+def _request(**headers) -> Request:
+    return Request({
+        'type': 'http',
+        'method': 'GET',
+        'path': '/',
+        'headers': [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()]
+    })
+
+
+@pytest.fixture
+def audio_file(tmp_path):
+    path = tmp_path / 'track.mp3'
+    path.write_bytes(bytes(range(SIZE)))
+    return str(path)
+
+
+@pytest.mark.parametrize('headers, status', [
+    ({}, 200),
+    ({'if_none_match': '"abc"'}, 304),
+    ({'range': 'bytes=2-5'}, 206),
+    ({'range': 'bytes=-0'}, 416),
+    ({'range': f'bytes={SIZE}-'}, 416),
+    ({'range': 'bytes=5-2'}, 200),  # invalid ranges are ignored
+    ({'range': 'bytes=2-5', 'if_range': '"abc"'}, 206),
+    ({'range': 'bytes=2-5', 'if_range': '"old"'}, 200),
+])
+def test_file_response_status(audio_file, headers, status):
+    response = file_response(_request(**headers), audio_file, 'audio/mpeg', '"abc"')
+    assert response.status_code == status
+    assert response.headers['etag'] == '"abc"'
+
+
+def test_file_response_range_headers(audio_file):
+    response = file_response(_request(range='bytes=2-5'), audio_file, 'audio/mpeg', '"abc"')
+    assert response.headers['content-range'] == f'bytes 2-5/{SIZE}'
+    assert response.headers['content-length'] == '4'
+
+
+def test_file_response_unsatisfiable_range_headers(audio_file):
+    response = file_response(_request(range='bytes=-0'), audio_file, 'audio/mpeg', '"abc"')
+    assert response.headers['content-range'] == f'bytes */{SIZE}'
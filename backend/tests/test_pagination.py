@@ -0,0 +1,167 @@
+"""Keyset pagination (app.core.pagination) over a nullable sort column"""
+
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Float, Integer, String, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+import base64
+import json
+import pytest
+from app.core.pagination import MAX_INTEGER, decode_cursor, encode_cursor, keyset_page
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'items'
+    
+    id = Column(Integer, primary_key=True)
+    rank = Column(Float, nullable=True)
+    name = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+
+
+# id: rank, with ties and NULLs on both sides of ids with values
+RANKS = {1: 3.0, 2: 1.0, 3: None, 4: 2.0, 5: None, 6: 1.0, 7: None}
+
+# Non-NULL values in order with ties broken by id, then NULLs by id, in
+# either direction
+ASCENDING = [2, 6, 4, 1, 3, 5, 7]
+DESCENDING = [1, 4, 6, 2, 7, 5, 3]
+
+
+@pytest.fixture
+async def db():
+    engine = create_async_engine('sqlite+aiosqlite://')
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine)() as session:
+        session.add_all(Item(id=item_id, rank=rank) for item_id, rank in RANKS.items())
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+async def _all_pages(db, descending, limit, query=None):
+    """Ids of every page, following the cursors to the end"""
+    query = select(Item) if query is None else query
+    pages = []
+    cursor = None
+    while True:
+        rows, cursor = await keyset_page(
+            db, query, 'rank', Item.rank, Item.id,
+            descending=descending, limit=limit, cursor=cursor
+        )
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+        assert len(pages) <= len(RANKS), "pagination does not end"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('descending, expected', [(False, ASCENDING), (True, DESCENDING)])
+@pytest.mark.parametrize('limit', range(1, len(RANKS) + 2))
+async def test_pages_cross_the_null_boundary(db, descending, expected, limit):
+    pages = await _all_pages(db, descending, limit)
+    assert [item_id for page in pages for item_id in page] == expected
+    # Every page but the last is full and the last is not empty
+    assert all(len(page) == limit for page in pages[:-1])
+    assert pages[-1]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('descending, expected', [(False, ASCENDING), (True, DESCENDING)])
+async def test_page_ending_on_the_last_non_null_row(db, descending, expected):
+    # Four rows have a rank: the first page ends exactly at the boundary and
+    # its cursor (with a value) must lead to the NULL rows
+    rows, cursor = await keyset_page(
+        db, select(Item), 'rank', Item.rank, Item.id, descending=descending, limit=4
+    )
+    assert [row.id for row in rows] == expected[:4]
+    value, _ = decode_cursor(cursor, 'rank', Item.rank)
+    assert value is not None
+    
+    rows, cursor = await keyset_page(
+        db, select(Item), 'rank', Item.rank, Item.id, descending=descending, limit=4, cursor=cursor
+    )
+    assert [row.id for row in rows] == expected[4:]
+    assert cursor is None
+
+
+@pytest.mark.anyio
+async def test_filtered_query(db):
+    query = select(Item).where(Item.id % 2 == 1)
+    pages = await _all_pages(db, False, 2, query)
+    assert pages == [[1, 3], [5, 7]]
+
+
+@pytest.mark.anyio
+async def test_empty_result(db):
+    rows, cursor = await keyset_page(
+        db, select(Item).where(Item.id > 100), 'rank', Item.rank, Item.id,
+        descending=False, limit=10
+    )
+    assert rows == [] and cursor is None
+
+
+def _raw_cursor(data) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    _raw_cursor('rank'),
+    _raw_cursor(['rank', 1.0]),
+    _raw_cursor(['rank', 1.0, 2, 3]),
+    _raw_cursor(['rank', 'high', 2]),  # a string for a float column
+    _raw_cursor(['rank', True, 2]),
+    _raw_cursor(['rank', 1.0, '2']),
+    _raw_cursor(['rank', 1.0, True]),
+    _raw_cursor(['rank', 1.0, MAX_INTEGER + 1]),
+    _raw_cursor(['rank', 1.0, None]),
+])
+def test_rejects_malformed_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'rank', Item.rank)
+
+
+def test_rejects_cursor_of_another_sort():
+    with pytest.raises(ValueError, match="sort order"):
+        decode_cursor(encode_cursor('name', 'a', 1), 'rank', Item.rank)
+
+
+@pytest.mark.parametrize('column, value', [
+    (Item.name, 'with \x00 inside'),
+    (Item.name, 5),
+    (Item.created_at, 'yesterday'),
+    (Item.id, 2 ** 40),
+    (Item.id, 1.5),
+])
+def test_rejects_values_that_do_not_fit_the_column(column, value):
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor('sort', value, 1), 'sort', column)
+
+
+@pytest.mark.parametrize('column, value', [
+    (Item.rank, 1.5),
+    (Item.rank, None),
+    (Item.name, 'Ünïcode'),
+    (Item.created_at, datetime(2024, 5, 1, 12, 30)),
+    (Item.id, MAX_INTEGER),
+])
+def test_cursor_round_trip(column, value):
+    assert decode_cursor(encode_cursor('sort', value, 7), 'sort', column) == (value, 7)
+
+
+def test_integer_rank_restored_as_float():
+    value, _ = decode_cursor(encode_cursor('rank', 2, 1), 'rank', Item.rank)
+    assert value == 2.0 and isinstance(value, float)
+
+
+@pytest.mark.anyio
+async def test_rejected_cursor_raises_before_querying(db):
+    with pytest.raises(ValueError):
+        await keyset_page(
+            db, select(Item), 'rank', Item.rank, Item.id,
+            descending=False, limit=2, cursor=encode_cursor('name', 'a', 1)
+        )
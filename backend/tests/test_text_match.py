@@ -0,0 +1,56 @@
+"""Search text normalization and trigram similarity (app.services.text_match)"""
+
+import pytest
+from app.services.text_match import TextMatchService
+
+
+@pytest.mark.parametrize('parts, expected', [
+    (("Beyoncé - Halo!",), 'beyonce halo'),
+    (("Sigur Rós", None, "Takk..."), 'sigur ros takk'),
+    (("  AC/DC  ", ""), 'ac dc'),
+    (("Daft Punk", "Harder, Better, Faster, Stronger"), 'daft punk harder better faster stronger'),
+    ((None, None), ''),
+    (("!!!",), ''),
+])
+def test_normalize(parts, expected):
+    assert TextMatchService.normalize(*parts) == expected
+
+
+def test_trigrams_are_padded_per_word():
+    assert TextMatchService.trigrams('ab cd') == {'  a', ' ab', 'ab ', '  c', ' cd', 'cd '}
+
+
+def test_trigrams_of_empty_text():
+    assert TextMatchService.trigrams('') == set()
+
+
+def test_query_trigrams_found_in_padded_text():
+    text = 'aphex twin windowlicker'
+    padded = TextMatchService.pad(text)
+    assert all(trigram in padded for trigram in TextMatchService.trigrams(text))
+
+
+@pytest.mark.parametrize('query, text', [
+    ('aphex twin', 'aphex twin windowlicker'),
+    ('windowlicker', 'aphex twin windowlicker'),
+])
+def test_exact_words_score_one(query, text):
+    assert TextMatchService.word_similarity(query, text) == 1.0
+
+
+def test_typos_score_high():
+    score = TextMatchService.word_similarity('aphx twinn', 'aphex twin windowlicker')
+    assert 0.5 <= score < 1.0
+
+
+def test_unrelated_text_scores_low():
+    assert TextMatchService.word_similarity('daft punk', 'aphex twin windowlicker') < 0.2
+
+
+def test_prefix_scores_high():
+    # Results show up while typing
+    assert TextMatchService.word_similarity('window', 'aphex twin windowlicker') >= 0.7
+
+
+def test_empty_query_scores_zero():
+    assert TextMatchService.word_similarity('', 'aphex twin') == 0.0
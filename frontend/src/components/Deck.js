@@ -12,6 +12,7 @@ import PlayArrowIcon from '@mui/icons-material/PlayArrow';
 import PauseIcon from '@mui/icons-material/Pause';
 import LibraryMusicIcon from '@mui/icons-material/LibraryMusic';
 import useMixerStore from '../contexts/mixerStore';
+import { tracksAPI } from '../services/api';
 
 const Deck = ({ deckId, label }) => {
   const deck = useMixerStore((state) => state[deckId]);
@@ -24,8 +25,7 @@ const Deck = ({ deckId, label }) => {
 
   useEffect(() => {
     if (deck.track && audioRef.current) {
-      // TODO: Load audio file from API endpoint /api/tracks/${deck.track.id}/audio
-      // audioRef.current.src = audioUrl;
+      audioRef.current.src = tracksAPI.getAudioUrl(deck.track.id);
     }
   }, [deck.track]);
 
@@ -41,10 +41,15 @@ const Deck = ({ deckId, label }) => {
   }, [deck.isPlaying]);
 
   useEffect(() => {
-    // Draw waveform if available
-    if (deck.track?.waveform_data && canvasRef.current) {
-      drawWaveform(deck.track.waveform_data);
-    }
+    // Track lists don't include waveforms; fetch it when a track is loaded
+    if (!deck.track) return;
+    let cancelled = false;
+    tracksAPI.getWaveform(deck.track.id)
+      .then((waveformData) => {
+        if (!cancelled && canvasRef.current) drawWaveform(waveformData);
+      })
+      .catch(() => {});  // No waveform yet
+    return () => { cancelled = true; };
   }, [deck.track]);
 
   const drawWaveform = (waveformData) => {
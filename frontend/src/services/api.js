@@ -10,6 +10,8 @@ const apiClient = axios.create({
     'Content-Type': 'application/json',
   },
   timeout: 30000, // 30 second timeout
+  // Repeat array params (key=C&key=Am), as FastAPI expects
+  paramsSerializer: { indexes: null },
 });
 
 // Request interceptor for logging
@@ -86,16 +88,36 @@ export const tracksAPI = {
     return response.data;
   },
   
-  list: async () => {
-    const response = await apiClient.get('/api/tracks/');
+  // Filters and sort as in GET /api/tracks/; pass the nextCursor of a page as
+  // params.cursor to get the following one
+  list: async (params = {}) => {
+    const response = await apiClient.get('/api/tracks/', { params });
     return response.data;
   },
   
+  listPage: async (params = {}) => {
+    const response = await apiClient.get('/api/tracks/', { params });
+    return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+  },
+  
   get: async (id) => {
     const response = await apiClient.get(`/api/tracks/${id}`);
     return response.data;
   },
   
+  // Overview waveform as values in 0-1 (served as one byte per point)
+  getWaveform: async (id) => {
+    const response = await apiClient.get(`/api/tracks/${id}/waveform`, {
+      responseType: 'arraybuffer',
+    });
+    return Array.from(new Uint8Array(response.data), (v) => v / 255);
+  },
+  
+  // Audio URL for a deck; the 'preview' rendition is a compact MP3 (the
+  // original is served until it has been encoded)
+  getAudioUrl: (id, rendition = 'preview') =>
+    `${API_URL}/api/tracks/${id}/audio?rendition=${rendition}`,
+  
   delete: async (id) => {
     const response = await apiClient.delete(`/api/tracks/${id}`);
     return response.data;
@@ -143,8 +165,8 @@ export const mixerAPI = {
     return response.data;
   },
   
-  listMixes: async () => {
-    const response = await apiClient.get('/api/mixer/mixes');
+  listMixes: async (params = {}) => {
+    const response = await apiClient.get('/api/mixer/mixes', { params });
     return response.data;
   },
   
@@ -153,10 +175,57 @@ export const mixerAPI = {
     return response.data;
   },
   
+  // URL of a mix rendered on the fly, for an <audio> element
+  getStreamUrl: (mixId, { format = 'mp3', start = 0 } = {}) =>
+    `${API_URL}/api/mixer/mixes/${mixId}/stream?format=${format}&start=${start}`,
+  
   generateAutoMix: async (params) => {
     const response = await apiClient.post('/api/mixer/auto-mix', params);
     return response.data;
   },
+
+  // Stream an auto-mix as Server-Sent Events; onEvent(type, data) is called
+  // for each 'track', 'transition', 'progress', 'complete' or 'error' event.
+  // EventSource only supports GET, so the stream is read via fetch.
+  streamAutoMix: async (params, onEvent) => {
+    const response = await fetch(`${API_URL}/api/mixer/auto-mix/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.detail || `Server error: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const message = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let type = 'message';
+        let data = '';
+        for (const line of message.split('\n')) {
+          if (line.startsWith('event: ')) type = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        const parsed = data ? JSON.parse(data) : null;
+        if (type === 'complete') result = parsed;
+        if (onEvent) onEvent(type, parsed);
+      }
+    }
+    return result;
+  },
 };
 
 export default apiClient;